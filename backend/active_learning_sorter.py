@@ -80,7 +80,7 @@ def main():
     if not os.path.isdir(args.incoming_dir):
         raise SystemExit(f"Incoming directory not found: {args.incoming_dir}")
 
-    detector = PoseDetector()
+    detector = PoseDetector(streaming=False)
     classifier = ExerciseClassifier(model_path=args.model_path)
 
     print(f"Pose backend: {detector.backend}")
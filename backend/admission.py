@@ -0,0 +1,205 @@
+"""Admission control and per-session frame budgets for `/ws`.
+
+Without limits a burst of clients slows every session down at once. The
+`AdmissionController` caps active sessions per worker process and paces each
+admitted session so the ones already connected keep their latency:
+
+* ``GYMBUDDY_MAX_SESSIONS``: full-quality sessions per worker (``0`` = no
+  limit).
+* ``GYMBUDDY_ADMISSION_POLICY``: what happens to sessions over the cap.
+  ``reject`` sends ``{"type": "busy", "retry_after": N}`` and closes with
+  code 1013 (try again later). ``degrade`` admits up to
+  ``GYMBUDDY_MAX_DEGRADED_SESSIONS`` more on the fallback estimator at
+  ``GYMBUDDY_DEGRADED_FPS`` before rejecting.
+* ``GYMBUDDY_SESSION_FPS`` / ``GYMBUDDY_SESSION_BURST``: token bucket on
+  analysed frames per session (``0`` = no limit).
+* ``GYMBUDDY_SESSION_CPU_BUDGET``: share of one core a session may use,
+  measured from the CPU time of its frames (``0`` = no limit).
+
+Budgets are enforced by delaying the next analysis rather than queueing: the
+ingest slot keeps only the newest frame, so frames that arrive while a
+session waits are dropped and counted like any other stale frame.
+"""
+import threading
+import time
+
+try:
+    from .config import env_float, env_int, env_str
+    from .metrics import FRAMES_THROTTLED, SESSIONS_ADMITTED, SESSIONS_REJECTED
+except ImportError:
+    from config import env_float, env_int, env_str
+    from metrics import FRAMES_THROTTLED, SESSIONS_ADMITTED, SESSIONS_REJECTED
+
+
+MAX_SESSIONS = env_int("GYMBUDDY_MAX_SESSIONS", 0)
+ADMISSION_POLICY = env_str("GYMBUDDY_ADMISSION_POLICY", "reject").lower()
+MAX_DEGRADED_SESSIONS = env_int("GYMBUDDY_MAX_DEGRADED_SESSIONS", MAX_SESSIONS)
+SESSION_FPS = env_float("GYMBUDDY_SESSION_FPS", 0.0)
+SESSION_BURST = env_float("GYMBUDDY_SESSION_BURST", 2.0)
+SESSION_CPU_BUDGET = env_float("GYMBUDDY_SESSION_CPU_BUDGET", 0.0)
+DEGRADED_FPS = env_float("GYMBUDDY_DEGRADED_FPS", 2.0)
+RETRY_SECONDS = env_float("GYMBUDDY_RETRY_SECONDS", 5.0)
+CPU_SMOOTHING = 0.2
+BUSY_CLOSE_CODE = 1013
+
+
+class TokenBucket:
+    """Classic token bucket; ``rate`` tokens per second up to ``burst``.
+
+    ``clock`` supplies the current time when a call passes no ``now``
+    (``time.monotonic`` by default; tests inject a fake one).
+    """
+
+    def __init__(self, rate, burst=SESSION_BURST, clock=time.monotonic):
+        self.rate = float(rate)
+        self.burst = max(1.0, float(burst))
+        self.tokens = self.burst
+        self._clock = clock
+        self._updated = clock()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def delay(self, now=None):
+        """Seconds until one token is available (``0.0`` when one is ready)."""
+        if self.rate <= 0:
+            return 0.0
+        now = self._clock() if now is None else now
+        self._refill(now)
+        if self.tokens >= 1.0:
+            return 0.0
+        return (1.0 - self.tokens) / self.rate
+
+    def take(self, now=None):
+        if self.rate <= 0:
+            return
+        now = self._clock() if now is None else now
+        self._refill(now)
+        self.tokens = max(0.0, self.tokens - 1.0)
+
+
+class CpuBudget:
+    """Spaces frames so a session's measured CPU share stays under ``budget``."""
+
+    def __init__(self, budget):
+        self.budget = float(budget)
+        self.per_frame = None
+        self.total = 0.0
+        self._last_start = None
+
+    def charge(self, seconds, started):
+        self.total += seconds
+        self._last_start = started
+        if self.per_frame is None:
+            self.per_frame = seconds
+        else:
+            self.per_frame += CPU_SMOOTHING * (seconds - self.per_frame)
+
+    def delay(self, now=None):
+        if self.budget <= 0 or self.per_frame is None:
+            return 0.0
+        now = time.monotonic() if now is None else now
+        # A frame costing c CPU seconds may start every c / budget seconds.
+        next_start = self._last_start + self.per_frame / self.budget
+        return max(0.0, next_start - now)
+
+
+class SessionAdmission:
+    """Budgets for one admitted session."""
+
+    def __init__(self, controller, degraded=False, fps=SESSION_FPS,
+                 cpu_budget=SESSION_CPU_BUDGET):
+        self._controller = controller
+        self.degraded = degraded
+        if degraded and DEGRADED_FPS > 0:
+            fps = min(fps, DEGRADED_FPS) if fps > 0 else DEGRADED_FPS
+        self.fps = fps
+        self.bucket = TokenBucket(fps)
+        self.cpu = CpuBudget(cpu_budget)
+        self.throttled = 0
+        self._released = False
+
+    def delay(self):
+        """Seconds to wait before analysing the next frame."""
+        now = time.monotonic()
+        delay = max(self.bucket.delay(now), self.cpu.delay(now))
+        if delay > 0:
+            self.throttled += 1
+            FRAMES_THROTTLED.inc()
+        return delay
+
+    def start_frame(self):
+        """Consume a token; returns the start time to pass to `finish_frame`."""
+        now = time.monotonic()
+        self.bucket.take(now)
+        return now
+
+    def finish_frame(self, started, cpu_seconds):
+        if cpu_seconds is not None:
+            self.cpu.charge(cpu_seconds, started)
+
+    def hello_fields(self):
+        return {"admission": {"degraded": self.degraded, "fps": self.fps or None}}
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self._controller._release(self)
+
+
+class AdmissionController:
+    """Per-process session cap with a reject or degrade policy."""
+
+    def __init__(self, max_sessions=MAX_SESSIONS, policy=ADMISSION_POLICY,
+                 max_degraded=MAX_DEGRADED_SESSIONS, retry_seconds=RETRY_SECONDS):
+        if policy not in ("reject", "degrade"):
+            print(f"AdmissionController: unknown policy '{policy}', using reject")
+            policy = "reject"
+        self.max_sessions = max(0, int(max_sessions))
+        self.policy = policy
+        self.max_degraded = max(0, int(max_degraded))
+        self.retry_seconds = retry_seconds
+        self._lock = threading.Lock()
+        self.active = 0
+        self.active_degraded = 0
+        self.admitted = 0
+        self.rejected = 0
+
+    def admit(self):
+        """Return a `SessionAdmission`, or ``None`` when the server is full."""
+        with self._lock:
+            if not self.max_sessions or self.active < self.max_sessions:
+                self.active += 1
+                self.admitted += 1
+                SESSIONS_ADMITTED.inc(1, "full")
+                return SessionAdmission(self)
+            if self.policy == "degrade" and self.active_degraded < self.max_degraded:
+                self.active_degraded += 1
+                self.admitted += 1
+                SESSIONS_ADMITTED.inc(1, "degraded")
+                return SessionAdmission(self, degraded=True)
+            self.rejected += 1
+            SESSIONS_REJECTED.inc()
+            return None
+
+    def _release(self, admission):
+        with self._lock:
+            if admission.degraded:
+                self.active_degraded -= 1
+            else:
+                self.active -= 1
+
+    def busy_message(self):
+        return {"type": "busy", "retry_after": self.retry_seconds}
+
+    def stats(self):
+        with self._lock:
+            return {
+                "max_sessions": self.max_sessions,
+                "policy": self.policy,
+                "active": self.active,
+                "active_degraded": self.active_degraded,
+                "admitted": self.admitted,
+                "rejected": self.rejected,
+            }
@@ -0,0 +1,223 @@
+"""Cross-session micro-batching for MoveNet inference.
+
+Session threads hand frames to a `BatchScheduler` instead of invoking their
+own interpreter. A dedicated worker thread collects frames for up to
+``GYMBUDDY_BATCH_WINDOW_MS`` (or until ``GYMBUDDY_BATCH_MAX`` frames are
+waiting), runs them through one batched `MoveNetLocal.detect_batch` call and
+resolves each caller's future with its keypoints.
+
+Batches are padded to the next power of two (see
+`MoveNetLocal.detect_batch`); the interpreters for every padded size up to
+``GYMBUDDY_BATCH_MAX`` are built when the scheduler starts.
+
+Each batch's latency, which is what every frame in it waited, is reported to
+the MoveNet `VariantGovernor`. When the governor steps, the scheduler swaps
+in a replacement model built on the governor's thread between two batches.
+
+Batching only applies to the ``thread`` executor mode with the
+``movenet_local`` backend; it is enabled with ``GYMBUDDY_BATCHING=1``.
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+try:
+    from .config import env_bool, env_float, env_int
+    from .metrics import BATCH_SIZE
+except ImportError:
+    from config import env_bool, env_float, env_int
+    from metrics import BATCH_SIZE
+
+
+BATCHING_ENABLED = env_bool("GYMBUDDY_BATCHING", False)
+BATCH_WINDOW_MS = env_float("GYMBUDDY_BATCH_WINDOW_MS", 8.0)
+BATCH_MAX = env_int("GYMBUDDY_BATCH_MAX", 8)
+BATCH_QUEUE = env_int("GYMBUDDY_BATCH_QUEUE", 64)
+BATCH_RESULT_TIMEOUT = 5.0
+
+
+class BatchQueueFull(RuntimeError):
+    """Raised when the scheduler queue is at ``GYMBUDDY_BATCH_QUEUE``."""
+
+
+class BatchScheduler:
+    """Collects frames from many sessions and runs them as one batch."""
+
+    def __init__(self, model, window_ms=BATCH_WINDOW_MS, max_batch=BATCH_MAX,
+                 max_queue=BATCH_QUEUE, governor=None):
+        self.model = model
+        self.governor = governor
+        self._awaiting_generation = None
+        self.window = max(0.0, float(window_ms)) / 1000.0
+        self.max_batch = max(1, int(max_batch))
+        self.max_queue = max(1, int(max_queue))
+        self._queue = queue.Queue(maxsize=self.max_queue)
+        self._lock = threading.Lock()
+        self._stopped = False
+        self.batches = 0
+        self.frames = 0
+        self.rejected = 0
+        self.batch_sizes = [0] * (self.max_batch + 1)
+        self._thread = threading.Thread(
+            target=self._run, name="gymbuddy-batcher", daemon=True
+        )
+        self._thread.start()
+
+    def submit(self, frame):
+        """Queue one frame; returns a future resolving to its keypoints dict."""
+        future = Future()
+        try:
+            self._queue.put_nowait((frame, future))
+        except queue.Full:
+            with self._lock:
+                self.rejected += 1
+            raise BatchQueueFull("Batch queue is full")
+        return future
+
+    def detect(self, frame):
+        return self.submit(frame).result(timeout=BATCH_RESULT_TIMEOUT)
+
+    def stop(self):
+        self._stopped = True
+        try:
+            self._queue.put_nowait((None, None))
+        except queue.Full:
+            pass
+
+    def _collect(self):
+        frame, future = self._queue.get()
+        if future is None:
+            return []
+        items = [(frame, future)]
+        deadline = time.monotonic() + self.window
+        while len(items) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0:
+                    frame, future = self._queue.get(timeout=remaining)
+                else:
+                    frame, future = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if future is None:
+                self._stopped = True
+                break
+            items.append((frame, future))
+        return items
+
+    def _prepare(self, model):
+        prepare = getattr(model, "prepare_batches", None)
+        if prepare is not None:
+            prepare(self.max_batch)
+
+    def _follow_variant(self, seconds):
+        """Report one batch's latency and swap in a replacement model once
+        the governor has stepped and the replacement is built."""
+        variant = getattr(self.model, "variant", None)
+        if self.governor is None or variant is None:
+            return
+        self.governor.observe(variant, seconds)
+        current = self.governor.current
+        if current == variant:
+            self._awaiting_generation = None
+            return
+        generation = self.governor.generation
+        if self._awaiting_generation != generation:
+            self._awaiting_generation = generation
+            self.governor.request(self._prepare)
+        replacement = self.governor.take(current, self._prepare)
+        if replacement is not None:
+            self.governor.release(self.model)
+            self.model = replacement
+            self._awaiting_generation = None
+
+    def _run(self):
+        self._prepare(self.model)
+        while not self._stopped:
+            items = self._collect()
+            if not items:
+                continue
+            frames = [frame for frame, _ in items]
+            started = time.perf_counter()
+            try:
+                results = self.model.detect_batch(frames)
+            except Exception as err:
+                for _, future in items:
+                    future.set_exception(err)
+                continue
+            self._follow_variant(time.perf_counter() - started)
+            for (_, future), keypoints in zip(items, results):
+                future.set_result(keypoints)
+            with self._lock:
+                self.batches += 1
+                self.frames += len(items)
+                self.batch_sizes[len(items)] += 1
+            BATCH_SIZE.observe(len(items))
+
+    def stats(self):
+        with self._lock:
+            return {
+                "window_ms": self.window * 1000.0,
+                "max_batch": self.max_batch,
+                "max_queue": self.max_queue,
+                "queue_depth": self._queue.qsize(),
+                "batches": self.batches,
+                "frames": self.frames,
+                "rejected": self.rejected,
+                "mean_batch_size": (self.frames / self.batches) if self.batches else 0.0,
+                "batch_sizes": {
+                    size: count for size, count in enumerate(self.batch_sizes) if count
+                },
+            }
+
+
+class BatchedMoveNet:
+    """Drop-in stand-in for `MoveNetLocal` that routes through a scheduler.
+
+    It reads the scheduler's current model, which changes when the variant
+    governor steps.
+    """
+
+    def __init__(self, scheduler):
+        self.scheduler = scheduler
+
+    @property
+    def interpreter(self):
+        return self.scheduler.model.interpreter
+
+    @property
+    def input_size(self):
+        return self.scheduler.model.input_size
+
+    def detect(self, frame):
+        return self.scheduler.detect(frame)
+
+
+def attach_scheduler(detector_pool):
+    """Route every pooled MoveNet detector through one shared scheduler.
+
+    Returns the scheduler, or ``None`` when no pooled detector uses MoveNet.
+    The scheduler feeds the variant governor unless the pooled detectors are
+    not ``adaptive``.
+    """
+    movenet_detectors = [
+        detector for detector in detector_pool.detectors
+        if detector.backend == "movenet_local"
+    ]
+    if not movenet_detectors:
+        return None
+
+    first = movenet_detectors[0]
+    governor = first._variants if first.adaptive else None
+    scheduler = BatchScheduler(first.detector, governor=governor)
+    for detector in movenet_detectors:
+        if detector is not first:
+            # Their own interpreters are never used again.
+            first._variants.release(detector.detector)
+        detector.detector = BatchedMoveNet(scheduler)
+    print(
+        f"BatchScheduler: batching {len(movenet_detectors)} detector(s), "
+        f"window {scheduler.window * 1000.0:.1f} ms, max batch {scheduler.max_batch}"
+    )
+    return scheduler
@@ -0,0 +1,35 @@
+"""Environment-driven runtime settings for the backend.
+
+Every knob is read from a ``GYMBUDDY_*`` environment variable so deployments
+can tune the server without code changes. Invalid values fall back to the
+default instead of failing at import time.
+"""
+import os
+
+
+def env_str(name, default):
+    value = os.environ.get(name)
+    if value is None or not value.strip():
+        return default
+    return value.strip()
+
+
+def env_int(name, default):
+    try:
+        return int(env_str(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def env_float(name, default):
+    try:
+        return float(env_str(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def env_bool(name, default):
+    value = env_str(name, None)
+    if value is None:
+        return default
+    return value.lower() in ("1", "true", "yes", "on")
@@ -0,0 +1,93 @@
+"""Server-driven capture settings for `/ws` clients.
+
+Clients that connect with ``?control=1`` receive JSON control messages::
+
+    {"type": "control", "fps": 5.0, "max_width": 384, "max_height": 384,
+     "jpeg_quality": 0.8}
+
+and should capture at most ``fps`` frames per second, downscale so the frame
+fits inside ``max_width`` x ``max_height`` (keeping aspect ratio) and encode
+JPEG at ``jpeg_quality`` (0..1, as passed to ``canvas.toBlob``).
+
+The targets follow the session's measured inference time, how loaded the
+executor is, and the active pose backend's input size, and are re-sent while
+the session runs whenever they change noticeably.
+"""
+import time
+
+try:
+    from .config import env_float
+except ImportError:
+    from config import env_float
+
+
+CONTROL_MIN_FPS = env_float("GYMBUDDY_CONTROL_MIN_FPS", 1.0)
+CONTROL_MAX_FPS = env_float("GYMBUDDY_CONTROL_MAX_FPS", 15.0)
+CONTROL_RES_FACTOR = env_float("GYMBUDDY_CONTROL_RES_FACTOR", 2.0)
+CONTROL_INTERVAL_SECONDS = env_float("GYMBUDDY_CONTROL_INTERVAL_SECONDS", 1.0)
+DEFAULT_INPUT_SIZE = 320
+QUALITY_NORMAL = 0.8
+QUALITY_LOADED = 0.6
+LATENCY_SMOOTHING = 0.2
+FPS_CHANGE_THRESHOLD = 0.15
+
+
+class CaptureController:
+    """Tracks one session's inference latency and derives capture targets."""
+
+    def __init__(self, input_size=None, min_fps=CONTROL_MIN_FPS, max_fps=CONTROL_MAX_FPS,
+                 res_factor=CONTROL_RES_FACTOR, interval=CONTROL_INTERVAL_SECONDS):
+        self.input_size = int(input_size or DEFAULT_INPUT_SIZE)
+        self.min_fps = min_fps
+        self.max_fps = max(min_fps, max_fps)
+        self.res_factor = max(1.0, res_factor)
+        self.interval = interval
+        self.latency = None
+        self._sent = None
+        self._sent_at = 0.0
+
+    def observe(self, seconds):
+        """Feed the time one frame spent in the executor."""
+        if self.latency is None:
+            self.latency = seconds
+        else:
+            self.latency += LATENCY_SMOOTHING * (seconds - self.latency)
+
+    def targets(self, load=0.0):
+        """Compute the settings for the current latency and executor load."""
+        # One frame per inference keeps the pipeline busy without queueing;
+        # when the executor is oversubscribed each session gets a fair share.
+        per_frame = self.latency if self.latency else 1.0 / self.max_fps
+        per_frame *= max(1.0, load)
+        fps = min(self.max_fps, max(self.min_fps, 1.0 / max(per_frame, 1e-3)))
+
+        side = int(round(self.input_size * self.res_factor))
+        if load > 1.0:
+            side = max(self.input_size, int(side / min(load, 2.0)))
+        return {
+            "type": "control",
+            "fps": round(fps, 2),
+            "max_width": side,
+            "max_height": side,
+            "jpeg_quality": QUALITY_LOADED if load > 1.0 else QUALITY_NORMAL,
+        }
+
+    def maybe_update(self, load=0.0, force=False):
+        """Return a control message when the targets moved enough, else ``None``."""
+        now = time.monotonic()
+        if not force and now - self._sent_at < self.interval:
+            return None
+        message = self.targets(load)
+        if not force and self._sent is not None and not self._changed(message):
+            return None
+        self._sent = message
+        self._sent_at = now
+        return message
+
+    def _changed(self, message):
+        previous = self._sent
+        if message["max_width"] != previous["max_width"]:
+            return True
+        if message["jpeg_quality"] != previous["jpeg_quality"]:
+            return True
+        return abs(message["fps"] - previous["fps"]) > FPS_CHANGE_THRESHOLD * previous["fps"]
@@ -0,0 +1,90 @@
+"""Frame decoding sized for the active pose backend.
+
+Clients usually send frames much larger than the model input (640x480 JPEGs
+for a 192x192 MoveNet). libjpeg can decode at 1/2, 1/4 or 1/8 scale almost
+for free by skipping DCT coefficients, so `FrameDecoder` reads the JPEG
+header, picks the largest reduction whose shorter side still covers the
+backend's input size and decodes straight to that resolution. Detectors then
+resize once into their own reusable input buffers.
+
+Non-JPEG payloads (WebP, PNG) are decoded at full size.
+"""
+import cv2
+
+REDUCED_FLAGS = (
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2),
+)
+REDUCED_FLAG_BY_FACTOR = dict(REDUCED_FLAGS)
+# Start-of-frame markers carrying the image size (SOF0-SOF15 minus DHT,
+# JPG and DAC, which share the range).
+SOF_MARKERS = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+# Markers without a length field.
+STANDALONE_MARKERS = frozenset(range(0xD0, 0xDA)) | {0x01}
+
+
+def jpeg_size(buffer):
+    """Return ``(width, height)`` from a JPEG header, or ``None``.
+
+    ``buffer`` is a 1-D uint8 array; only the marker segments before the
+    frame header are touched.
+    """
+    size = len(buffer)
+    if size < 4 or buffer[0] != 0xFF or buffer[1] != 0xD8:
+        return None
+    pos = 2
+    while pos + 4 <= size:
+        if buffer[pos] != 0xFF:
+            return None
+        marker = int(buffer[pos + 1])
+        if marker == 0xFF:
+            # Fill byte before the actual marker.
+            pos += 1
+            continue
+        if marker in STANDALONE_MARKERS:
+            pos += 2
+            continue
+        length = (int(buffer[pos + 2]) << 8) | int(buffer[pos + 3])
+        if marker in SOF_MARKERS:
+            if pos + 9 > size:
+                return None
+            height = (int(buffer[pos + 5]) << 8) | int(buffer[pos + 6])
+            width = (int(buffer[pos + 7]) << 8) | int(buffer[pos + 8])
+            return width, height
+        if marker == 0xDA or length < 2:
+            # Start of scan without a frame header: malformed.
+            return None
+        pos += 2 + length
+    return None
+
+
+def reduction_for(width, height, target_size):
+    """Largest supported scale factor keeping the shorter side >= target."""
+    if not target_size:
+        return 1
+    shorter = min(width, height)
+    for factor, _ in REDUCED_FLAGS:
+        if shorter // factor >= target_size:
+            return factor
+    return 1
+
+
+class FrameDecoder:
+    """Decodes client frames at the smallest resolution the backend needs."""
+
+    def __init__(self, target_size=None):
+        self.target_size = int(target_size) if target_size else None
+        self.last_factor = 1
+
+    def decode(self, buffer):
+        """Decode ``buffer`` to a BGR frame (or ``None`` for invalid data)."""
+        factor = 1
+        if self.target_size:
+            dims = jpeg_size(buffer)
+            if dims is not None:
+                factor = reduction_for(dims[0], dims[1], self.target_size)
+        self.last_factor = factor
+        if factor == 1:
+            return cv2.imdecode(buffer, cv2.IMREAD_COLOR)
+        return cv2.imdecode(buffer, REDUCED_FLAG_BY_FACTOR[factor])
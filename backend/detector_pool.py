@@ -0,0 +1,149 @@
+"""Process-wide pool of pre-built, pre-warmed pose detectors.
+
+Constructing a `PoseDetector` probes backends, loads model files and
+allocates interpreter tensors, which can take seconds. The pool builds a fixed
+number of detectors once at startup, runs a dummy inference through each so
+lazy allocations happen before the first client arrives, and then leases them
+to sessions.
+
+When every detector is leased the pool either waits (``wait`` policy, up to
+``GYMBUDDY_DETECTOR_POOL_TIMEOUT`` seconds) or hands out a cheap fallback
+estimator (``degrade`` policy). A ``wait`` that times out also degrades so a
+session is never refused outright.
+"""
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+
+try:
+    from .config import env_float, env_int, env_str
+    from .pose import PoseDetector
+except ImportError:
+    from config import env_float, env_int, env_str
+    from pose import PoseDetector
+
+
+POOL_SIZE = env_int("GYMBUDDY_DETECTOR_POOL_SIZE", os.cpu_count() or 1)
+POOL_POLICY = env_str("GYMBUDDY_DETECTOR_POOL_POLICY", "wait").lower()
+POOL_TIMEOUT = env_float("GYMBUDDY_DETECTOR_POOL_TIMEOUT", 5.0)
+WARMUP_FRAME_SHAPE = (480, 640, 3)
+
+
+class DetectorPool:
+    """Fixed-size, thread-safe pool of `PoseDetector` instances."""
+
+    def __init__(self, size=POOL_SIZE, policy=POOL_POLICY, timeout=POOL_TIMEOUT,
+                 factory=PoseDetector):
+        if policy not in ("wait", "degrade"):
+            print(f"DetectorPool: unknown policy '{policy}', using wait")
+            policy = "wait"
+        self.size = max(1, int(size))
+        self.policy = policy
+        self.timeout = float(timeout)
+        self._factory = factory
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+        # Held while building so concurrent acquires wait for the detectors.
+        self._warm_lock = threading.Lock()
+        self._warmed = False
+        self.detectors = []
+        self.in_use = 0
+        self.waits = 0
+        self.degraded = 0
+
+    def warm(self):
+        """Build every detector and run one dummy inference through each."""
+        with self._warm_lock:
+            if self._warmed:
+                return
+            dummy = np.zeros(WARMUP_FRAME_SHAPE, dtype=np.uint8)
+            for index in range(self.size):
+                started = time.perf_counter()
+                detector = self._factory()
+                detector._pool_owner = self
+                self.detectors.append(detector)
+                try:
+                    detector.process(dummy)
+                except Exception as err:
+                    print(f"DetectorPool: warm-up inference failed: {err}")
+                elapsed_ms = (time.perf_counter() - started) * 1000.0
+                print(
+                    f"DetectorPool: detector {index + 1}/{self.size} ready "
+                    f"({detector.backend}, {elapsed_ms:.0f} ms)"
+                )
+                self._idle.put(detector)
+            self._warmed = True
+
+    def acquire(self, degraded=False):
+        """Lease a detector, applying the exhaustion policy when none is idle.
+
+        ``degraded`` skips the pool and returns the fallback estimator.
+        """
+        if not self._warmed:
+            self.warm()
+
+        detector = None
+        if not degraded:
+            detector = self._lease()
+
+        if detector is None:
+            with self._lock:
+                self.degraded += 1
+            return PoseDetector(backend="fallback")
+
+        with self._lock:
+            self.in_use += 1
+        detector.reset()
+        return detector
+
+    def _lease(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        if self.policy != "wait" or self.timeout <= 0:
+            return None
+        with self._lock:
+            self.waits += 1
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            return None
+
+    def release(self, detector):
+        """Return a leased detector; degraded fallbacks are simply dropped."""
+        if detector is None or getattr(detector, "_pool_owner", None) is not self:
+            return
+        with self._lock:
+            self.in_use -= 1
+        self._idle.put(detector)
+
+    def stats(self):
+        crops = [detector.crop_stats() for detector in self.detectors]
+        crops = [crop for crop in crops if crop is not None]
+        gates = [detector.gate_stats() for detector in self.detectors]
+        gates = [gate for gate in gates if gate is not None]
+        skipped = sum(gate["skipped"] for gate in gates)
+        inferred = sum(gate["inferred"] for gate in gates)
+        with self._lock:
+            return {
+                "size": self.size,
+                "in_use": self.in_use,
+                "idle": self._idle.qsize(),
+                "policy": self.policy,
+                "input_size": self.detectors[0].input_size if self.detectors else None,
+                "waits": self.waits,
+                "degraded": self.degraded,
+                "smart_crop": {
+                    "cropped": sum(crop["cropped"] for crop in crops),
+                    "full": sum(crop["full"] for crop in crops),
+                } if crops else None,
+                "motion_gate": {
+                    "skipped": skipped,
+                    "inferred": inferred,
+                    "skip_rate": round(skipped / (skipped + inferred), 3) if skipped + inferred else 0.0,
+                } if gates else None,
+            }
@@ -0,0 +1,327 @@
+"""Execution layer that keeps blocking CV work off the asyncio event loop.
+
+Two modes are available, selected with ``GYMBUDDY_EXECUTOR``:
+
+* ``thread`` (default): a shared ``ThreadPoolExecutor``. OpenCV, NumPy and
+  the TFLite/MediaPipe runtimes release the GIL during heavy calls, so
+  sessions overlap well on multiple cores.
+* ``process``: a set of single-worker processes. Each session is pinned to
+  one worker and its `FramePipeline` lives inside that process, so pipeline
+  state never crosses a process boundary; only raw frames and result dicts
+  are pickled.
+
+Pose detectors come from a `DetectorPool` that is built and warmed when the
+executor starts (one pool per worker process in ``process`` mode) and leased
+to sessions for their lifetime.
+
+Per-session ordering is guaranteed because a session only ever has one frame
+in flight: `InferenceSession.submit` is awaited before the next frame is
+accepted.
+"""
+import asyncio
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+try:
+    from .batching import BATCHING_ENABLED, attach_scheduler
+    from .config import env_int, env_str
+    from .detector_pool import POOL_SIZE, DetectorPool
+    from .metrics import BATCH_QUEUE_DEPTH, DETECTOR_POOL, record_stages
+    from .multi_person import MULTIPOSE_POOL_SIZE, MultiPersonPipeline, create_multi_detector
+    from .pipeline import FramePipeline
+    from .pose import backend_report
+except ImportError:
+    from batching import BATCHING_ENABLED, attach_scheduler
+    from config import env_int, env_str
+    from detector_pool import POOL_SIZE, DetectorPool
+    from metrics import BATCH_QUEUE_DEPTH, DETECTOR_POOL, record_stages
+    from multi_person import MULTIPOSE_POOL_SIZE, MultiPersonPipeline, create_multi_detector
+    from pipeline import FramePipeline
+    from pose import backend_report
+
+
+EXECUTOR_MODE = env_str("GYMBUDDY_EXECUTOR", "thread").lower()
+EXECUTOR_WORKERS = env_int("GYMBUDDY_EXECUTOR_WORKERS", os.cpu_count() or 1)
+
+# Detector pools and pipelines owned by this worker process (process mode only).
+_worker_pool = None
+_worker_multi_pool = None
+_worker_pipelines = {}
+
+
+def _worker_init(pool_size):
+    global _worker_pool, _worker_multi_pool
+    _worker_pool = DetectorPool(size=pool_size)
+    _worker_pool.warm()
+    _worker_multi_pool = _multi_pool()
+
+
+def _multi_pool():
+    """Detector pool for ``people=multi`` sessions; its detectors are built
+    on the first lease."""
+    return DetectorPool(size=MULTIPOSE_POOL_SIZE, factory=create_multi_detector)
+
+
+def _release_detector(detector):
+    """Return a leased detector to whichever pool it came from."""
+    owner = getattr(detector, "_pool_owner", None)
+    if owner is not None:
+        owner.release(detector)
+
+
+def _worker_ready():
+    return _worker_pool.stats() if _worker_pool is not None else {}
+
+
+def _worker_pool_counts():
+    """Occupancy of this worker's detector pool, cheap enough to send back
+    with every frame so the parent's `/metrics` stay current."""
+    if _worker_pool is None:
+        return None
+    return {
+        "size": _worker_pool.size,
+        "in_use": _worker_pool.in_use,
+        "degraded": _worker_pool.degraded,
+    }
+
+
+def _process_timed(pipeline, message):
+    """Run one frame and measure the CPU time it used on this thread."""
+    started = time.thread_time()
+    result = pipeline.process(message)
+    return result, time.thread_time() - started
+
+
+def _worker_process(session_id, message, keypoints_only=False, state=None,
+                    degraded=False, multi_person=False):
+    pipeline = _worker_pipelines.get(session_id)
+    if pipeline is None:
+        if keypoints_only:
+            pipeline = FramePipeline(keypoints_only=True)
+        elif multi_person and not degraded:
+            pipeline = MultiPersonPipeline(pose=_worker_multi_pool.acquire())
+        else:
+            pipeline = FramePipeline(pose=_worker_pool.acquire(degraded=degraded))
+        pipeline.restore(state)
+        _worker_pipelines[session_id] = pipeline
+    result, cpu_seconds = _process_timed(pipeline, message)
+    return result, pipeline.timings, pipeline.backend, cpu_seconds, _worker_pool_counts()
+
+
+def _worker_close(session_id):
+    pipeline = _worker_pipelines.pop(session_id, None)
+    if pipeline is not None:
+        _release_detector(pipeline.pose)
+    return _worker_pool_counts()
+
+
+class InferenceSession:
+    """Handle used by one websocket connection to run frames in order."""
+
+    def __init__(self, executor, session_id, pipeline=None, worker=None,
+                 keypoints_only=False, state=None, degraded=False, multi_person=False):
+        self._executor = executor
+        self.session_id = session_id
+        self.pipeline = pipeline
+        self.keypoints_only = keypoints_only
+        self.degraded = degraded
+        self.multi_person = multi_person
+        # CPU seconds used by the most recent frame.
+        self.cpu_seconds = None
+        self._worker = worker
+        # Process mode restores the snapshot with the first frame.
+        self._initial_state = state
+
+    async def submit(self, message):
+        self._executor.inflight += 1
+        try:
+            return await self._submit(message)
+        finally:
+            self._executor.inflight -= 1
+
+    async def _submit(self, message):
+        loop = asyncio.get_running_loop()
+        if self.pipeline is not None:
+            result, self.cpu_seconds = await loop.run_in_executor(
+                self._executor.pool, _process_timed, self.pipeline, message
+            )
+            record_stages(self.pipeline.timings, self.pipeline.backend)
+            return result
+        result, timings, backend, self.cpu_seconds, counts = await loop.run_in_executor(
+            self._worker, _worker_process, self.session_id, message,
+            self.keypoints_only, self._initial_state, self.degraded, self.multi_person,
+        )
+        # Keep the snapshot until a frame succeeds: a failed first frame
+        # must not lose the resumed state.
+        self._initial_state = None
+        record_stages(timings, backend)
+        self._executor.worker_pools[self._worker] = counts
+        return result
+
+    async def close(self):
+        if self._worker is None:
+            if self.pipeline is not None:
+                _release_detector(self.pipeline.pose)
+                self.pipeline = None
+            return
+        loop = asyncio.get_running_loop()
+        try:
+            counts = await loop.run_in_executor(self._worker, _worker_close, self.session_id)
+            self._executor.worker_pools[self._worker] = counts
+        except Exception as err:
+            print(f"InferenceExecutor: failed to close session {self.session_id}: {err}")
+
+
+class InferenceExecutor:
+    """Thread- or process-backed runner for per-session pipelines."""
+
+    def __init__(self, mode=EXECUTOR_MODE, workers=EXECUTOR_WORKERS):
+        if mode not in ("thread", "process"):
+            print(f"InferenceExecutor: unknown mode '{mode}', using thread")
+            mode = "thread"
+        self.mode = mode
+        self.workers = max(1, int(workers))
+        self._ids = itertools.count(1)
+        self.pool = None
+        self.detector_pool = None
+        self.multi_pool = None
+        self.batcher = None
+        self.input_size = None
+        self.inflight = 0
+        self._process_workers = []
+        # Last detector pool counts reported by each worker process.
+        self.worker_pools = {}
+        self._next_worker = itertools.cycle(range(self.workers))
+
+        if self.mode == "thread":
+            self.pool = ThreadPoolExecutor(
+                max_workers=self.workers, thread_name_prefix="gymbuddy-infer"
+            )
+            self.detector_pool = DetectorPool()
+            # Cheap to create; the MultiPose detectors are built on first use.
+            self.multi_pool = _multi_pool()
+        else:
+            worker_pool_size = max(1, POOL_SIZE // self.workers)
+            self._process_workers = [
+                ProcessPoolExecutor(
+                    max_workers=1,
+                    initializer=_worker_init,
+                    initargs=(worker_pool_size,),
+                )
+                for _ in range(self.workers)
+            ]
+        print(f"InferenceExecutor: {self.mode} mode with {self.workers} worker(s)")
+
+    async def start(self):
+        """Build and warm the detector pool(s) before accepting sessions."""
+        loop = asyncio.get_running_loop()
+        if self.detector_pool is not None:
+            await loop.run_in_executor(self.pool, self.detector_pool.warm)
+            self.input_size = self.detector_pool.stats()["input_size"]
+            if BATCHING_ENABLED:
+                self.batcher = attach_scheduler(self.detector_pool)
+            return
+        if BATCHING_ENABLED:
+            print("InferenceExecutor: batching is only available in thread mode")
+        ready = await asyncio.gather(
+            *(loop.run_in_executor(worker, _worker_ready) for worker in self._process_workers)
+        )
+        for worker, stats in zip(self._process_workers, ready):
+            if stats:
+                self.worker_pools[worker] = {
+                    key: stats[key] for key in ("size", "in_use", "degraded")
+                }
+        self.input_size = next(
+            (stats.get("input_size") for stats in ready if stats.get("input_size")), None
+        )
+
+    @property
+    def load(self):
+        """In-flight frames per worker; above 1.0 frames are queueing."""
+        return self.inflight / self.workers
+
+    def _lease_pipeline(self, keypoints_only=False, state=None, degraded=False,
+                        multi_person=False):
+        if keypoints_only:
+            pipeline = FramePipeline(keypoints_only=True)
+        elif multi_person and not degraded:
+            pipeline = MultiPersonPipeline(pose=self.multi_pool.acquire())
+        else:
+            pipeline = FramePipeline(pose=self.detector_pool.acquire(degraded=degraded))
+        pipeline.restore(state)
+        return pipeline
+
+    async def open_session(self, keypoints_only=False, state=None, degraded=False,
+                           multi_person=False):
+        """Open a session; keypoints-only sessions never lease a detector.
+
+        ``state`` is an optional `session_store` snapshot to resume from.
+        ``degraded`` sessions get the fallback estimator instead of a pooled
+        detector (see `admission.py`). ``multi_person`` sessions lease a
+        MultiPose detector and count every person (see `multi_person.py`).
+        """
+        session_id = next(self._ids)
+        if self.mode == "thread":
+            # Leasing may wait for a detector, so keep it off the inference pool.
+            pipeline = await asyncio.to_thread(
+                self._lease_pipeline, keypoints_only, state, degraded, multi_person
+            )
+            return InferenceSession(
+                self, session_id, pipeline=pipeline, keypoints_only=keypoints_only,
+                degraded=degraded, multi_person=multi_person,
+            )
+        worker = self._process_workers[next(self._next_worker)]
+        return InferenceSession(
+            self, session_id, worker=worker, keypoints_only=keypoints_only, state=state,
+            degraded=degraded, multi_person=multi_person,
+        )
+
+    def pool_counts(self):
+        """Detector pool size/in_use/degraded, summed over worker processes
+        in ``process`` mode (as of each worker's latest frame)."""
+        if self.detector_pool is not None:
+            return self.detector_pool.stats()
+        reports = [counts for counts in self.worker_pools.values() if counts]
+        if not reports:
+            return None
+        return {
+            key: sum(counts[key] for counts in reports)
+            for key in ("size", "in_use", "degraded")
+        }
+
+    def collect_metrics(self):
+        pool = self.pool_counts()
+        if pool is not None:
+            DETECTOR_POOL.set(pool["size"], "size")
+            DETECTOR_POOL.set(pool["in_use"], "in_use")
+            DETECTOR_POOL.set(pool["degraded"], "degraded")
+        if self.batcher is not None:
+            BATCH_QUEUE_DEPTH.set(self.batcher.stats()["queue_depth"])
+
+    def stats(self):
+        stats = {
+            "mode": self.mode,
+            "workers": self.workers,
+            "inflight": self.inflight,
+            "input_size": self.input_size,
+        }
+        if self.detector_pool is not None:
+            stats["detector_pool"] = self.detector_pool.stats()
+            stats["pose_backends"] = backend_report()
+        elif self.worker_pools:
+            stats["detector_pool"] = self.pool_counts()
+        if self.multi_pool is not None:
+            stats["multi_pool"] = self.multi_pool.stats()
+        if self.batcher is not None:
+            stats["batching"] = self.batcher.stats()
+        return stats
+
+    def shutdown(self):
+        if self.batcher is not None:
+            self.batcher.stop()
+        if self.pool is not None:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+        for worker in self._process_workers:
+            worker.shutdown(wait=False, cancel_futures=True)
@@ -7,15 +7,14 @@ from datetime import datetime, timezone
 import numpy as np
 
 try:
-    from .geometry import calculate_angle
+    from .geometry import LANDMARK_ANGLES, joint_angles, landmark_angles, landmark_array
 except ImportError:
-    from geometry import calculate_angle
+    from geometry import LANDMARK_ANGLES, joint_angles, landmark_angles, landmark_array
 
 
 DEFAULT_MODEL_PATH = os.path.join(
     os.path.dirname(__file__), "models", "exercise_classifier.json"
 )
-REQUIRED_KEYS = ("shoulder", "hip", "knee", "ankle")
 
 
 @dataclass
@@ -37,20 +36,14 @@ def _safe_ratio(num, den):
 
 def extract_features(landmarks):
     """Convert four normalized keypoints into a compact numeric feature vector."""
-    if not landmarks:
-        return None
-    if not all(key in landmarks for key in REQUIRED_KEYS):
+    points = landmark_array(landmarks)
+    if points is None:
         return None
 
-    shoulder = tuple(float(v) for v in landmarks["shoulder"])
-    hip = tuple(float(v) for v in landmarks["hip"])
-    knee = tuple(float(v) for v in landmarks["knee"])
-    ankle = tuple(float(v) for v in landmarks["ankle"])
+    shoulder, hip, knee, ankle = points.astype(np.float64)
 
-    try:
-        knee_angle = float(calculate_angle(hip, knee, ankle))
-        hip_angle = float(calculate_angle(shoulder, hip, knee))
-    except Exception:
+    knee_angle, hip_angle = landmark_angles(points)
+    if math.isnan(knee_angle) or math.isnan(hip_angle):
         return None
 
     torso_len = _point_distance(shoulder, hip)
@@ -80,6 +73,41 @@ def extract_features(landmarks):
     return features
 
 
+def extract_features_batch(points):
+    """`extract_features` for ``(N, 4, 2)`` landmark arrays in one pass.
+
+    Returns an ``(N, 14)`` float32 matrix with the same columns; rows with a
+    zero-length limb are NaN and should be dropped by the caller.
+    """
+    points = np.asarray(points, dtype=np.float64)
+    shoulder, hip, knee, ankle = (points[:, index] for index in range(4))
+    knee_angle, hip_angle = joint_angles(points, LANDMARK_ANGLES).T
+    torso_len = np.linalg.norm(shoulder - hip, axis=1)
+    upper_leg_len = np.linalg.norm(hip - knee, axis=1)
+    lower_leg_len = np.linalg.norm(knee - ankle, axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        upper_ratio = np.where(torso_len != 0, upper_leg_len / torso_len, 0.0)
+        lower_ratio = np.where(upper_leg_len != 0, lower_leg_len / upper_leg_len, 0.0)
+
+    features = np.column_stack(
+        [
+            shoulder - hip,
+            knee - hip,
+            ankle - hip,
+            hip_angle / 180.0,
+            knee_angle / 180.0,
+            torso_len,
+            upper_leg_len,
+            lower_leg_len,
+            upper_ratio,
+            lower_ratio,
+            ankle[:, 1] - shoulder[:, 1],
+        ]
+    ).astype(np.float32)
+    features[np.isnan(knee_angle) | np.isnan(hip_angle)] = np.nan
+    return features
+
+
 class CentroidExerciseModel:
     """Nearest-centroid model persisted as JSON for easy portability."""
 
@@ -194,8 +222,9 @@ class ExerciseClassifier:
             self.source = "heuristic"
             print(f"ExerciseClassifier: failed to load model ({err})")
 
-    def predict(self, landmarks):
-        features = extract_features(landmarks)
+    def predict(self, landmarks, features=None):
+        if features is None:
+            features = extract_features(landmarks)
         if features is None:
             return PredictionResult(exercise="unknown", confidence=0.0, source=self.source)
 
@@ -212,13 +241,12 @@ class ExerciseClassifier:
 
     @staticmethod
     def _predict_heuristic(landmarks):
-        shoulder = landmarks["shoulder"]
-        hip = landmarks["hip"]
-        knee = landmarks["knee"]
-        ankle = landmarks["ankle"]
+        points = landmark_array(landmarks)
+        if points is None:
+            return "unknown", 0.0
+        shoulder, hip, knee, ankle = points
 
-        knee_angle = calculate_angle(hip, knee, ankle)
-        hip_angle = calculate_angle(shoulder, hip, knee)
+        knee_angle, hip_angle = landmark_angles(points)
         vertical_span = ankle[1] - shoulder[1]
         hip_to_ankle_dx = abs(ankle[0] - hip[0])
 
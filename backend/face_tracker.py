@@ -0,0 +1,153 @@
+"""Face detection and tracking for the fallback pose estimator.
+
+The fallback estimator places body landmarks below the first detected face.
+`FaceTracker` keeps that cheap on machines without a model runtime:
+
+* the Haar cascade is loaded once per process and shared by every tracker,
+  so fallback detectors built for degraded sessions do not re-parse it;
+* detection runs on a grayscale copy shrunk to ``GYMBUDDY_FALLBACK_DETECT_WIDTH``
+  and, once a face is known, only in a window around it with the size range
+  narrowed to that face;
+* between re-detections (every ``GYMBUDDY_FALLBACK_REDETECT_FRAMES`` frames)
+  the face is followed by template matching in a small search window, and a
+  poor match triggers a detection straight away.
+"""
+import functools
+import threading
+
+import cv2
+
+try:
+    from .config import env_int
+except ImportError:
+    from config import env_int
+
+
+CASCADE_FILE = "haarcascade_frontalface_default.xml"
+DETECT_WIDTH = env_int("GYMBUDDY_FALLBACK_DETECT_WIDTH", 320)
+REDETECT_FRAMES = env_int("GYMBUDDY_FALLBACK_REDETECT_FRAMES", 5)
+MIN_MATCH_SCORE = 0.6
+# Search margins, in face sizes, around the last face.
+DETECT_MARGIN = 1.0
+TRACK_MARGIN = 0.5
+# detectMultiScale keeps scratch buffers in the classifier, so calls on the
+# shared instance are serialised.
+_CASCADE_LOCK = threading.Lock()
+
+
+@functools.lru_cache(maxsize=None)
+def load_cascade():
+    """The frontal-face cascade, or ``None`` when this OpenCV build lacks it."""
+    data = getattr(cv2, "data", None)
+    if data is None or not hasattr(cv2, "CascadeClassifier"):
+        print("FaceTracker: OpenCV has no Haar cascades, using static landmarks")
+        return None
+    cascade = cv2.CascadeClassifier(data.haarcascades + CASCADE_FILE)
+    if cascade.empty():
+        print(f"FaceTracker: could not load {CASCADE_FILE}, using static landmarks")
+        return None
+    return cascade
+
+
+def _clip_window(box, margin, width, height):
+    x, y, w, h = box
+    pad_x, pad_y = int(w * margin), int(h * margin)
+    x0, y0 = max(0, x - pad_x), max(0, y - pad_y)
+    x1, y1 = min(width, x + w + pad_x), min(height, y + h + pad_y)
+    return x0, y0, x1, y1
+
+
+class FaceTracker:
+    """Per-stream face box tracker; boxes are ``(x, y, w, h)`` in frame pixels."""
+
+    def __init__(self, tracking=True, detect_width=DETECT_WIDTH,
+                 redetect_frames=REDETECT_FRAMES):
+        self.cascade = load_cascade()
+        self.tracking = tracking
+        self.detect_width = max(64, int(detect_width))
+        self.redetect_frames = max(1, int(redetect_frames))
+        self.detections = 0
+        self.tracked = 0
+        self._small = None
+        self._gray = None
+        self.reset()
+
+    def reset(self):
+        self._box = None
+        self._template = None
+        self._since_detect = 0
+
+    def _prepare(self, frame):
+        height, width = frame.shape[:2]
+        scale = min(1.0, self.detect_width / float(width))
+        if scale < 1.0:
+            size = (self.detect_width, max(1, int(round(height * scale))))
+            self._small = cv2.resize(frame, size, dst=self._small, interpolation=cv2.INTER_AREA)
+            frame = self._small
+        if frame.ndim == 3:
+            self._gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=self._gray)
+            return self._gray, scale
+        return frame, scale
+
+    def _detect(self, gray):
+        self.detections += 1
+        height, width = gray.shape[:2]
+        if self._box is not None:
+            x0, y0, x1, y1 = _clip_window(self._box, DETECT_MARGIN, width, height)
+            face = self._box[2]
+            with _CASCADE_LOCK:
+                faces = self.cascade.detectMultiScale(
+                    gray[y0:y1, x0:x1], 1.1, 4,
+                    minSize=(int(face * 0.6), int(face * 0.6)),
+                    maxSize=(int(face * 1.6) + 1, int(face * 1.6) + 1),
+                )
+            if len(faces) > 0:
+                x, y, w, h = faces[0]
+                return (int(x) + x0, int(y) + y0, int(w), int(h))
+        with _CASCADE_LOCK:
+            faces = self.cascade.detectMultiScale(gray, 1.1, 4)
+        if len(faces) > 0:
+            return tuple(int(value) for value in faces[0])
+        return None
+
+    def _track(self, gray):
+        height, width = gray.shape[:2]
+        x0, y0, x1, y1 = _clip_window(self._box, TRACK_MARGIN, width, height)
+        window = gray[y0:y1, x0:x1]
+        th, tw = self._template.shape[:2]
+        if window.shape[0] < th or window.shape[1] < tw:
+            return None
+        scores = cv2.matchTemplate(window, self._template, cv2.TM_CCOEFF_NORMED)
+        _, best, _, (bx, by) = cv2.minMaxLoc(scores)
+        if best < MIN_MATCH_SCORE:
+            return None
+        self.tracked += 1
+        return (x0 + bx, y0 + by, tw, th)
+
+    def update(self, frame):
+        """Return the face box for ``frame`` or ``None``."""
+        if self.cascade is None:
+            return None
+        gray, scale = self._prepare(frame)
+        box = None
+        can_track = self.tracking and self._template is not None
+        due = self._since_detect >= self.redetect_frames
+        if can_track and not due:
+            box = self._track(gray)
+            self._since_detect += 1
+        if box is None:
+            box = self._detect(gray)
+            self._since_detect = 0
+            if box is not None and self.tracking:
+                x, y, w, h = box
+                self._template = gray[y:y + h, x:x + w].copy()
+            elif can_track and due:
+                # A missed periodic re-detection keeps following the face
+                # for as long as the template still matches.
+                box = self._track(gray)
+            if box is None:
+                self._template = None
+        self._box = box if self.tracking else None
+        if box is None:
+            return None
+        return tuple(int(round(value / scale)) for value in box)
@@ -1,14 +1,76 @@
+"""Joint angles and landmark arrays.
+
+`calculate_angle` is the per-frame path: plain float arithmetic, no arrays.
+`joint_angles` computes many angles for many frames in one NumPy call, e.g.
+a whole training set at once. Both measure the angle at the middle point
+with ``atan2(|cross|, dot)``, which stays accurate near 0 and 180 degrees,
+and both return NaN when a limb has zero length instead of warning; NaN
+fails every threshold comparison, so a degenerate frame changes no state.
+"""
+import math
+
 import numpy as np
 
+LANDMARK_NAMES = ("shoulder", "hip", "knee", "ankle")
+# (a, b, c) landmark rows for the angles the counter and classifier use.
+KNEE_ANGLE = (1, 2, 3)
+HIP_ANGLE = (0, 1, 2)
+LANDMARK_ANGLES = np.array([KNEE_ANGLE, HIP_ANGLE], dtype=np.intp)
+
+
 def calculate_angle(a, b, c):
-    a = np.array(a)
-    b = np.array(b)
-    c = np.array(c)
+    """Angle ``abc`` in degrees between 2-D points, or NaN for a zero-length limb."""
+    bax = float(a[0]) - float(b[0])
+    bay = float(a[1]) - float(b[1])
+    bcx = float(c[0]) - float(b[0])
+    bcy = float(c[1]) - float(b[1])
+    if (bax == 0.0 and bay == 0.0) or (bcx == 0.0 and bcy == 0.0):
+        return math.nan
+    return math.degrees(math.atan2(abs(bax * bcy - bay * bcx), bax * bcx + bay * bcy))
+
 
+def joint_angles(points, triples=None):
+    """Angles in degrees at the middle point of each triple, batched.
+
+    ``points`` is ``(..., 3, 2)`` holding ``a, b, c`` when ``triples`` is
+    ``None``, giving ``(...)`` angles. Otherwise ``points`` is ``(..., K, 2)``
+    and ``triples`` a ``(T, 3)`` array of row indices, giving ``(..., T)``.
+    Zero-length limbs give NaN.
+    """
+    points = np.asarray(points, dtype=np.float64)
+    if triples is None:
+        a, b, c = points[..., 0, :], points[..., 1, :], points[..., 2, :]
+    else:
+        triples = np.asarray(triples, dtype=np.intp)
+        a = points[..., triples[:, 0], :]
+        b = points[..., triples[:, 1], :]
+        c = points[..., triples[:, 2], :]
     ba = a - b
     bc = c - b
+    dot = np.einsum("...i,...i->...", ba, bc)
+    cross = ba[..., 0] * bc[..., 1] - ba[..., 1] * bc[..., 0]
+    degenerate = ~(ba.any(axis=-1) & bc.any(axis=-1))
+    return np.where(degenerate, np.nan, np.degrees(np.arctan2(np.abs(cross), dot)))
+
+
+def landmark_angles(points):
+    """``(knee, hip)`` angles in degrees for one ``(4, 2)`` landmark array."""
+    shoulder, hip, knee, ankle = points
+    return calculate_angle(hip, knee, ankle), calculate_angle(shoulder, hip, knee)
+
 
-    cosine = np.dot(ba, bc) / (np.linalg.norm(ba) * np.linalg.norm(bc))
-    angle = np.arccos(np.clip(cosine, -1.0, 1.0))
+def landmark_array(landmarks):
+    """``(4, 2)`` shoulder/hip/knee/ankle array, or ``None`` if one is missing.
 
-    return np.degrees(angle)
+    Accepts a `Pose` (its cached averaged view, no copies) or a four-point
+    dict such as the ones built from client keypoints.
+    """
+    if not landmarks:
+        return None
+    view = getattr(landmarks, "landmarks", None)
+    if callable(view):
+        points = view()
+        return None if np.isnan(points).any() else points
+    if not all(name in landmarks for name in LANDMARK_NAMES):
+        return None
+    return np.array([landmarks[name][:2] for name in LANDMARK_NAMES], dtype=np.float64)
@@ -0,0 +1,63 @@
+"""Per-session ingest stage with latest-frame-wins backpressure.
+
+The browser pushes frames on a timer whether or not the previous one has been
+answered. Instead of queueing every message (and letting latency grow without
+bound), the reader task parks incoming frames in a single-slot mailbox. If a
+newer frame arrives before the pipeline picks up the current one, the older
+frame is dropped and counted, so end-to-end latency stays within roughly one
+inference time.
+"""
+import asyncio
+
+try:
+    from .metrics import FRAMES_DROPPED, FRAMES_IN
+except ImportError:
+    from metrics import FRAMES_DROPPED, FRAMES_IN
+
+
+class LatestFrameSlot:
+    """Single-slot mailbox that always holds the newest unprocessed message."""
+
+    def __init__(self):
+        self._message = None
+        self._ready = asyncio.Event()
+        self.closed = False
+        self.received = 0
+        self.dropped = 0
+
+    def put(self, message):
+        self.received += 1
+        FRAMES_IN.inc()
+        if self._message is not None:
+            self.dropped += 1
+            FRAMES_DROPPED.inc()
+        self._message = message
+        self._ready.set()
+
+    def close(self):
+        self.closed = True
+        self._ready.set()
+
+    async def get(self):
+        """Wait for the next message; returns ``None`` once the slot is closed."""
+        while self._message is None:
+            if self.closed:
+                return None
+            self._ready.clear()
+            await self._ready.wait()
+        message, self._message = self._message, None
+        return message
+
+
+async def pump_messages(ws, slot):
+    """Read websocket messages into ``slot`` until the client disconnects."""
+    try:
+        while True:
+            message = await ws.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            slot.put(message)
+    except Exception as err:
+        print(f"WebSocket reader stopped: {err}")
+    finally:
+        slot.close()
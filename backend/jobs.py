@@ -0,0 +1,406 @@
+"""Offline analysis of recorded workout videos.
+
+Videos are submitted over HTTP (raw upload body or a server-local path) and
+analysed by a `JobManager` that owns its own worker threads and detector
+pool, so long jobs never compete with live `/ws` sessions for detectors,
+drive MoveNet variant step-downs or run on the event loop.
+
+Every job appends its events to an NDJSON spool file in the temp directory
+(one JSON object per line), so only the job summary stays in memory; the
+file is removed when the job drops out of the history::
+
+    {"type": "job", "id": "...", "status": "running", "frames": 900, "fps": 30.0}
+    {"type": "frame", "frame": 0, "t": 0.0, "detected": true, "reps": 0, ...}
+    {"type": "rep", "rep": 1, "frame": 57, "t": 1.9, "exercise": "squat"}
+    {"type": "progress", "frame": 300, "frames": 900, "progress": 0.333}
+    {"type": "done", "status": "completed", "reps": 12, "frames_analysed": 900}
+
+``granularity=rep`` leaves out the per-frame events. Readers may connect at
+any time; the stream replays from the beginning and follows the job until it
+finishes.
+"""
+import functools
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+
+try:
+    from .config import env_float, env_int, env_str
+    from .detector_pool import DetectorPool
+    from .pipeline import FramePipeline
+    from .pose import PoseDetector
+except ImportError:
+    from config import env_float, env_int, env_str
+    from detector_pool import DetectorPool
+    from pipeline import FramePipeline
+    from pose import PoseDetector
+
+
+REPO_ROOT = os.path.normpath(os.path.join(os.path.dirname(__file__), ".."))
+JOB_WORKERS = env_int("GYMBUDDY_JOB_WORKERS", 1)
+JOB_HISTORY = env_int("GYMBUDDY_JOB_HISTORY", 50)
+JOB_MAX_UPLOAD_MB = env_float("GYMBUDDY_JOB_MAX_UPLOAD_MB", 500.0)
+JOB_PROGRESS_SECONDS = env_float("GYMBUDDY_JOB_PROGRESS_SECONDS", 1.0)
+# Directories server-local paths may point into (os.pathsep separated).
+JOB_PATH_ROOTS = [
+    os.path.realpath(path)
+    for path in env_str("GYMBUDDY_JOB_PATH_ROOTS", REPO_ROOT).split(os.pathsep)
+    if path
+]
+
+GRANULARITIES = ("frame", "rep")
+FINAL_STATUSES = ("completed", "cancelled", "failed")
+
+
+class JobError(ValueError):
+    """Raised for job requests that cannot be accepted."""
+
+
+class AnalysisJob:
+    """One video analysis job and its event log."""
+
+    def __init__(self, source, granularity="frame", stride=1, cleanup=False):
+        self.id = uuid.uuid4().hex
+        self.source = source
+        self.granularity = granularity
+        self.stride = max(1, int(stride))
+        self.cleanup = cleanup
+        self.status = "queued"
+        self.created = time.time()
+        self.frames = 0
+        self.frames_read = 0
+        self.frames_analysed = 0
+        self.reps = 0
+        self.error = None
+        fd, self.events_path = tempfile.mkstemp(prefix="gymbuddy-job-", suffix=".ndjson")
+        self._events = os.fdopen(fd, "w", encoding="utf-8")
+        # Bytes of complete lines in the spool file.
+        self._size = 0
+        self._cond = threading.Condition()
+        self._cancelled = threading.Event()
+
+    @property
+    def finished(self):
+        return self.status in FINAL_STATUSES
+
+    @property
+    def progress(self):
+        if not self.frames:
+            return 1.0 if self.status == "completed" else 0.0
+        return round(min(1.0, self.frames_read / self.frames), 3)
+
+    def emit(self, event):
+        with self._cond:
+            self._write(event)
+            self._cond.notify_all()
+
+    def _write(self, event):
+        # Caller holds self._cond.
+        if self._events.closed:
+            return
+        self._events.write(json.dumps(event, separators=(",", ":")) + "\n")
+        self._events.flush()
+        self._size = self._events.tell()
+
+    def start(self):
+        """Mark the job running; ``False`` if it was cancelled while queued."""
+        with self._cond:
+            if self.finished:
+                return False
+            self.status = "running"
+            return True
+
+    def cancel(self):
+        self._cancelled.set()
+        with self._cond:
+            if self.status == "queued":
+                self._finish("cancelled")
+
+    def _finish(self, status, error=None):
+        # Caller holds self._cond.
+        self.status = status
+        self.error = error
+        event = {
+            "type": "done",
+            "id": self.id,
+            "status": status,
+            "reps": self.reps,
+            "frames_read": self.frames_read,
+            "frames_analysed": self.frames_analysed,
+        }
+        if error:
+            event["error"] = error
+        self._write(event)
+        self._events.close()
+        self._cond.notify_all()
+
+    def finish(self, status, error=None):
+        with self._cond:
+            if not self.finished:
+                self._finish(status, error)
+
+    def stream(self, wait_seconds=1.0, chunk_bytes=64 * 1024):
+        """Yield the NDJSON event log as bytes from the start until the job
+        finishes.
+
+        Blocking; Starlette iterates sync generators in its thread pool.
+        """
+        with open(self.events_path, "rb") as handle:
+            offset = 0
+            while True:
+                with self._cond:
+                    while offset >= self._size and not self.finished:
+                        self._cond.wait(wait_seconds)
+                    size = self._size
+                    done = self.finished
+                while offset < size:
+                    chunk = handle.read(min(chunk_bytes, size - offset))
+                    if not chunk:
+                        return
+                    offset += len(chunk)
+                    yield chunk
+                if done:
+                    return
+
+    def discard(self):
+        """Close and remove the spool file; open streams keep their handle."""
+        with self._cond:
+            self._events.close()
+        try:
+            os.remove(self.events_path)
+        except OSError:
+            pass
+
+    def summary(self):
+        return {
+            "id": self.id,
+            "status": self.status,
+            "granularity": self.granularity,
+            "stride": self.stride,
+            "frames": self.frames,
+            "frames_read": self.frames_read,
+            "frames_analysed": self.frames_analysed,
+            "progress": self.progress,
+            "reps": self.reps,
+            "error": self.error,
+            "created": self.created,
+        }
+
+
+class JobManager:
+    """Queues jobs onto dedicated worker threads with their own detectors."""
+
+    def __init__(self, workers=JOB_WORKERS, history=JOB_HISTORY):
+        self.workers = max(1, int(workers))
+        self.history = max(1, int(history))
+        self.pool = ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix="gymbuddy-job"
+        )
+        # Built lazily on the first job so startup stays fast. Job detectors
+        # are never batched with live ones and do not feed the MoveNet
+        # variant governor, so a long video cannot step sessions down. There
+        # is one detector per job thread, so a lease never has to wait;
+        # ``degrade`` only guards against a miscount and never blocks.
+        self.detector_pool = DetectorPool(
+            size=self.workers, policy="degrade", timeout=0,
+            factory=functools.partial(PoseDetector, adaptive=False),
+        )
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def parse_options(options):
+        """Validate ``granularity``/``stride`` from query or JSON options."""
+        granularity = str(options.get("granularity", "frame"))
+        stride = options.get("stride", 1)
+        try:
+            if isinstance(stride, (bool, float)):
+                raise ValueError
+            stride = int(stride)
+        except (TypeError, ValueError):
+            raise JobError(f"stride must be a positive integer, got {stride!r}")
+        JobManager._check_options(granularity, stride)
+        return granularity, stride
+
+    @staticmethod
+    def _check_options(granularity, stride):
+        if granularity not in GRANULARITIES:
+            raise JobError(f"granularity must be one of {', '.join(GRANULARITIES)}")
+        if stride < 1:
+            raise JobError("stride must be at least 1")
+
+    def submit_path(self, path, granularity="frame", stride=1):
+        self._check_options(granularity, stride)
+        real = os.path.realpath(path)
+        if not any(real == root or real.startswith(root + os.sep) for root in JOB_PATH_ROOTS):
+            raise JobError("Path is outside GYMBUDDY_JOB_PATH_ROOTS")
+        if not os.path.isfile(real):
+            raise JobError("Video file not found")
+        return self._submit(AnalysisJob(real, granularity, stride))
+
+    async def submit_upload(self, chunks, granularity="frame", stride=1):
+        """Spool an async iterator of body chunks to a temp file and queue it."""
+        self._check_options(granularity, stride)
+        limit = int(JOB_MAX_UPLOAD_MB * 1024 * 1024)
+        fd, path = tempfile.mkstemp(prefix="gymbuddy-job-", suffix=".video")
+        size = 0
+        try:
+            with os.fdopen(fd, "wb") as handle:
+                async for chunk in chunks:
+                    size += len(chunk)
+                    if size > limit:
+                        raise JobError(f"Upload exceeds {JOB_MAX_UPLOAD_MB:g} MB")
+                    handle.write(chunk)
+            if size == 0:
+                raise JobError("Empty upload")
+            return self._submit(AnalysisJob(path, granularity, stride, cleanup=True))
+        except Exception:
+            os.remove(path)
+            raise
+
+    def _submit(self, job):
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune()
+        job.emit({"type": "job", "id": job.id, "status": job.status})
+        self.pool.submit(self._run, job)
+        return job
+
+    def _prune(self):
+        # Caller holds self._lock; forget the oldest finished jobs.
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(self._jobs) - self.history)]:
+            self._jobs.pop(job_id).discard()
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list_jobs(self):
+        with self._lock:
+            return [job.summary() for job in self._jobs.values()]
+
+    def cancel(self, job_id):
+        job = self.get(job_id)
+        if job is not None:
+            job.cancel()
+        return job
+
+    def _run(self, job):
+        if not job.start():
+            self._cleanup(job)
+            return
+        pose = None
+        capture = None
+        try:
+            pose = self.detector_pool.acquire()
+            pipeline = FramePipeline(pose=pose)
+            capture = cv2.VideoCapture(job.source)
+            if not capture.isOpened():
+                job.finish("failed", "Could not open video")
+                return
+            fps = capture.get(cv2.CAP_PROP_FPS) or 0.0
+            job.frames = max(0, int(capture.get(cv2.CAP_PROP_FRAME_COUNT) or 0))
+            job.emit({
+                "type": "job",
+                "id": job.id,
+                "status": job.status,
+                "frames": job.frames,
+                "fps": round(fps, 3),
+                "backend": pose.backend,
+            })
+            self._analyse(job, pipeline, capture, fps)
+        except Exception as err:
+            print(f"JobManager: job {job.id} failed: {err}")
+            job.finish("failed", str(err))
+        finally:
+            if capture is not None:
+                capture.release()
+            self.detector_pool.release(pose)
+            self._cleanup(job)
+
+    def _analyse(self, job, pipeline, capture, fps):
+        per_frame = job.granularity == "frame"
+        last_progress = time.monotonic()
+        index = -1
+        while not job._cancelled.is_set():
+            if not capture.grab():
+                break
+            index += 1
+            job.frames_read = index + 1
+            if index % job.stride:
+                continue
+            ok, frame = capture.retrieve()
+            if not ok:
+                break
+            # Stage timings are only read for live sessions; don't let them pile up.
+            pipeline.timings = []
+            result = pipeline.process_frame(frame)
+            job.frames_analysed += 1
+            t = round(index / fps, 3) if fps else None
+            if per_frame:
+                job.emit({"type": "frame", "frame": index, "t": t, **result})
+            if result["reps"] > job.reps:
+                job.reps = result["reps"]
+                job.emit({
+                    "type": "rep",
+                    "rep": job.reps,
+                    "frame": index,
+                    "t": t,
+                    "exercise": result["exercise"],
+                    "feedback": result["feedback"],
+                })
+            now = time.monotonic()
+            if now - last_progress >= JOB_PROGRESS_SECONDS:
+                last_progress = now
+                job.emit({
+                    "type": "progress",
+                    "frame": index,
+                    "frames": job.frames,
+                    "progress": job.progress,
+                })
+
+        if job._cancelled.is_set():
+            job.finish("cancelled")
+        else:
+            job.frames = job.frames or job.frames_read
+            job.finish("completed")
+
+    @staticmethod
+    def _cleanup(job):
+        if job.cleanup:
+            try:
+                os.remove(job.source)
+            except OSError:
+                pass
+
+    def stats(self):
+        with self._lock:
+            statuses = [job.status for job in self._jobs.values()]
+        return {
+            "workers": self.workers,
+            "jobs": len(statuses),
+            "queued": statuses.count("queued"),
+            "running": statuses.count("running"),
+            "detector_pool": self.detector_pool.stats(),
+        }
+
+    def shutdown(self):
+        with self._lock:
+            jobs = list(self._jobs.values())
+        for job in jobs:
+            queued = job.status == "queued"
+            job.cancel()
+            if queued:
+                # Cancelled futures never reach _run, so remove uploads here.
+                self._cleanup(job)
+        self.pool.shutdown(wait=False, cancel_futures=True)
+        for job in jobs:
+            job.discard()
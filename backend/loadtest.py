@@ -0,0 +1,302 @@
+"""Simulate N concurrent camera clients against `/ws` for capacity planning.
+
+Frames come from a folder of images or a video file, are resized and JPEG
+encoded once up front, then replayed by every client with the same framing as
+`frontend/src/components/CameraView.jsx` (``binary.v1`` with frame header by
+default, or legacy base64 text).
+
+Example (spawns a local server on a free port):
+
+    python backend/loadtest.py --frames-dir dataset/train/squat --clients 20 --fps 6.67 --spawn
+
+Round-trip latency is matched by ``frame_id`` in binary mode. Text mode has no
+frame ids, so each response is matched to the newest frame sent before it.
+Server CPU comes from the ``gymbuddy_process_cpu_seconds`` gauge on
+`/metrics`.
+"""
+import argparse
+import asyncio
+import base64
+import json
+import os
+import socket
+import struct
+import subprocess
+import sys
+import time
+import urllib.request
+from urllib.parse import urlsplit, urlunsplit
+
+import cv2
+import numpy as np
+
+try:
+    import websockets
+except ImportError:
+    websockets = None
+
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
+FRAME_HEADER = struct.Struct("!BBIQ")
+REPO_ROOT = os.path.normpath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+def load_frames(args):
+    images = []
+    if args.video:
+        cap = cv2.VideoCapture(args.video)
+        while len(images) < args.max_frames:
+            ok, frame = cap.read()
+            if not ok:
+                break
+            images.append(frame)
+        cap.release()
+    elif args.frames_dir:
+        for name in sorted(os.listdir(args.frames_dir)):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                frame = cv2.imread(os.path.join(args.frames_dir, name))
+                if frame is not None:
+                    images.append(frame)
+            if len(images) >= args.max_frames:
+                break
+    else:
+        # Synthetic noise frames keep the harness usable without a dataset.
+        rng = np.random.default_rng(0)
+        images = [
+            rng.integers(0, 255, (args.height, args.width, 3), dtype=np.uint8)
+            for _ in range(10)
+        ]
+
+    if not images:
+        raise SystemExit("No frames loaded; check --frames-dir / --video")
+
+    encoded = []
+    for frame in images:
+        frame = cv2.resize(frame, (args.width, args.height))
+        ok, jpeg = cv2.imencode(
+            ".jpg", frame, [int(cv2.IMWRITE_JPEG_QUALITY), args.quality]
+        )
+        if ok:
+            encoded.append(jpeg.tobytes())
+    return encoded
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    return float(np.percentile(np.asarray(values), pct))
+
+
+class ClientStats:
+    def __init__(self):
+        self.sent = 0
+        self.received = 0
+        self.errors = 0
+        self.server_dropped = 0
+        self.latencies = []
+        self.failed = None
+
+
+async def run_client(index, args, frames, deadline, stats):
+    await asyncio.sleep(index * args.ramp_up / max(1, args.clients))
+    binary = args.protocol == "binary.v1"
+    url = args.url + ("?protocol=binary.v1" if binary else "")
+    pending = {}
+    last_sent = [None]
+
+    try:
+        async with websockets.connect(url, max_size=None) as ws:
+            async def receiver():
+                async for raw in ws:
+                    now = time.perf_counter()
+                    try:
+                        data = json.loads(raw)
+                    except (TypeError, ValueError):
+                        continue
+                    if data.get("type"):
+                        continue
+                    stats.received += 1
+                    if data.get("error"):
+                        stats.errors += 1
+                    stats.server_dropped = max(stats.server_dropped, data.get("dropped", 0))
+                    frame_id = data.get("frame_id")
+                    if frame_id is not None:
+                        started = pending.pop(frame_id, None)
+                        # Older frames were dropped by the server; forget them.
+                        for stale in [key for key in pending if key < frame_id]:
+                            del pending[stale]
+                    else:
+                        started = last_sent[0]
+                    if started is not None:
+                        stats.latencies.append(now - started)
+
+            receive_task = asyncio.create_task(receiver())
+            interval = 1.0 / args.fps
+            frame_id = 0
+            next_send = time.perf_counter()
+            while time.perf_counter() < deadline:
+                jpeg = frames[frame_id % len(frames)]
+                sent_at = time.perf_counter()
+                if binary:
+                    header = FRAME_HEADER.pack(1, 0, frame_id, int(time.time() * 1000))
+                    await ws.send(header + jpeg)
+                    pending[frame_id] = sent_at
+                else:
+                    await ws.send(base64.b64encode(jpeg).decode("ascii"))
+                last_sent[0] = sent_at
+                stats.sent += 1
+                frame_id += 1
+                next_send += interval
+                await asyncio.sleep(max(0.0, next_send - time.perf_counter()))
+
+            # Give in-flight frames a moment to come back.
+            await asyncio.sleep(args.drain)
+            receive_task.cancel()
+    except Exception as err:
+        stats.failed = str(err)
+
+
+def metrics_url(ws_url):
+    parts = urlsplit(ws_url)
+    scheme = "https" if parts.scheme == "wss" else "http"
+    return urlunsplit((scheme, parts.netloc, "/metrics", "", ""))
+
+
+def read_server_cpu(url):
+    try:
+        with urllib.request.urlopen(url, timeout=2) as response:
+            for line in response.read().decode("utf-8").splitlines():
+                if line.startswith("gymbuddy_process_cpu_seconds "):
+                    return float(line.split()[1])
+    except Exception:
+        pass
+    return None
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def spawn_server(port):
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.main:app",
+         "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=REPO_ROOT,
+    )
+    health = f"http://127.0.0.1:{port}/health"
+    for _ in range(600):
+        if process.poll() is not None:
+            raise SystemExit("Spawned server exited during startup")
+        try:
+            urllib.request.urlopen(health, timeout=1).close()
+            return process
+        except Exception:
+            time.sleep(0.1)
+    process.terminate()
+    raise SystemExit("Spawned server did not become healthy")
+
+
+async def run(args, frames):
+    stats = [ClientStats() for _ in range(args.clients)]
+    cpu_url = metrics_url(args.url)
+    cpu_start = read_server_cpu(cpu_url)
+    started = time.perf_counter()
+    deadline = started + args.ramp_up + args.duration
+    await asyncio.gather(*(
+        run_client(index, args, frames, deadline, stats[index])
+        for index in range(args.clients)
+    ))
+    elapsed = time.perf_counter() - started
+    cpu_end = read_server_cpu(cpu_url)
+    return stats, elapsed, cpu_start, cpu_end
+
+
+def report(stats, elapsed, cpu_start, cpu_end):
+    sent = sum(s.sent for s in stats)
+    received = sum(s.received for s in stats)
+    errors = sum(s.errors for s in stats)
+    dropped = sum(s.server_dropped for s in stats)
+    failed = [s.failed for s in stats if s.failed]
+    latencies = [value for s in stats for value in s.latencies]
+
+    print("=" * 60)
+    print("GymBuddy /ws load test")
+    print("=" * 60)
+    print(f"  Clients:            {len(stats)} ({len(failed)} failed to connect/run)")
+    print(f"  Duration:           {elapsed:.1f} s")
+    print(f"  Frames sent:        {sent} ({sent / elapsed:.1f}/s)")
+    print(f"  Responses:          {received} ({received / elapsed:.1f}/s)")
+    print(f"  Dropped by server:  {dropped}")
+    print(f"  Unanswered:         {max(0, sent - received - dropped)}")
+    print(f"  Error responses:    {errors}")
+    print(
+        "  Round trip (ms):    "
+        f"p50 {percentile(latencies, 50) * 1000:.1f}  "
+        f"p95 {percentile(latencies, 95) * 1000:.1f}  "
+        f"p99 {percentile(latencies, 99) * 1000:.1f}"
+    )
+    if cpu_start is not None and cpu_end is not None:
+        cpu = cpu_end - cpu_start
+        print(f"  Server CPU:         {cpu:.1f} s ({cpu / elapsed * 100:.0f}% of one core)")
+    else:
+        print("  Server CPU:         unavailable (/metrics not reachable)")
+    for message in sorted(set(failed))[:5]:
+        print(f"  Client failure:     {message}")
+    print("=" * 60)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Replay camera frames through /ws from many simulated clients."
+    )
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--frames-dir", help="Folder of images to replay.")
+    source.add_argument("--video", help="Video file to replay.")
+    parser.add_argument("--url", default="ws://127.0.0.1:8010/ws", help="WebSocket URL.")
+    parser.add_argument("--spawn", action="store_true", help="Start a local uvicorn server on a free port.")
+    parser.add_argument("--clients", type=int, default=10, help="Concurrent clients.")
+    parser.add_argument("--fps", type=float, default=1000.0 / 150.0, help="Frames per second per client (CameraView default: 6.67).")
+    parser.add_argument("--width", type=int, default=640, help="Frame width sent to the server.")
+    parser.add_argument("--height", type=int, default=480, help="Frame height sent to the server.")
+    parser.add_argument("--quality", type=int, default=92, help="JPEG quality.")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds of steady load after ramp-up.")
+    parser.add_argument("--ramp-up", type=float, default=5.0, help="Seconds over which clients connect.")
+    parser.add_argument("--drain", type=float, default=1.0, help="Seconds to wait for in-flight responses.")
+    parser.add_argument("--max-frames", type=int, default=300, help="Maximum frames to preload.")
+    parser.add_argument(
+        "--protocol",
+        default="binary.v1",
+        choices=["binary.v1", "text"],
+        help="Frame framing; matches CameraView's VITE_WS_PROTOCOL.",
+    )
+    args = parser.parse_args()
+
+    if websockets is None:
+        raise SystemExit("The 'websockets' package is required: pip install websockets")
+    if args.fps <= 0 or args.clients <= 0:
+        raise SystemExit("--fps and --clients must be positive")
+
+    frames = load_frames(args)
+    print(f"Loaded {len(frames)} frame(s) at {args.width}x{args.height}")
+
+    server = None
+    if args.spawn:
+        port = free_port()
+        args.url = f"ws://127.0.0.1:{port}/ws"
+        print(f"Starting local server on port {port}...")
+        server = spawn_server(port)
+
+    try:
+        stats, elapsed, cpu_start, cpu_end = asyncio.run(run(args, frames))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=10)
+
+    report(stats, elapsed, cpu_start, cpu_end)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,47 @@
-from fastapi import FastAPI, WebSocket
+import asyncio
+import time
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, HTTPException, Request, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
-from starlette.websockets import WebSocketDisconnect
-import cv2
-import numpy as np
-import base64
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 import sys
 import os
 
 # Add parent directory to path for imports
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from pose import PoseDetector
-from squat import SquatCounter
-from exercise_classifier import ExerciseClassifier
+from admission import BUSY_CLOSE_CODE, AdmissionController
+from control import CaptureController
+from executor import InferenceExecutor
+from ingest import LatestFrameSlot, pump_messages
+from jobs import JobError, JobManager
+from metrics import ACTIVE_SESSIONS, FRAMES_OUT, REGISTRY, STAGE_LATENCY
+from model_store import log_model_report, model_report
+from protocol import INPUT_KEYPOINTS, PROTOCOL_BINARY_V1, negotiate, negotiate_input
+from responses import ResponseWriter
+from session_store import SessionManager
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # Models are never downloaded mid-session; say what is missing up front.
+    log_model_report()
+    app.state.executor = InferenceExecutor()
+    await app.state.executor.start()
+    app.state.sessions = SessionManager()
+    app.state.admission = AdmissionController()
+    app.state.jobs = JobManager()
+    REGISTRY.add_collector(app.state.executor.collect_metrics)
+    try:
+        yield
+    finally:
+        app.state.jobs.shutdown()
+        app.state.executor.shutdown()
+        app.state.sessions.close()
 
-app = FastAPI()
+
+app = FastAPI(lifespan=lifespan)
 
 # Add CORS middleware
 app.add_middleware(
@@ -32,6 +59,9 @@ async def root():
         "status": "ok",
         "docs": "/docs",
         "health": "/health",
+        "stats": "/stats",
+        "metrics": "/metrics",
+        "jobs": "/jobs",
         "websocket": "/ws",
     }
 
@@ -41,88 +71,189 @@ async def health():
     return {"status": "ok"}
 
 
+@app.get("/stats")
+async def stats():
+    return {
+        **app.state.executor.stats(),
+        "admission": app.state.admission.stats(),
+        "jobs": app.state.jobs.stats(),
+        "models": model_report(),
+    }
+
+
+@app.get("/metrics")
+async def metrics():
+    return PlainTextResponse(
+        REGISTRY.render(), media_type="text/plain; version=0.0.4"
+    )
+
+
+@app.post("/jobs", status_code=202)
+async def create_job(request: Request):
+    """Queue a video: raw upload body, or JSON ``{"path": ...}`` on the server."""
+    jobs = request.app.state.jobs
+    options = dict(request.query_params)
+    try:
+        if request.headers.get("content-type", "").startswith("application/json"):
+            try:
+                payload = await request.json()
+            except ValueError:
+                raise JobError("Invalid JSON body")
+            if not isinstance(payload, dict) or not payload.get("path"):
+                raise JobError("JSON body requires a 'path'")
+            options.update({k: v for k, v in payload.items() if k != "path"})
+            granularity, stride = jobs.parse_options(options)
+            job = await asyncio.to_thread(
+                jobs.submit_path, str(payload["path"]), granularity, stride
+            )
+        else:
+            granularity, stride = jobs.parse_options(options)
+            job = await jobs.submit_upload(request.stream(), granularity, stride)
+    except (JobError, ValueError) as err:
+        raise HTTPException(status_code=400, detail=str(err))
+    return {**job.summary(), "results": f"/jobs/{job.id}/results"}
+
+
+@app.get("/jobs")
+async def list_jobs():
+    return app.state.jobs.list_jobs()
+
+
+def get_job(job_id):
+    job = app.state.jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job")
+    return job
+
+
+@app.get("/jobs/{job_id}")
+async def job_status(job_id: str):
+    return get_job(job_id).summary()
+
+
+@app.get("/jobs/{job_id}/results")
+async def job_results(job_id: str):
+    return StreamingResponse(get_job(job_id).stream(), media_type="application/x-ndjson")
+
+
+@app.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    job = get_job(job_id)
+    job.cancel()
+    return JSONResponse(job.summary(), status_code=202)
+
+
 @app.websocket("/ws")
 async def websocket_endpoint(ws: WebSocket):
-    await ws.accept()
-    
-    # Create new instances per connection to avoid shared state
-    pose = PoseDetector()
-    squat = SquatCounter()
-    classifier = ExerciseClassifier()
-
-    while True:
-        try:
-            data = await ws.receive_text()
-             
-            # Validate and decode image data
+    protocol, subprotocol = negotiate(ws)
+    await ws.accept(subprotocol=subprotocol)
+    admission = ws.app.state.admission.admit()
+    if admission is None:
+        await ws.send_json(ws.app.state.admission.busy_message())
+        await ws.close(code=BUSY_CLOSE_CODE)
+        return
+    try:
+        await serve_session(ws, protocol, admission)
+    finally:
+        admission.release()
+
+
+async def serve_session(ws, protocol, admission):
+    writer = ResponseWriter.from_query(ws.query_params)
+    sessions = ws.app.state.sessions
+    requested_session = ws.query_params.get("session")
+    session_id, state = await asyncio.to_thread(sessions.resume, requested_session)
+    writer.restore(state)
+    if (protocol == PROTOCOL_BINARY_V1 or writer.negotiated or admission.degraded
+            or requested_session is not None):
+        await ws.send_json({
+            "type": "hello",
+            "protocol": protocol,
+            "session_id": session_id,
+            "resumed": state is not None,
+            **writer.hello_fields(),
+            **admission.hello_fields(),
+        })
+
+    executor = ws.app.state.executor
+    # Each connection gets its own pipeline state; the blocking
+    # decode -> pose -> classify work runs on the inference executor.
+    session = await executor.open_session(
+        keypoints_only=negotiate_input(ws) == INPUT_KEYPOINTS,
+        state=state,
+        degraded=admission.degraded,
+        multi_person=ws.query_params.get("people") == "multi",
+    )
+    ACTIVE_SESSIONS.inc()
+
+    controller = None
+    if ws.query_params.get("control") == "1":
+        controller = CaptureController(executor.input_size)
+        await writer.send_control(ws, controller.maybe_update(executor.load, force=True))
+
+    # Frames that arrive while inference is busy replace each other, so only
+    # the newest one is analysed next.
+    slot = LatestFrameSlot()
+    reader = asyncio.create_task(pump_messages(ws, slot))
+    heartbeats = asyncio.create_task(writer.run_heartbeats(ws)) if writer.events else None
+    # Last good counter state, for error results in process mode.
+    last_state = dict(state or {})
+
+    try:
+        while True:
+            # Over-budget sessions wait here; newer frames keep replacing
+            # the parked one meanwhile.
+            delay = admission.delay()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            message = await slot.get()
+            if message is None:
+                break
+
+            frame_started = admission.start_frame()
             try:
-                if data.startswith("data:") and "," in data:
-                    data = data.split(",", 1)[1]
-                img_bytes = base64.b64decode(data, validate=True)
-                np_arr = np.frombuffer(img_bytes, np.uint8)
-                frame = cv2.imdecode(np_arr, cv2.IMREAD_COLOR)
-                
-                if frame is None:
-                    await ws.send_json({
+                started = time.perf_counter()
+                result = await session.submit(message)
+                if controller is not None:
+                    controller.observe(time.perf_counter() - started)
+                admission.finish_frame(frame_started, session.cpu_seconds)
+            except Exception as e:
+                print(f"WebSocket error: {e}")
+                if session.pipeline is not None:
+                    result = session.pipeline.empty_result(error=str(e))
+                else:
+                    result = {
                         "detected": False,
-                        "reps": squat.reps,
+                        "reps": last_state.get("reps", 0),
+                        "stage": last_state.get("stage", "up"),
                         "feedback": "",
                         "exercise": "unknown",
                         "confidence": 0.0,
-                        "classifier": classifier.source,
-                        "error": "Invalid image data"
-                    })
-                    continue
-                    
-            except Exception as e:
-                await ws.send_json({
-                    "detected": False,
-                    "reps": squat.reps,
-                    "feedback": "",
-                    "exercise": "unknown",
-                    "confidence": 0.0,
-                    "classifier": classifier.source,
-                    "error": f"Failed to decode image: {str(e)}"
-                })
-                continue
-
-            landmarks = pose.process(frame)
-            if not landmarks:
-                await ws.send_json({
-                    "detected": False,
-                    "reps": squat.reps,
-                    "feedback": "",
-                    "exercise": "unknown",
-                    "confidence": 0.0,
-                    "classifier": classifier.source,
-                })
-                continue
-
-            reps, feedback = squat.analyze(landmarks)
-            prediction = classifier.predict(landmarks)
-
-            await ws.send_json({
-                "detected": True,
-                "reps": reps,
-                "feedback": feedback or "",
-                "exercise": prediction.exercise,
-                "confidence": round(float(prediction.confidence), 4),
-                "classifier": prediction.source,
-            })
-            
-        except WebSocketDisconnect:
-            break
-        except Exception as e:
-            print(f"WebSocket error: {e}")
-            try:
-                await ws.send_json({
-                    "detected": False,
-                    "reps": squat.reps if 'squat' in locals() else 0,
-                    "feedback": "",
-                    "exercise": "unknown",
-                    "confidence": 0.0,
-                    "classifier": classifier.source if 'classifier' in locals() else "heuristic",
-                    "error": str(e)
-                })
-            except Exception:
-                break
+                        "classifier": "heuristic",
+                        "error": str(e),
+                    }
+            result["dropped"] = slot.dropped
+            if admission.degraded:
+                result["degraded"] = True
+            if "error" not in result:
+                # A failed frame must not overwrite the resumable state.
+                last_state = result
+                sessions.update(session_id, result)
+            started = time.perf_counter()
+            sent = await writer.send(ws, result)
+            if sent:
+                STAGE_LATENCY.labels("send").observe(time.perf_counter() - started)
+                FRAMES_OUT.inc(sent)
+            if controller is not None:
+                update = controller.maybe_update(executor.load)
+                if update is not None:
+                    await writer.send_control(ws, update)
+    except Exception as e:
+        print(f"WebSocket closed: {e}")
+    finally:
+        reader.cancel()
+        if heartbeats is not None:
+            heartbeats.cancel()
+        ACTIVE_SESSIONS.dec()
+        sessions.release(session_id)
+        await session.close()
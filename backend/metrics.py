@@ -0,0 +1,196 @@
+"""Minimal in-process metrics with Prometheus text exposition.
+
+The hot path only does a ``bisect`` and a few integer/float additions per
+observation, so recording stays well under a microsecond and can be left on
+in production. Updates are not locked: under heavy thread contention a rare
+increment may be lost, which is acceptable for monitoring data.
+"""
+import bisect
+import time
+
+LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5,
+)
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    body = ",".join(f'{name}="{value}"' for name, value in pairs)
+    return "{" + body + "}"
+
+
+class _HistogramChild:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._children = {}
+
+    def labels(self, *values):
+        child = self._children.get(values)
+        if child is None:
+            child = self._children.setdefault(values, _HistogramChild(self.buckets))
+        return child
+
+    def observe(self, value, *labelvalues):
+        self.labels(*labelvalues).observe(value)
+
+    def render(self):
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} histogram",
+        ]
+        for values, child in sorted(self._children.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, child.counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames, values, ("le", repr(bound)))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, values, ("le", "+Inf"))
+            lines.append(f"{self.name}_bucket{labels} {child.count}")
+            labels = _format_labels(self.labelnames, values)
+            lines.append(f"{self.name}_sum{labels} {child.sum}")
+            lines.append(f"{self.name}_count{labels} {child.count}")
+        return lines
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+
+    def inc(self, amount=1, *labelvalues):
+        self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def render(self):
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+        if not self._values and not self.labelnames:
+            lines.append(f"{self.name} 0")
+        for values, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, values)} {value}")
+        return lines
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value, *labelvalues):
+        self._values[labelvalues] = value
+
+    def dec(self, amount=1, *labelvalues):
+        self.inc(-amount, *labelvalues)
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector):
+        """Register a callable that refreshes gauges right before rendering."""
+        self._collectors.append(collector)
+
+    def render(self):
+        for collector in self._collectors:
+            try:
+                collector()
+            except Exception as err:
+                print(f"Metrics collector failed: {err}")
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_LATENCY = REGISTRY.register(Histogram(
+    "gymbuddy_stage_seconds",
+    "Latency of each analysis pipeline stage.",
+    ("stage",),
+))
+POSE_LATENCY = REGISTRY.register(Histogram(
+    "gymbuddy_pose_seconds",
+    "Pose detector latency per backend.",
+    ("backend",),
+))
+FRAMES_IN = REGISTRY.register(Counter(
+    "gymbuddy_frames_in_total", "Frames received from clients."
+))
+FRAMES_OUT = REGISTRY.register(Counter(
+    "gymbuddy_frames_out_total", "Responses sent to clients."
+))
+FRAMES_DROPPED = REGISTRY.register(Counter(
+    "gymbuddy_frames_dropped_total", "Frames replaced by a newer frame before analysis."
+))
+ACTIVE_SESSIONS = REGISTRY.register(Gauge(
+    "gymbuddy_active_sessions", "Open /ws sessions."
+))
+DETECTOR_POOL = REGISTRY.register(Gauge(
+    "gymbuddy_detector_pool", "Detector pool occupancy.", ("state",)
+))
+BATCH_QUEUE_DEPTH = REGISTRY.register(Gauge(
+    "gymbuddy_batch_queue_depth", "Frames waiting for the MoveNet batch scheduler."
+))
+BATCH_SIZE = REGISTRY.register(Histogram(
+    "gymbuddy_batch_size", "Frames per batched MoveNet invocation.", (),
+    buckets=(1, 2, 4, 8, 16, 32),
+))
+SESSIONS_ADMITTED = REGISTRY.register(Counter(
+    "gymbuddy_sessions_admitted_total", "Sessions admitted, by mode.", ("mode",)
+))
+SESSIONS_REJECTED = REGISTRY.register(Counter(
+    "gymbuddy_sessions_rejected_total", "Sessions refused with a busy reply."
+))
+FRAMES_THROTTLED = REGISTRY.register(Counter(
+    "gymbuddy_frames_throttled_total", "Analyses delayed by a session frame or CPU budget."
+))
+POSE_SKIPPED = REGISTRY.register(Counter(
+    "gymbuddy_pose_skipped_total", "Frames that reused the previous pose because nothing moved."
+))
+PROCESS_CPU = REGISTRY.register(Gauge(
+    "gymbuddy_process_cpu_seconds", "CPU time consumed by this server process."
+))
+
+REGISTRY.add_collector(lambda: PROCESS_CPU.set(time.process_time()))
+
+
+def record_stages(timings, backend=None):
+    """Record ``(stage, seconds)`` pairs produced by `FramePipeline`."""
+    for stage, seconds in timings:
+        if stage == "pose":
+            POSE_LATENCY.labels(backend or "unknown").observe(seconds)
+        elif stage == "pose_skipped":
+            POSE_SKIPPED.inc()
+        STAGE_LATENCY.labels(stage).observe(seconds)
@@ -0,0 +1,352 @@
+"""Local model files for the pose backends.
+
+Runtime code only ever loads models from ``GYMBUDDY_MODEL_DIR`` (default
+`backend/models`). Nothing is downloaded while a detector is being built;
+missing or corrupt models are reported once at startup and the affected
+backend is skipped.
+
+Models are provisioned ahead of time with `download_model.py`, which streams
+each file to a temporary file next to the target, checks it, renames it into
+place atomically and records its size and SHA-256 in ``manifest.json``::
+
+    {"version": 1, "models": {"movenet_lightning": {
+        "file": "movenet_lightning.tflite", "size": 4758112,
+        "sha256": "...", "source": "https://...", "provisioned_at": "..."}}}
+
+At runtime a model counts as present when the file exists, starts with the
+expected magic bytes and matches the manifest size. ``GYMBUDDY_MODEL_VERIFY``
+set to ``sha256`` also re-hashes files at startup.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import urllib.request
+from datetime import datetime, timezone
+
+try:
+    from .config import env_str
+except ImportError:
+    from config import env_str
+
+
+MODEL_DIR = env_str("GYMBUDDY_MODEL_DIR", os.path.join(os.path.dirname(__file__), "models"))
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 1
+MODEL_VERIFY = env_str("GYMBUDDY_MODEL_VERIFY", "size").lower()
+DOWNLOAD_TIMEOUT = 30
+CHUNK_SIZE = 1 << 16
+
+# ``magic`` is ``(offset, bytes)`` checked at load time; it rejects HTML error
+# pages saved under a model name. ``sha256`` pins a known digest when set.
+# ``optional`` models are alternatives: their backend needs at least one of
+# them (see `movenet_variants.py`), but not all.
+MODELS = {
+    "movenet_thunder": {
+        "file": "movenet_thunder.tflite",
+        "backend": "movenet_local",
+        "urls": [
+            "https://tfhub.dev/google/lite-model/movenet/singlepose/thunder/tflite/float16/4?lite-format=tflite",
+        ],
+        "magic": (4, b"TFL3"),
+        "sha256": None,
+        "optional": True,
+    },
+    "movenet_thunder_int8": {
+        "file": "movenet_thunder_int8.tflite",
+        "backend": "movenet_local",
+        "urls": [
+            "https://tfhub.dev/google/lite-model/movenet/singlepose/thunder/tflite/int8/4?lite-format=tflite",
+        ],
+        "magic": (4, b"TFL3"),
+        "sha256": None,
+        "optional": True,
+    },
+    "movenet_lightning": {
+        "file": "movenet_lightning.tflite",
+        "backend": "movenet_local",
+        "urls": [
+            "https://tfhub.dev/google/lite-model/movenet/singlepose/lightning/4?lite-format=tflite",
+        ],
+        "magic": (4, b"TFL3"),
+        "sha256": None,
+        "optional": True,
+    },
+    "movenet_lightning_int8": {
+        "file": "movenet_lightning_int8.tflite",
+        "backend": "movenet_local",
+        "urls": [
+            "https://tfhub.dev/google/lite-model/movenet/singlepose/lightning/tflite/int8/4?lite-format=tflite",
+        ],
+        "magic": (4, b"TFL3"),
+        "sha256": None,
+        "optional": True,
+    },
+    "movenet_multipose": {
+        "file": "movenet_multipose_lightning.tflite",
+        "backend": "movenet_multipose",
+        "urls": [
+            "https://tfhub.dev/google/lite-model/movenet/multipose/lightning/tflite/float16/1?lite-format=tflite",
+        ],
+        "magic": (4, b"TFL3"),
+        "sha256": None,
+    },
+    "pose_landmarker_lite": {
+        "file": "pose_landmarker_lite.task",
+        "backend": "tasks",
+        "urls": [
+            "https://storage.googleapis.com/mediapipe-models/pose_landmarker/pose_landmarker_lite/float16/latest/pose_landmarker_lite.task",
+            "https://storage.googleapis.com/mediapipe-tasks/python/pose_landmarker/lite/pose_landmarker_lite.task",
+        ],
+        "magic": (0, b"PK"),
+        "sha256": None,
+    },
+    "openpose_coco_prototxt": {
+        "file": "pose_deploy_linevec.prototxt",
+        "backend": "openpose",
+        "urls": [
+            "https://raw.githubusercontent.com/opencv/opencv_extra/master/testdata/dnn/pose_deploy_linevec.prototxt",
+        ],
+        "magic": None,
+        "sha256": None,
+    },
+    "openpose_coco_caffemodel": {
+        "file": "pose_iter_440000.caffemodel",
+        "backend": "openpose",
+        "urls": [
+            "http://posefs1.perception.cs.cmu.edu/OpenPose/models/pose/coco/pose_iter_440000.caffemodel",
+        ],
+        "magic": None,
+        "sha256": None,
+    },
+}
+
+
+class ModelMissingError(FileNotFoundError):
+    """Raised when a backend asks for a model that is not provisioned."""
+
+
+def model_path(name, model_dir=None):
+    return os.path.join(model_dir or MODEL_DIR, MODELS[name]["file"])
+
+
+def models_for_backend(backend):
+    return [name for name, spec in MODELS.items() if spec["backend"] == backend]
+
+
+def load_manifest(model_dir=None):
+    path = os.path.join(model_dir or MODEL_DIR, MANIFEST_NAME)
+    try:
+        with open(path, "r", encoding="utf-8") as handle:
+            manifest = json.load(handle)
+    except (OSError, ValueError):
+        return {"version": MANIFEST_VERSION, "models": {}}
+    manifest.setdefault("models", {})
+    return manifest
+
+
+def atomic_write(path, data):
+    """Write ``data`` (bytes) to ``path`` via a temp file and rename."""
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as handle:
+            handle.write(data)
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def save_manifest(manifest, model_dir=None):
+    data = json.dumps(manifest, indent=2, sort_keys=True).encode("utf-8") + b"\n"
+    atomic_write(os.path.join(model_dir or MODEL_DIR, MANIFEST_NAME), data)
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for chunk in iter(lambda: handle.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _magic_ok(path, magic):
+    if magic is None:
+        return True
+    offset, expected = magic
+    with open(path, "rb") as handle:
+        handle.seek(offset)
+        return handle.read(len(expected)) == expected
+
+
+def check_model(name, verify=None, model_dir=None, manifest=None):
+    """Return ``(ok, reason)`` for one model without touching the network."""
+    spec = MODELS[name]
+    path = model_path(name, model_dir)
+    if not os.path.isfile(path):
+        return False, "missing"
+    try:
+        if not _magic_ok(path, spec["magic"]):
+            return False, "not a valid model file (wrong magic bytes)"
+    except OSError as err:
+        return False, f"unreadable: {err}"
+
+    if manifest is None:
+        manifest = load_manifest(model_dir)
+    entry = manifest["models"].get(name)
+    if entry is None:
+        # Placed by hand: usable, but unverified.
+        return True, "not in manifest"
+    size = os.path.getsize(path)
+    if entry.get("size") is not None and size != entry["size"]:
+        return False, f"size {size} != manifest {entry['size']}"
+    if (verify or MODEL_VERIFY) == "sha256" and entry.get("sha256"):
+        if file_sha256(path) != entry["sha256"]:
+            return False, "sha256 mismatch"
+    return True, "ok"
+
+
+def require_model(name, model_dir=None):
+    """Return the local path of ``name`` or raise `ModelMissingError`."""
+    ok, reason = check_model(name, model_dir=model_dir)
+    if not ok:
+        raise ModelMissingError(
+            f"Model '{name}' {reason} at {model_path(name, model_dir)}; "
+            f"run: python download_model.py {name}"
+        )
+    return model_path(name, model_dir)
+
+
+def backend_models_ready(backend, model_dir=None):
+    """True when every required model and at least one model is present."""
+    ready = {
+        name: check_model(name, model_dir=model_dir)[0]
+        for name in models_for_backend(backend)
+    }
+    required = [name for name in ready if not MODELS[name].get("optional")]
+    return any(ready.values()) and all(ready[name] for name in required)
+
+
+def model_report(model_dir=None, verify=None):
+    """Status of every known model, for startup logs and `/stats`."""
+    manifest = load_manifest(model_dir)
+    report = {}
+    for name in MODELS:
+        ok, reason = check_model(name, verify=verify, model_dir=model_dir, manifest=manifest)
+        report[name] = {"ok": ok, "status": reason, "backend": MODELS[name]["backend"]}
+    return report
+
+
+def log_model_report(model_dir=None):
+    """Print missing models once, at startup.
+
+    A missing optional model is only reported when its backend has no usable
+    alternative.
+    """
+    report = model_report(model_dir)
+    for name, status in report.items():
+        if status["ok"]:
+            continue
+        if MODELS[name].get("optional") and status["status"] == "missing":
+            if any(other["ok"] for other in report.values()
+                   if other["backend"] == status["backend"]):
+                continue
+        print(
+            f"Models: {name} ({status['backend']}) {status['status']}; "
+            f"provision with: python download_model.py {name}"
+        )
+
+
+def provision(name, force=False, model_dir=None, urls=None, progress=None):
+    """Download ``name`` into the model directory and record it in the manifest.
+
+    Returns the manifest entry. The download goes to a temp file in the same
+    directory and only replaces the target after every check passed.
+    """
+    spec = MODELS[name]
+    model_dir = model_dir or MODEL_DIR
+    path = model_path(name, model_dir)
+    if not force and check_model(name, model_dir=model_dir)[0]:
+        manifest = load_manifest(model_dir)
+        if name in manifest["models"]:
+            return manifest["models"][name]
+
+    os.makedirs(model_dir, exist_ok=True)
+    last_error = None
+    for url in urls or spec["urls"]:
+        fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", dir=model_dir)
+        try:
+            digest = hashlib.sha256()
+            size = 0
+            with os.fdopen(fd, "wb") as handle:
+                with urllib.request.urlopen(url, timeout=DOWNLOAD_TIMEOUT) as response:
+                    total = int(response.headers.get("Content-Length") or 0)
+                    while True:
+                        chunk = response.read(CHUNK_SIZE)
+                        if not chunk:
+                            break
+                        handle.write(chunk)
+                        digest.update(chunk)
+                        size += len(chunk)
+                        if progress is not None:
+                            progress(name, size, total)
+                handle.flush()
+                os.fsync(handle.fileno())
+            if total and size != total:
+                raise IOError(f"truncated download ({size}/{total} bytes)")
+            if not _magic_ok(tmp_path, spec["magic"]):
+                raise IOError("downloaded file is not a valid model (wrong magic bytes)")
+            sha256 = digest.hexdigest()
+            if spec["sha256"] and sha256 != spec["sha256"]:
+                raise IOError(f"sha256 {sha256} does not match pinned {spec['sha256']}")
+            os.replace(tmp_path, path)
+        except Exception as err:
+            last_error = err
+            print(f"Models: {name} download from {url} failed: {err}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            continue
+
+        entry = {
+            "file": spec["file"],
+            "size": size,
+            "sha256": sha256,
+            "source": url,
+            "provisioned_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        }
+        record(name, entry, model_dir)
+        return entry
+    raise ModelMissingError(f"Could not provision '{name}': {last_error}")
+
+
+def record(name, entry, model_dir=None):
+    manifest = load_manifest(model_dir)
+    manifest["version"] = MANIFEST_VERSION
+    manifest["models"][name] = entry
+    save_manifest(manifest, model_dir)
+
+
+def record_existing(name, model_dir=None):
+    """Add a hand-placed model file to the manifest after checking it."""
+    spec = MODELS[name]
+    path = model_path(name, model_dir)
+    if not os.path.isfile(path):
+        raise ModelMissingError(f"{path} does not exist")
+    if not _magic_ok(path, spec["magic"]):
+        raise ModelMissingError(f"{path} is not a valid model file (wrong magic bytes)")
+    entry = {
+        "file": spec["file"],
+        "size": os.path.getsize(path),
+        "sha256": file_sha256(path),
+        "source": "local",
+        "provisioned_at": datetime.fromtimestamp(
+            os.path.getmtime(path), timezone.utc
+        ).isoformat(timespec="seconds"),
+    }
+    record(name, entry, model_dir)
+    return entry
@@ -0,0 +1,85 @@
+"""Skip pose inference on frames that did not change.
+
+During planks, holds and rest periods consecutive frames are nearly
+identical. `MotionGate` compares a small grayscale thumbnail of each frame
+with the thumbnail of the last frame that went through the model; when too
+few pixels changed, the detector reuses its previous landmarks instead of
+running inference. Comparing against the last *inferred* frame (not the
+previous frame) means slow drift still adds up and triggers a refresh, and
+``GYMBUDDY_MOTION_MAX_SKIP`` bounds how many frames in a row may be skipped.
+"""
+import cv2
+
+try:
+    from .config import env_bool, env_float, env_int
+except ImportError:
+    from config import env_bool, env_float, env_int
+
+
+MOTION_GATE = env_bool("GYMBUDDY_MOTION_GATE", True)
+# Share of thumbnail pixels that must change to count as motion.
+MOTION_THRESHOLD = env_float("GYMBUDDY_MOTION_THRESHOLD", 0.005)
+# Grey-level difference for a thumbnail pixel to count as changed.
+MOTION_PIXEL_DELTA = env_int("GYMBUDDY_MOTION_PIXEL_DELTA", 12)
+MOTION_MAX_SKIP = env_int("GYMBUDDY_MOTION_MAX_SKIP", 4)
+THUMBNAIL_SIZE = (64, 48)
+
+
+class MotionGate:
+    """Per-stream frame-difference gate in front of a pose detector."""
+
+    def __init__(self, threshold=MOTION_THRESHOLD, pixel_delta=MOTION_PIXEL_DELTA,
+                 max_skip=MOTION_MAX_SKIP):
+        self.threshold = float(threshold)
+        self.pixel_delta = int(pixel_delta)
+        self.max_skip = max(0, int(max_skip))
+        self.skipped = 0
+        self.inferred = 0
+        self._reference = None
+        self._run = 0
+        self._thumb = None
+        self._gray = None
+        self._diff = None
+
+    def reset(self):
+        self._reference = None
+        self._run = 0
+
+    def _thumbnail(self, frame):
+        self._thumb = cv2.resize(frame, THUMBNAIL_SIZE, dst=self._thumb, interpolation=cv2.INTER_AREA)
+        if self._thumb.ndim == 3:
+            self._gray = cv2.cvtColor(self._thumb, cv2.COLOR_BGR2GRAY, dst=self._gray)
+            return self._gray
+        return self._thumb
+
+    def should_skip(self, frame):
+        """True when ``frame`` may reuse the previous result.
+
+        A frame that is not skipped becomes the new reference.
+        """
+        gray = self._thumbnail(frame)
+        reference = self._reference
+        if reference is not None and self._run < self.max_skip:
+            self._diff = cv2.absdiff(gray, reference, dst=self._diff)
+            changed = cv2.countNonZero(
+                cv2.threshold(self._diff, self.pixel_delta, 255, cv2.THRESH_BINARY, dst=self._diff)[1]
+            )
+            if changed < self.threshold * self._diff.size:
+                self._run += 1
+                self.skipped += 1
+                return True
+        if reference is None:
+            self._reference = gray.copy()
+        else:
+            reference[...] = gray
+        self._run = 0
+        self.inferred += 1
+        return False
+
+    def stats(self):
+        total = self.skipped + self.inferred
+        return {
+            "skipped": self.skipped,
+            "inferred": self.inferred,
+            "skip_rate": round(self.skipped / total, 3) if total else 0.0,
+        }
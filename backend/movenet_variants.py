@@ -0,0 +1,287 @@
+"""MoveNet model variants and latency-budgeted selection.
+
+Variants are listed from most to least accurate. At startup the
+`VariantGovernor` benchmarks every provisioned variant on a dummy frame and
+picks the most accurate one whose median latency fits
+``GYMBUDDY_MOVENET_BUDGET_MS`` (the fastest one if none does). While serving,
+detectors report their per-frame latency; when the smoothed latency stays
+above the budget for ``GYMBUDDY_MOVENET_STEP_DOWN_FRAMES`` frames the governor
+steps down to the next faster variant and detectors switch on their next
+frame. Replacement detectors are built on a background thread (one per
+detector that asks) and handed over between frames, so a step never stalls
+a live frame on interpreter construction. Once the load eases and the latency stays below half the budget for
+``GYMBUDDY_MOVENET_STEP_UP_FRAMES`` frames it steps back up, never past the
+variant chosen at startup. Each step-down that follows a step-up doubles the
+frames needed for the next step-up, so a variant that only just fits does
+not flap.
+
+``GYMBUDDY_MOVENET_VARIANT`` pins a variant and disables the benchmark.
+"""
+import statistics
+import threading
+import time
+
+import numpy as np
+
+try:
+    from .config import env_float, env_int, env_str
+    from .model_store import check_model, model_path
+except ImportError:
+    from config import env_float, env_int, env_str
+    from model_store import check_model, model_path
+
+
+# Model names in model_store.MODELS, most accurate first. Input sizes come
+# from each model's input tensor.
+VARIANTS = (
+    "movenet_thunder",
+    "movenet_thunder_int8",
+    "movenet_lightning",
+    "movenet_lightning_int8",
+)
+MOVENET_VARIANT = env_str("GYMBUDDY_MOVENET_VARIANT", "auto").lower()
+LATENCY_BUDGET_MS = env_float("GYMBUDDY_MOVENET_BUDGET_MS", 40.0)
+BENCH_RUNS = env_int("GYMBUDDY_MOVENET_BENCH_RUNS", 10)
+STEP_DOWN_FRAMES = env_int("GYMBUDDY_MOVENET_STEP_DOWN_FRAMES", 60)
+# 0 turns stepping back up off.
+STEP_UP_FRAMES = env_int("GYMBUDDY_MOVENET_STEP_UP_FRAMES", 600)
+STEP_DOWN_FACTOR = 1.2
+STEP_UP_FACTOR = 0.5
+LATENCY_SMOOTHING = 0.1
+BENCH_FRAME_SHAPE = (480, 640, 3)
+
+
+def available_variants():
+    return [name for name in VARIANTS if check_model(name)[0]]
+
+
+class VariantGovernor:
+    """Process-wide choice of MoveNet variant for new and running detectors."""
+
+    def __init__(self, movenet_cls, budget_ms=LATENCY_BUDGET_MS, pinned=MOVENET_VARIANT,
+                 runs=BENCH_RUNS, step_down_frames=STEP_DOWN_FRAMES,
+                 step_up_frames=STEP_UP_FRAMES):
+        self.movenet_cls = movenet_cls
+        self.budget = budget_ms / 1000.0
+        self.pinned = pinned if pinned != "auto" else None
+        self.runs = max(1, int(runs))
+        self.step_down_frames = max(1, int(step_down_frames))
+        self.step_up_frames = max(0, int(step_up_frames))
+        self.current = None
+        self.selected = None
+        # Bumped on every step; detectors request one replacement per step.
+        self.generation = 0
+        self.benchmarks = {}
+        self.step_downs = 0
+        self.step_ups = 0
+        self._latency = None
+        self._over = 0
+        self._under = 0
+        self._step_up_after = self.step_up_frames
+        self._lock = threading.Lock()
+        self._selected = False
+        # Replacement detectors for the current variant: one `prepare`
+        # callback (or None) per request, and the ones already built.
+        self._wanted = []
+        self._spares = []
+        self._builder = None
+
+    def create(self, name=None):
+        """Build a detector for ``name`` (default: the current variant)."""
+        if name is None:
+            name = self.select()
+        if name is None:
+            return None
+        model = self.movenet_cls(model_path=model_path(name))
+        if getattr(model, "interpreter", None) is None:
+            return None
+        model.variant = name
+        return model
+
+    @staticmethod
+    def release(model):
+        """Free a detector's interpreter once it has been replaced."""
+        close = getattr(model, "close", None)
+        if close is not None:
+            close()
+
+    def request(self, prepare=None):
+        """Ask for one detector of the current variant, built off the frame
+        path; collect it with `take()`. Call once per `generation`.
+
+        ``prepare(model)`` runs on the builder thread too (e.g. to allocate
+        batch interpreters); pass the same ``prepare`` to `take()`.
+        """
+        with self._lock:
+            self._wanted.append(prepare)
+            if self._builder is None:
+                self._builder = threading.Thread(
+                    target=self._build_spares, name="gymbuddy-movenet-variant", daemon=True
+                )
+                self._builder.start()
+
+    def take(self, name, prepare=None):
+        """A prebuilt detector for ``name``, or ``None`` while none is ready."""
+        with self._lock:
+            for index, (spare, prepared) in enumerate(self._spares):
+                if spare.variant == name and prepared == prepare:
+                    return self._spares.pop(index)[0]
+        return None
+
+    def _build_spares(self):
+        while True:
+            with self._lock:
+                if not self._wanted:
+                    self._builder = None
+                    return
+                prepare = self._wanted.pop(0)
+                name = self.current
+            model = self.create(name)
+            if model is None:
+                continue
+            if prepare is not None:
+                prepare(model)
+            with self._lock:
+                if name == self.current:
+                    self._spares.append((model, prepare))
+                    model = None
+            if model is not None:
+                self.release(model)
+
+    def select(self):
+        """Pick the variant once per process (benchmarking when not pinned)."""
+        with self._lock:
+            if self._selected:
+                return self.current
+            self._selected = True
+            candidates = available_variants()
+            if self.pinned:
+                if self.pinned in candidates:
+                    self.current = self.pinned
+                else:
+                    print(f"MoveNet: pinned variant '{self.pinned}' not provisioned")
+                    self.current = candidates[-1] if candidates else None
+            else:
+                self.current = self._benchmark(candidates)
+            self.selected = self.current
+            if self.current:
+                print(f"MoveNet: using variant {self.current}")
+            return self.current
+
+    def _benchmark(self, candidates):
+        if len(candidates) <= 1:
+            return candidates[0] if candidates else None
+        frame = np.zeros(BENCH_FRAME_SHAPE, dtype=np.uint8)
+        fastest = None
+        for name in candidates:
+            model = self.create(name)
+            if model is None:
+                continue
+            model.detect_array(frame)
+            samples = []
+            for _ in range(self.runs):
+                started = time.perf_counter()
+                model.detect_array(frame)
+                samples.append(time.perf_counter() - started)
+            median = statistics.median(samples)
+            self.benchmarks[name] = round(median * 1000.0, 2)
+            print(
+                f"MoveNet: benchmark {name}: {median * 1000.0:.1f} ms "
+                f"(budget {self.budget * 1000.0:.0f} ms)"
+            )
+            if fastest is None or median < self.benchmarks[fastest] / 1000.0:
+                fastest = name
+            if median <= self.budget:
+                # Candidates are ordered by accuracy; first fit wins.
+                return name
+        return fastest
+
+    def observe(self, name, seconds):
+        """Record one frame's latency; may step the current variant down or
+        back up."""
+        if self.pinned or name != self.current:
+            return
+        with self._lock:
+            if self._latency is None:
+                self._latency = seconds
+            else:
+                self._latency += LATENCY_SMOOTHING * (seconds - self._latency)
+            if self._latency > self.budget * STEP_DOWN_FACTOR:
+                self._under = 0
+                self._over += 1
+                if self._over < self.step_down_frames:
+                    return
+                target = self._next_faster(name)
+                if target is not None:
+                    self.step_downs += 1
+                    if self.step_ups:
+                        self._step_up_after *= 2
+            else:
+                self._over = 0
+                if (not self.step_up_frames or name == self.selected
+                        or self._latency > self.budget * STEP_UP_FACTOR):
+                    self._under = 0
+                    return
+                self._under += 1
+                if self._under < self._step_up_after:
+                    return
+                target = self._next_slower(name)
+                if target is not None:
+                    self.step_ups += 1
+            self._over = 0
+            self._under = 0
+            self._latency = None
+            if target is None:
+                return
+            self.current = target
+            self.generation += 1
+            # Detectors re-request for the new variant.
+            self._wanted = []
+            stale, self._spares = self._spares, []
+        for spare, _ in stale:
+            self.release(spare)
+        direction = "down" if VARIANTS.index(target) > VARIANTS.index(name) else "up"
+        print(
+            f"MoveNet: latency {'over' if direction == 'down' else 'well under'} "
+            f"{self.budget * 1000.0:.0f} ms budget, stepping {direction} {name} -> {target}"
+        )
+
+    @staticmethod
+    def _next_faster(name):
+        available = set(available_variants())
+        for candidate in VARIANTS[VARIANTS.index(name) + 1:]:
+            if candidate in available:
+                return candidate
+        return None
+
+    def _next_slower(self, name):
+        # Never more accurate than the startup choice.
+        available = set(available_variants())
+        floor = VARIANTS.index(self.selected) if self.selected in VARIANTS else 0
+        for candidate in reversed(VARIANTS[floor:VARIANTS.index(name)]):
+            if candidate in available:
+                return candidate
+        return None
+
+    def stats(self):
+        return {
+            "current": self.current,
+            "pinned": self.pinned,
+            "budget_ms": round(self.budget * 1000.0, 1),
+            "benchmarks_ms": dict(self.benchmarks),
+            "step_downs": self.step_downs,
+            "step_ups": self.step_ups,
+        }
+
+
+_governor = [None]
+
+
+def get_governor(movenet_cls):
+    if _governor[0] is None:
+        _governor[0] = VariantGovernor(movenet_cls)
+    return _governor[0]
+
+
+def governor_stats():
+    return _governor[0].stats() if _governor[0] is not None else None
@@ -0,0 +1,288 @@
+"""Multi-person analysis: one inference per frame for a whole group.
+
+``/ws?people=multi`` sessions run MoveNet MultiPose, which returns up to six
+people per frame. `PersonTracker` keeps identities stable across frames by
+greedily matching detections to tracks on box IoU, falling back to keypoint
+distance when boxes barely overlap (e.g. during a fast squat). Every track
+owns a `SquatCounter`, so each athlete is counted separately. The exercise
+classifier holds no per-person state and is shared.
+
+Responses keep the single-person fields for the primary person and add a ``people`` list with one entry per visible track::
+
+    {"detected": true, "reps": 3, ..., "people": [
+        {"id": 1, "reps": 3, "stage": "up", "exercise": "squat", "confidence": 0.91,
+         "feedback": "", "box": [0.12, 0.08, 0.41, 0.97]}, ...]}
+
+The primary person is the largest one when the session starts and stays
+primary until their track expires (``GYMBUDDY_TRACK_MAX_MISSES`` frames
+unseen), so the top-level reps do not jump between athletes who happen to
+step closer to the camera.
+
+Without the MultiPose model (or without a TFLite runtime) sessions fall back
+to a regular single-person detector and report at most one person.
+"""
+import itertools
+import time
+
+import numpy as np
+
+try:
+    from .config import env_float, env_int
+    from .model_store import check_model, model_path
+    from .pipeline import FramePipeline
+    from .pose import MOVENET_MODULE_PATH, Pose, PoseDetector, load_local_module
+    from .squat import SquatCounter
+except ImportError:
+    from config import env_float, env_int
+    from model_store import check_model, model_path
+    from pipeline import FramePipeline
+    from pose import MOVENET_MODULE_PATH, Pose, PoseDetector, load_local_module
+    from squat import SquatCounter
+
+
+MULTIPOSE_INPUT_SIZE = env_int("GYMBUDDY_MULTIPOSE_INPUT_SIZE", 256)
+MULTIPOSE_MIN_SCORE = env_float("GYMBUDDY_MULTIPOSE_MIN_SCORE", 0.25)
+MULTIPOSE_POOL_SIZE = env_int("GYMBUDDY_MULTIPOSE_POOL_SIZE", 1)
+TRACK_MATCH_THRESHOLD = env_float("GYMBUDDY_TRACK_MATCH_THRESHOLD", 0.3)
+TRACK_MAX_MISSES = env_int("GYMBUDDY_TRACK_MAX_MISSES", 15)
+KEYPOINT_MIN_SCORE = 0.2
+
+
+def box_iou(boxes_a, boxes_b):
+    """IoU matrix between ``(N, 4)`` and ``(M, 4)`` ``[ymin, xmin, ymax, xmax]`` boxes."""
+    a = boxes_a[:, None, :]
+    b = boxes_b[None, :, :]
+    inter_h = np.clip(np.minimum(a[..., 2], b[..., 2]) - np.maximum(a[..., 0], b[..., 0]), 0, None)
+    inter_w = np.clip(np.minimum(a[..., 3], b[..., 3]) - np.maximum(a[..., 1], b[..., 1]), 0, None)
+    inter = inter_h * inter_w
+    area_a = (a[..., 2] - a[..., 0]) * (a[..., 3] - a[..., 1])
+    area_b = (b[..., 2] - b[..., 0]) * (b[..., 3] - b[..., 1])
+    union = area_a + area_b - inter
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(union > 0, inter / union, 0.0)
+
+
+def keypoint_similarity(track_keypoints, track_box, keypoints):
+    """OKS-like similarity in [0, 1] between two ``(17, 3)`` keypoint sets."""
+    visible = (track_keypoints[:, 2] >= KEYPOINT_MIN_SCORE) & (keypoints[:, 2] >= KEYPOINT_MIN_SCORE)
+    if not visible.any():
+        return 0.0
+    area = max((track_box[2] - track_box[0]) * (track_box[3] - track_box[1]), 1e-6)
+    distances = np.sum((track_keypoints[visible, :2] - keypoints[visible, :2]) ** 2, axis=1)
+    # 0.1 of the box scale is a typical per-joint tolerance.
+    return float(np.mean(np.exp(-distances / (2.0 * area * 0.1 ** 2))))
+
+
+class PersonTrack:
+    """One athlete followed across frames, with their own rep counter."""
+
+    def __init__(self, track_id, keypoints, box, score, landmarks=None):
+        self.id = track_id
+        self.squat = SquatCounter()
+        self.misses = 0
+        self.hits = 0
+        self.update(keypoints, box, score, landmarks)
+
+    def update(self, keypoints, box, score, landmarks=None):
+        self.keypoints = keypoints
+        self.box = box
+        self.score = score
+        self.landmarks = landmarks
+        self.misses = 0
+        self.hits += 1
+
+
+class PersonTracker:
+    """Greedy IoU / keypoint-distance assignment of detections to tracks."""
+
+    def __init__(self, match_threshold=TRACK_MATCH_THRESHOLD, max_misses=TRACK_MAX_MISSES):
+        self.match_threshold = match_threshold
+        self.max_misses = max(0, int(max_misses))
+        self.tracks = []
+        self._ids = itertools.count(1)
+
+    def reset(self):
+        self.tracks = []
+        self._ids = itertools.count(1)
+
+    def update(self, people):
+        """Assign ``[(keypoints, box, score[, landmarks]), ...]``; return the
+        tracks seen in this frame."""
+        matched = {}
+        unmatched = list(range(len(people)))
+        if self.tracks and people:
+            boxes = np.array([person[1] for person in people], dtype=np.float32)
+            track_boxes = np.array([track.box for track in self.tracks], dtype=np.float32)
+            similarity = box_iou(track_boxes, boxes)
+            for t, track in enumerate(self.tracks):
+                for d, person in enumerate(people):
+                    if similarity[t, d] < self.match_threshold:
+                        similarity[t, d] = max(
+                            similarity[t, d],
+                            keypoint_similarity(track.keypoints, track.box, person[0]),
+                        )
+            for t, d in zip(*np.unravel_index(np.argsort(-similarity, axis=None), similarity.shape)):
+                if similarity[t, d] < self.match_threshold:
+                    break
+                if t in matched or d not in unmatched:
+                    continue
+                matched[t] = d
+                unmatched.remove(d)
+
+        seen = []
+        survivors = []
+        for t, track in enumerate(self.tracks):
+            if t in matched:
+                track.update(*people[matched[t]])
+                seen.append(track)
+            else:
+                track.misses += 1
+            if track.misses <= self.max_misses:
+                survivors.append(track)
+        for d in unmatched:
+            track = PersonTrack(next(self._ids), *people[d])
+            survivors.append(track)
+            seen.append(track)
+        self.tracks = survivors
+        return seen
+
+
+class MultiPoseDetector:
+    """Pool-compatible wrapper around `MoveNetMultiPose`.
+
+    Implements the parts of the `PoseDetector` interface `DetectorPool` relies
+    on, plus `detect_people()`.
+    """
+
+    backend = "movenet_multipose"
+
+    def __init__(self, model):
+        self.model = model
+        self.min_score = MULTIPOSE_MIN_SCORE
+
+    @property
+    def input_size(self):
+        return self.model.input_size
+
+    def detect_people(self, frame):
+        """``[(keypoints, box, score, pose), ...]`` in frame-normalised coords;
+        ``pose`` is ``None`` when its four landmarks are not all visible."""
+        people = []
+        for keypoints, box, score in self.model.detect_people(frame, self.min_score):
+            pose = Pose.from_yxs(keypoints, KEYPOINT_MIN_SCORE)
+            people.append((keypoints, box, score, pose if pose.complete else None))
+        return people
+
+    def process(self, frame):
+        people = self.detect_people(frame)
+        return people[0][3] if people else None
+
+    def reset(self):
+        pass
+
+    def crop_stats(self):
+        return None
+
+    def gate_stats(self):
+        return None
+
+
+def create_multi_detector():
+    """A `MultiPoseDetector`, or a single-person `PoseDetector` when unavailable."""
+    if check_model("movenet_multipose")[0]:
+        module = load_local_module("gymbuddy_movenet_local", MOVENET_MODULE_PATH)
+        model_cls = getattr(module, "MoveNetMultiPose", None)
+        if model_cls is not None:
+            model = model_cls(
+                model_path=model_path("movenet_multipose"), input_size=MULTIPOSE_INPUT_SIZE
+            )
+            if model.interpreter is not None:
+                print("MultiPoseDetector: using MoveNet MultiPose")
+                return MultiPoseDetector(model)
+    print("MultiPoseDetector: MultiPose unavailable, using a single-person detector")
+    return PoseDetector()
+
+
+class MultiPersonPipeline(FramePipeline):
+    """`FramePipeline` that tracks and counts every person in the frame."""
+
+    def __init__(self, pose):
+        super().__init__(pose=pose)
+        self.tracker = PersonTracker()
+        self.primary_id = None
+
+    def process_frame(self, frame, ack=None):
+        ack = ack or {}
+        started = time.perf_counter()
+        if hasattr(self.pose, "detect_people"):
+            people = self.pose.detect_people(frame)
+        else:
+            landmarks = self.pose.process(frame)
+            people = [(None, None, 1.0, landmarks)] if landmarks else []
+        self.timings.append(("pose", time.perf_counter() - started))
+        if not people:
+            self.tracker.update([])
+            result = self.empty_result(ack=ack)
+            result["people"] = []
+            return result
+
+        if people[0][0] is None:
+            # Single-person fallback: one implicit track on the pipeline's counter.
+            result = self._analyze(people[0][3], ack)
+            result["people"] = [self._person_entry(1, result, None)]
+            return result
+
+        started = time.perf_counter()
+        tracks = self.tracker.update(people)
+        self.timings.append(("track", time.perf_counter() - started))
+
+        entries = []
+        results = {}
+        largest = None
+        for track in tracks:
+            if not track.landmarks:
+                continue
+            result = self._analyze(track.landmarks, ack, squat=track.squat)
+            entries.append(self._person_entry(track.id, result, track.box))
+            results[track.id] = result
+            area = (track.box[2] - track.box[0]) * (track.box[3] - track.box[1])
+            if largest is None or area > largest[0]:
+                largest = (area, track.id)
+
+        primary = self._primary_track()
+        if primary is None and largest is not None:
+            self.primary_id = largest[1]
+            primary = self._primary_track()
+        if primary is not None and primary.id in results:
+            result = results[primary.id]
+        else:
+            result = self.empty_result(ack=ack)
+            if primary is not None:
+                # Primary briefly unseen: keep reporting their counter.
+                result["reps"] = primary.squat.reps
+                result["stage"] = primary.squat.stage
+        result["people"] = entries
+        return result
+
+    def _primary_track(self):
+        """The primary person's live track, or ``None`` once it has expired."""
+        for track in self.tracker.tracks:
+            if track.id == self.primary_id:
+                return track
+        self.primary_id = None
+        return None
+
+    @staticmethod
+    def _person_entry(track_id, result, box):
+        entry = {
+            "id": track_id,
+            "reps": result["reps"],
+            "stage": result["stage"],
+            "feedback": result["feedback"],
+            "exercise": result["exercise"],
+            "confidence": result["confidence"],
+        }
+        if box is not None:
+            # [xmin, ymin, xmax, ymax], like the keypoint (x, y) order.
+            entry["box"] = [round(float(box[i]), 4) for i in (1, 0, 3, 2)]
+        return entry
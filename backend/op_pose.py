@@ -1,15 +1,40 @@
+"""OpenPose COCO body model through OpenCV DNN.
+
+Frames are scaled to ``GYMBUDDY_OPENPOSE_INPUT_SIZE`` pixels high with the
+width following the frame's aspect ratio (rounded to the network stride), so
+people are not squashed. Only the heatmap branch output is requested from the
+net when the model exposes it, and the eight joints the landmarks need are
+decoded with one vectorised argmax plus a quadratic sub-pixel refinement.
+
+DNN runtime knobs (environment):
+
+* ``GYMBUDDY_OPENPOSE_BACKEND``: ``default``, ``opencv``, ``cuda``, ...
+  (any ``cv2.dnn.DNN_BACKEND_*`` suffix).
+* ``GYMBUDDY_OPENPOSE_TARGET``: ``cpu``, ``opencl``, ``opencl_fp16``,
+  ``cuda``, ``cuda_fp16``, ... (any ``cv2.dnn.DNN_TARGET_*`` suffix).
+* ``GYMBUDDY_OPENPOSE_THREADS``: ``cv2.setNumThreads`` for the process;
+  ``0`` (default) leaves OpenCV's setting alone.
+"""
 import cv2
 import numpy as np
-import os
-import urllib.request
 
-# OpenPose (COCO) model URLs commonly used
-PROTO_URL = "https://raw.githubusercontent.com/opencv/opencv_extra/master/testdata/dnn/pose_deploy_linevec.prototxt"
-MODEL_URL = "http://posefs1.perception.cs.cmu.edu/OpenPose/models/pose/coco/pose_iter_440000.caffemodel"
+try:
+    from .config import env_int, env_str
+    from .model_store import ModelMissingError, require_model
+except ImportError:
+    from config import env_int, env_str
+    from model_store import ModelMissingError, require_model
+
+
+INPUT_SIZE = env_int("GYMBUDDY_OPENPOSE_INPUT_SIZE", 368)
+DNN_BACKEND = env_str("GYMBUDDY_OPENPOSE_BACKEND", "default").lower()
+DNN_TARGET = env_str("GYMBUDDY_OPENPOSE_TARGET", "cpu").lower()
+DNN_THREADS = env_int("GYMBUDDY_OPENPOSE_THREADS", 0)
+# Output resolution divides the input by this; input sides are multiples of it.
+NET_STRIDE = 8
+# Last layer of the heatmap (L2) branch in the COCO prototxt.
+HEATMAP_LAYER = "Mconv7_stage6_L2"
 
-MODEL_DIR = os.path.join(os.path.dirname(__file__), "models")
-PROTO_PATH = os.path.join(MODEL_DIR, "pose_deploy_linevec.prototxt")
-MODEL_PATH = os.path.join(MODEL_DIR, "pose_iter_440000.caffemodel")
 
 COCO_POINTS = {
     "nose": 0,
@@ -23,35 +48,90 @@ COCO_POINTS = {
     "RAnkle": 10,
     "LAnkle": 13,
 }
+# Landmark -> (right, left) COCO joint pair averaged into it.
+LANDMARK_JOINTS = (
+    ("shoulder", ("RShoulder", "LShoulder")),
+    ("hip", ("RHip", "LHip")),
+    ("knee", ("RKnee", "LKnee")),
+    ("ankle", ("RAnkle", "LAnkle")),
+)
+JOINT_INDICES = np.array(
+    [COCO_POINTS[name] for _, pair in LANDMARK_JOINTS for name in pair], dtype=np.intp
+)
 
 
 def ensure_model():
-    os.makedirs(MODEL_DIR, exist_ok=True)
-    ok = True
-    if not os.path.exists(PROTO_PATH):
-        try:
-            print("Downloading pose prototxt...")
-            urllib.request.urlretrieve(PROTO_URL, PROTO_PATH)
-        except Exception as e:
-            print(f"Failed to download prototxt: {e}")
-            ok = False
-    if not os.path.exists(MODEL_PATH):
-        try:
-            print("Downloading pose caffemodel (large)...")
-            urllib.request.urlretrieve(MODEL_URL, MODEL_PATH)
-        except Exception as e:
-            print(f"Failed to download caffemodel: {e}")
-            ok = False
-    return ok
+    """Return ``(proto_path, model_path)`` from local disk, or ``None``.
+
+    Models are provisioned with ``python download_model.py --backend openpose``;
+    nothing is downloaded here.
+    """
+    try:
+        return (
+            require_model("openpose_coco_prototxt"),
+            require_model("openpose_coco_caffemodel"),
+        )
+    except ModelMissingError as e:
+        print(f"OpenPoseDetector: {e}")
+        return None
+
+
+def _dnn_constant(prefix, name):
+    value = getattr(cv2.dnn, f"{prefix}{name.upper()}", None)
+    if value is None:
+        print(f"OpenPoseDetector: unknown {prefix.lower()}{name}, using default")
+    return value
+
+
+def input_shape(height, width, input_size=INPUT_SIZE):
+    """Network ``(width, height)`` for a frame: fixed height, aspect-true width."""
+    in_height = max(NET_STRIDE, int(input_size) // NET_STRIDE * NET_STRIDE)
+    in_width = int(round(in_height * width / float(height) / NET_STRIDE)) * NET_STRIDE
+    return max(NET_STRIDE, in_width), in_height
+
+
+def decode_heatmaps(heatmaps):
+    """Peak ``(x, y, prob)`` per heatmap in ``(N, H, W)``, x/y normalised to [0, 1].
+
+    One argmax over all maps, then each peak is refined to sub-pixel
+    precision by fitting a parabola through it and its two neighbours on
+    each axis.
+    """
+    count, height, width = heatmaps.shape
+    flat = heatmaps.reshape(count, -1)
+    peaks = flat.argmax(axis=1)
+    rows = np.arange(count)
+    probs = flat[rows, peaks]
+    ys, xs = np.divmod(peaks, width)
+
+    def offset(before, center, after, inside):
+        # Peaks on the border have a single neighbour and stay unrefined.
+        curvature = before - 2.0 * center + after
+        with np.errstate(divide="ignore", invalid="ignore"):
+            shift = np.where(inside & (curvature < 0), 0.5 * (before - after) / curvature, 0.0)
+        return np.clip(shift, -0.5, 0.5)
+
+    left = heatmaps[rows, ys, np.maximum(xs - 1, 0)]
+    right = heatmaps[rows, ys, np.minimum(xs + 1, width - 1)]
+    up = heatmaps[rows, np.maximum(ys - 1, 0), xs]
+    down = heatmaps[rows, np.minimum(ys + 1, height - 1), xs]
+    fx = xs + offset(left, probs, right, (xs > 0) & (xs < width - 1))
+    fy = ys + offset(up, probs, down, (ys > 0) & (ys < height - 1))
+    return np.stack(((fx + 0.5) / width, (fy + 0.5) / height, probs), axis=1)
 
 
 class OpenPoseDetector:
-    def __init__(self, thresh=0.1):
+    def __init__(self, thresh=0.1, input_size=INPUT_SIZE, backend=DNN_BACKEND,
+                 target=DNN_TARGET, threads=DNN_THREADS):
         self.net = None
         self.thresh = thresh
-        if ensure_model():
+        self.input_size = int(input_size)
+        self._output_names = None
+        paths = ensure_model()
+        if paths:
             try:
-                self.net = cv2.dnn.readNetFromCaffe(PROTO_PATH, MODEL_PATH)
+                self.net = cv2.dnn.readNetFromCaffe(*paths)
+                self._configure(backend, target, threads)
                 print("✓ OpenPoseDetector: model loaded")
             except Exception as e:
                 print(f"Error loading OpenPose model: {e}")
@@ -59,61 +139,48 @@ class OpenPoseDetector:
         else:
             print("OpenPoseDetector: model not available")
 
+    def _configure(self, backend, target, threads):
+        backend_id = _dnn_constant("DNN_BACKEND_", backend)
+        if backend_id is not None:
+            self.net.setPreferableBackend(backend_id)
+        target_id = _dnn_constant("DNN_TARGET_", target)
+        if target_id is not None:
+            self.net.setPreferableTarget(target_id)
+        if threads > 0:
+            cv2.setNumThreads(int(threads))
+        # The full output concatenates heatmaps with the part affinity fields
+        # we never read; stop at the heatmap branch when the model has it.
+        if HEATMAP_LAYER in self.net.getLayerNames():
+            self._output_names = [HEATMAP_LAYER]
+
+    def _forward(self, frame):
+        height, width = frame.shape[:2]
+        # blobFromImage resizes to the network size itself.
+        blob = cv2.dnn.blobFromImage(
+            frame, 1.0 / 255, input_shape(height, width, self.input_size),
+            (0, 0, 0), swapRB=False, crop=False,
+        )
+        self.net.setInput(blob)
+        if self._output_names:
+            return self.net.forward(self._output_names)[0]
+        return self.net.forward()
+
     def detect(self, frame):
         """Return landmarks dict with normalized coords (x,y) for shoulder/hip/knee/ankle or None"""
         if self.net is None:
             return None
 
-        h, w = frame.shape[:2]
-        inWidth = 368
-        inHeight = 368
-        inp = cv2.resize(frame, (inWidth, inHeight))
-        inpBlob = cv2.dnn.blobFromImage(inp, 1.0 / 255, (inWidth, inHeight), (0, 0, 0), swapRB=False, crop=False)
-
-        self.net.setInput(inpBlob)
-        output = self.net.forward()
-
-        nPoints = output.shape[1]
-        H = output.shape[2]
-        W = output.shape[3]
-
-        points = [None] * nPoints
-        for i in range(nPoints):
-            probMap = output[0, i, :, :]
-            minVal, prob, minLoc, point = cv2.minMaxLoc(probMap)
-            x = (w * point[0]) / W
-            y = (h * point[1]) / H
-            if prob > self.thresh:
-                points[i] = (x, y, prob)
-            else:
-                points[i] = None
-
-        # Build averaged landmarks
-        def avg(p1, p2):
-            a = points[p1] if p1 is not None else None
-            b = points[p2] if p2 is not None else None
-            if a and b:
-                return ((a[0] + b[0]) / (2 * w), (a[1] + b[1]) / (2 * h))
-            if a:
-                return (a[0] / w, a[1] / h)
-            if b:
-                return (b[0] / w, b[1] / h)
-            return None
-
-        # Access indices safely
-        def idx(name):
-            return COCO_POINTS.get(name)
-
-        shoulder = avg(idx("RShoulder"), idx("LShoulder"))
-        hip = avg(idx("RHip"), idx("LHip"))
-        knee = avg(idx("RKnee"), idx("LKnee"))
-        ankle = avg(idx("RAnkle"), idx("LAnkle"))
-
-        if shoulder and hip and knee and ankle:
-            return {
-                "shoulder": shoulder,
-                "hip": hip,
-                "knee": knee,
-                "ankle": ankle,
-            }
-        return None
+        output = self._forward(frame)
+        joints = decode_heatmaps(output[0, JOINT_INDICES])
+        visible = joints[:, 2] > self.thresh
+
+        landmarks = {}
+        for index, (name, _) in enumerate(LANDMARK_JOINTS):
+            pair = [
+                joints[row, :2] for row in (2 * index, 2 * index + 1) if visible[row]
+            ]
+            if not pair:
+                return None
+            point = sum(pair) / len(pair)
+            landmarks[name] = (float(point[0]), float(point[1]))
+        return landmarks
@@ -0,0 +1,139 @@
+"""Per-session decode -> pose -> classify pipeline.
+
+`FramePipeline` owns everything a `/ws` session needs to turn one client
+message into a response dict. It is plain synchronous code so it can run on
+an executor thread or inside a worker process (see `executor.py`).
+
+Each call leaves ``(stage, seconds)`` pairs in `FramePipeline.timings`; the
+executor records them in the process that serves `/metrics`.
+"""
+import time
+
+try:
+    from .decode import FrameDecoder
+    from .exercise_classifier import ExerciseClassifier, extract_features
+    from .pose import PoseDetector, load_keypoints_module
+    from .protocol import KeypointsMessage, ProtocolError, parse_message
+    from .squat import SquatCounter
+except ImportError:
+    from decode import FrameDecoder
+    from exercise_classifier import ExerciseClassifier, extract_features
+    from pose import PoseDetector, load_keypoints_module
+    from protocol import KeypointsMessage, ProtocolError, parse_message
+    from squat import SquatCounter
+
+
+class FramePipeline:
+    """Stateful analysis pipeline for a single client session."""
+
+    def __init__(self, pose=None, keypoints_only=False):
+        if pose is None and not keypoints_only:
+            pose = PoseDetector()
+        self.pose = pose
+        self.decoder = FrameDecoder(pose.input_size if pose is not None else None)
+        self.squat = SquatCounter()
+        self.classifier = ExerciseClassifier()
+        self.timings = []
+
+    def restore(self, state):
+        """Resume counter state from a `session_store` snapshot."""
+        if state:
+            self.squat.restore(state)
+
+    @property
+    def backend(self):
+        return self.pose.backend if self.pose is not None else "client"
+
+    def empty_result(self, error=None, ack=None):
+        result = {
+            "detected": False,
+            "reps": self.squat.reps,
+            "stage": self.squat.stage,
+            "feedback": "",
+            "exercise": "unknown",
+            "confidence": 0.0,
+            "classifier": self.classifier.source,
+        }
+        if error:
+            result["error"] = error
+        if ack:
+            result.update(ack)
+        return result
+
+    def process(self, message):
+        """Analyse one raw ASGI websocket message and build the response."""
+        timings = self.timings = []
+        clock = time.perf_counter
+        ack = {}
+        try:
+            started = clock()
+            frame_msg = parse_message(message)
+            ack = frame_msg.ack_fields()
+            decoded = clock()
+            timings.append(("parse", decoded - started))
+            if isinstance(frame_msg, KeypointsMessage):
+                landmarks = self._landmarks_from_client(frame_msg.keypoints)
+                timings.append(("keypoints", clock() - decoded))
+                return self._analyze(landmarks, ack)
+            if self.pose is None:
+                return self.empty_result(
+                    error="This session only accepts keypoints messages", ack=ack
+                )
+            # Follows MoveNet variant switches, which change the input size.
+            self.decoder.target_size = self.pose.input_size
+            frame = self.decoder.decode(frame_msg.buffer)
+            timings.append(("imdecode", clock() - decoded))
+        except ProtocolError as err:
+            return self.empty_result(error=str(err), ack=ack)
+        except Exception as err:
+            return self.empty_result(error=f"Failed to decode image: {err}", ack=ack)
+
+        if frame is None:
+            return self.empty_result(error="Invalid image data", ack=ack)
+        return self.process_frame(frame, ack)
+
+    def process_frame(self, frame, ack=None):
+        """Analyse an already decoded BGR frame (used by offline video jobs)."""
+        started = time.perf_counter()
+        landmarks = self.pose.process(frame)
+        stage = "pose_skipped" if self.pose.last_skipped else "pose"
+        self.timings.append((stage, time.perf_counter() - started))
+        return self._analyze(landmarks, ack or {})
+
+    @staticmethod
+    def _landmarks_from_client(keypoints):
+        try:
+            validated = load_keypoints_module().validate_keypoints(keypoints)
+        except ValueError as err:
+            raise ProtocolError(f"Invalid keypoints: {err}") from err
+        return PoseDetector.from_keypoints(validated)
+
+    def _analyze(self, landmarks, ack, squat=None):
+        """Count and classify one person; ``squat`` overrides the session counter."""
+        timings = self.timings
+        clock = time.perf_counter
+        if not landmarks:
+            return self.empty_result(ack=ack)
+
+        squat = squat or self.squat
+        started = clock()
+        reps, feedback = squat.analyze(landmarks)
+        analysed = clock()
+        timings.append(("squat", analysed - started))
+        features = extract_features(landmarks)
+        extracted = clock()
+        timings.append(("features", extracted - analysed))
+        prediction = self.classifier.predict(landmarks, features=features)
+        timings.append(("classify", clock() - extracted))
+
+        result = {
+            "detected": True,
+            "reps": reps,
+            "stage": squat.stage,
+            "feedback": feedback or "",
+            "exercise": prediction.exercise,
+            "confidence": round(float(prediction.confidence), 4),
+            "classifier": prediction.source,
+        }
+        result.update(ack)
+        return result
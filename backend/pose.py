@@ -1,206 +1,428 @@
 import os
+import functools
 import importlib.util
-import urllib.request
+import sys
+import time
 
 import cv2
 
+try:
+    from .config import env_str
+    from .model_store import backend_models_ready, require_model
+    from .face_tracker import FaceTracker
+    from .motion_gate import MOTION_GATE, MotionGate
+    from .movenet_variants import get_governor, governor_stats
+    from .smart_crop import SMART_CROP, SmartCrop
+except ImportError:
+    from config import env_str
+    from model_store import backend_models_ready, require_model
+    from face_tracker import FaceTracker
+    from motion_gate import MOTION_GATE, MotionGate
+    from movenet_variants import get_governor, governor_stats
+    from smart_crop import SMART_CROP, SmartCrop
+
 
-TASK_MODEL_DIR = os.path.join(os.path.dirname(__file__), "models")
-TASK_MODEL_PATH = os.path.join(TASK_MODEL_DIR, "pose_landmarker_lite.task")
 MOVENET_MODULE_PATH = os.path.normpath(
     os.path.join(os.path.dirname(__file__), "..", "pose", "local", "movenet_local.py")
 )
-TASK_MODEL_URLS = [
-    "https://storage.googleapis.com/mediapipe-models/pose_landmarker/pose_landmarker_lite/float16/latest/pose_landmarker_lite.task",
-    "https://storage.googleapis.com/mediapipe-tasks/python/pose_landmarker/lite/pose_landmarker_lite.task",
-]
+KEYPOINTS_MODULE_PATH = os.path.normpath(
+    os.path.join(os.path.dirname(__file__), "..", "pose", "core", "keypoints.py")
+)
 MIN_KEYPOINT_SCORE = 0.2
+# Square input side each backend resizes frames to before inference.
+BACKEND_INPUT_SIZES = {
+    "solutions": 256,
+    "tasks": 256,
+    "openpose": 368,
+    "fallback": 320,
+}
+
+
+@functools.lru_cache(maxsize=None)
+def load_local_module(module_name, module_path):
+    """Load a module from the top-level `pose/` tree by file path (once).
+
+    `pose/` cannot be imported as a package from the backend because
+    `backend/pose.py` shadows the name. The module is registered in
+    `sys.modules` so `pose/` files can share it (see `movenet_local.py`).
+    """
+    if not os.path.exists(module_path):
+        return None
+    spec = importlib.util.spec_from_file_location(module_name, module_path)
+    if not spec or not spec.loader:
+        return None
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    try:
+        spec.loader.exec_module(module)
+    except BaseException:
+        sys.modules.pop(module_name, None)
+        raise
+    return module
+
+
+def load_keypoints_module():
+    return load_local_module("gymbuddy_keypoints", KEYPOINTS_MODULE_PATH)
+
+
+Pose = load_keypoints_module().Pose
+# MediaPipe's 33 landmarks in COCO-17 keypoint order.
+MEDIAPIPE_TO_COCO = (0, 2, 5, 7, 8, 11, 12, 13, 14, 15, 16, 23, 24, 25, 26, 27, 28)
+# What the fallback reports when it cannot place a face.
+STATIC_POSE = Pose.from_landmarks({
+    "shoulder": (0.5, 0.25),
+    "hip": (0.5, 0.5),
+    "knee": (0.5, 0.75),
+    "ankle": (0.5, 0.95),
+})
+
+
+def _has_module(name):
+    """Check that ``name`` is importable without importing it."""
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+def _probe_movenet_local():
+    if not os.path.exists(MOVENET_MODULE_PATH) or not backend_models_ready("movenet_local"):
+        return False
+    return _has_module("tflite_runtime") or _has_module("tensorflow")
+
+
+def _probe_openpose():
+    return hasattr(cv2, "dnn") and backend_models_ready("openpose")
+
+
+# Backends in auto-selection order. Probes are cheap availability checks that
+# never import the heavy runtime; the import happens in PoseDetector._init_*.
+BACKEND_PROBES = {
+    "movenet_local": _probe_movenet_local,
+    "solutions": lambda: _has_module("mediapipe"),
+    "tasks": lambda: _has_module("mediapipe") and backend_models_ready("tasks"),
+    "openpose": _probe_openpose,
+    "fallback": lambda: True,
+}
+POSE_BACKEND = env_str("GYMBUDDY_POSE_BACKEND", "auto").lower()
+# PoseLandmarker running mode for streams: "video" (tracking) or "image".
+TASKS_RUNNING_MODE = env_str("GYMBUDDY_TASKS_RUNNING_MODE", "video").lower()
+
+_BACKEND_PROBE_MS = {}
+_BACKEND_INIT_MS = {}
+_FAILED_BACKENDS = set()
+_SELECTED_BACKEND = [None]
+
+
+@functools.lru_cache(maxsize=None)
+def probe_backend(name):
+    """Return whether backend ``name`` looks usable; cached per process."""
+    probe = BACKEND_PROBES.get(name)
+    if probe is None:
+        return False
+    started = time.perf_counter()
+    try:
+        available = bool(probe())
+    except Exception:
+        available = False
+    elapsed_ms = (time.perf_counter() - started) * 1000.0
+    _BACKEND_PROBE_MS[name] = round(elapsed_ms, 1)
+    state = "available" if available else "unavailable"
+    print(f"PoseDetector: probe {name} {state} ({elapsed_ms:.1f} ms)")
+    return available
+
+
+def backend_candidates(requested=None):
+    """Backends to try, in order, for a new `PoseDetector`.
+
+    ``requested`` (or ``GYMBUDDY_POSE_BACKEND``) pins one backend; otherwise
+    the backend that worked last in this process is tried first and backends
+    that already failed to initialise are skipped.
+    """
+    requested = (requested or POSE_BACKEND or "auto").lower()
+    if requested != "auto":
+        if requested not in BACKEND_PROBES:
+            print(f"PoseDetector: unknown backend '{requested}', using auto")
+        elif requested == "fallback" or (
+            requested not in _FAILED_BACKENDS and probe_backend(requested)
+        ):
+            return [requested, "fallback"]
+        else:
+            print(f"PoseDetector: backend '{requested}' unavailable")
+            return ["fallback"]
+
+    order = list(BACKEND_PROBES)
+    selected = _SELECTED_BACKEND[0]
+    if selected is not None:
+        order.remove(selected)
+        order.insert(0, selected)
+    return [
+        name for name in order
+        if name not in _FAILED_BACKENDS and probe_backend(name)
+    ]
+
+
+def backend_report():
+    """Probe results and init timings, for `/stats`."""
+    return {
+        "requested": POSE_BACKEND,
+        "selected": _SELECTED_BACKEND[0],
+        "available": [name for name in BACKEND_PROBES if probe_backend(name)],
+        "failed": sorted(_FAILED_BACKENDS),
+        "probe_ms": dict(_BACKEND_PROBE_MS),
+        "init_ms": dict(_BACKEND_INIT_MS),
+        "movenet_variant": governor_stats(),
+    }
 
 
 class PoseDetector:
     """Unified pose detector with multiple backends and a safe fallback."""
 
-    _task_model_error = None
-
-    def __init__(self):
+    def __init__(self, backend=None, streaming=True, adaptive=True):
+        """``streaming=False`` is for unrelated still images: it turns off the
+        state carried between frames (smart crop, motion gate).
+        ``adaptive=False`` keeps this detector's latency out of the MoveNet
+        variant governor, for work that must not step live sessions down."""
         self.backend = None
+        self.streaming = streaming
+        self.adaptive = adaptive
         self.pose = None
         self.detector = None
         self.mp = None
-
-        # 1) Try local MoveNet (TFLite)
-        try:
-            movenet_cls = self._load_movenet_class()
-            if movenet_cls is not None:
-                movenet = movenet_cls()
-                if getattr(movenet, "interpreter", None) is not None:
-                    self.detector = movenet
-                    self.backend = "movenet_local"
-                    print("PoseDetector: using MoveNet local TFLite")
-                    return
-        except Exception:
-            pass
-
-        # 2) Try MediaPipe solutions API
-        try:
-            import mediapipe as mp
-
-            if hasattr(mp, "solutions") and hasattr(mp.solutions, "pose"):
-                self.mp = mp
-                self.backend = "solutions"
-                self.pose = mp.solutions.pose.Pose(
-                    static_image_mode=False,
-                    model_complexity=1,
-                    smooth_landmarks=True,
-                    enable_segmentation=False,
-                    min_detection_confidence=0.5,
-                    min_tracking_confidence=0.5,
-                )
-                print("PoseDetector: using mediapipe.solutions")
+        self._variants = None
+        self._awaiting_generation = None
+        self._crop = None
+        self._face = None
+        self._tasks_options = None
+        self._tasks_video = False
+        self._tasks_timestamp = -1
+        self._gate = MotionGate() if MOTION_GATE and streaming else None
+        self._last_landmarks = None
+        self.last_skipped = False
+
+        for name in backend_candidates(backend):
+            if name == "fallback":
+                break
+            if self._init_backend(name):
                 return
-        except Exception:
-            pass
 
-        # 3) Try MediaPipe Tasks API
+        self.backend = "fallback"
+        if (backend or POSE_BACKEND) != "fallback":
+            print("Warning: PoseDetector using fallback estimator")
+
+    def _init_backend(self, name):
+        """Create backend ``name``; failures are remembered for the process."""
+        started = time.perf_counter()
         try:
-            import mediapipe as mp
-            from mediapipe.tasks import python
+            ok = getattr(self, f"_init_{name}")()
+        except Exception as err:
+            print(f"PoseDetector: {name} failed: {err}")
+            ok = False
+        elapsed_ms = (time.perf_counter() - started) * 1000.0
+        _BACKEND_INIT_MS[name] = round(elapsed_ms, 1)
+        if not ok:
+            _FAILED_BACKENDS.add(name)
+            print(f"PoseDetector: {name} unavailable after {elapsed_ms:.0f} ms, skipping from now on")
+            return False
+        _SELECTED_BACKEND[0] = name
+        print(f"PoseDetector: {name} ready in {elapsed_ms:.0f} ms")
+        return True
+
+    def _init_movenet_local(self):
+        movenet_cls = self._load_movenet_class()
+        if movenet_cls is None:
+            return False
+        self._variants = get_governor(movenet_cls)
+        movenet = self._variants.create()
+        if movenet is None:
+            return False
+        self.detector = movenet
+        self._crop = SmartCrop() if SMART_CROP and self.streaming else None
+        self.backend = "movenet_local"
+        print(f"PoseDetector: using MoveNet local TFLite ({movenet.variant})")
+        return True
+
+    def _detect_movenet(self, frame):
+        """Run MoveNet on the tracked crop, report latency and follow
+        variant changes."""
+        variant = getattr(self.detector, "variant", None)
+        if variant is None:
+            # Batched detectors are shared; they keep their variant and
+            # always see the full frame.
+            return self.from_keypoints(self.detector.detect(frame))
+        region = self._crop.next_region() if self._crop is not None else None
+        started = time.perf_counter()
+        arr = self.detector.detect_array(frame, region)
+        if self.adaptive:
+            self._variants.observe(variant, time.perf_counter() - started)
+        if self._crop is not None:
+            self._crop.update(arr, frame.shape)
+        pose = Pose.from_yxs(arr, MIN_KEYPOINT_SCORE) if arr is not None else None
+        current = self._variants.current
+        if current == variant:
+            self._awaiting_generation = None
+            return pose
+        # The replacement is built on the governor's thread; keep running
+        # the old variant until it is ready.
+        generation = self._variants.generation
+        if self._awaiting_generation != generation:
+            self._awaiting_generation = generation
+            self._variants.request()
+        replacement = self._variants.take(current)
+        if replacement is not None:
+            self._variants.release(self.detector)
+            self.detector = replacement
+            self._awaiting_generation = None
+        return pose
+
+    def _init_solutions(self):
+        import mediapipe as mp
+
+        if not (hasattr(mp, "solutions") and hasattr(mp.solutions, "pose")):
+            return False
+        self.mp = mp
+        self.backend = "solutions"
+        self.pose = mp.solutions.pose.Pose(
+            static_image_mode=False,
+            model_complexity=1,
+            smooth_landmarks=True,
+            enable_segmentation=False,
+            min_detection_confidence=0.5,
+            min_tracking_confidence=0.5,
+        )
+        print("PoseDetector: using mediapipe.solutions")
+        return True
+
+    def _init_tasks(self):
+        import mediapipe as mp
+        from mediapipe.tasks import python
+        from mediapipe.tasks.python import vision
+
+        model_path = require_model("pose_landmarker_lite")
+        base_options = python.BaseOptions(model_asset_path=model_path)
+        # VIDEO mode tracks the pose between frames and only re-runs the
+        # person detector when tracking is lost; IMAGE mode detects every time.
+        video = self.streaming and TASKS_RUNNING_MODE == "video"
+        options = vision.PoseLandmarkerOptions(
+            base_options=base_options,
+            running_mode=vision.RunningMode.VIDEO if video else vision.RunningMode.IMAGE,
+            output_segmentation_masks=False,
+            min_pose_detection_confidence=0.5,
+            min_pose_presence_confidence=0.5,
+            min_tracking_confidence=0.5,
+        )
+        self.mp = mp
+        self._tasks_options = options
+        self._tasks_video = video
+        self.detector = vision.PoseLandmarker.create_from_options(options)
+        self.backend = "tasks"
+        print(f"PoseDetector: using mediapipe.tasks ({'video' if video else 'image'} mode)")
+        return True
+
+    def _detect_tasks(self, frame):
+        rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        mp_image = self.mp.Image(image_format=self.mp.ImageFormat.SRGB, data=rgb)
+        if not self._tasks_video:
+            return self.detector.detect(mp_image)
+        if self.detector is None:
+            # Fresh landmarker per stream: tracking state and the timestamp
+            # sequence must not carry over from the previous session.
             from mediapipe.tasks.python import vision
 
-            model_path = self._ensure_pose_task_model()
-            base_options = python.BaseOptions(model_asset_path=model_path)
-            options = vision.PoseLandmarkerOptions(
-                base_options=base_options,
-                output_segmentation_masks=False,
-                min_pose_detection_confidence=0.5,
-                min_pose_presence_confidence=0.5,
-                min_tracking_confidence=0.5,
-            )
-            self.mp = mp
-            self.detector = vision.PoseLandmarker.create_from_options(options)
-            self.backend = "tasks"
-            print("PoseDetector: using mediapipe.tasks")
-            return
-        except Exception:
-            pass
+            self.detector = vision.PoseLandmarker.create_from_options(self._tasks_options)
+        # VIDEO mode requires strictly increasing timestamps.
+        timestamp_ms = max(self._tasks_timestamp + 1, int(time.monotonic() * 1000))
+        self._tasks_timestamp = timestamp_ms
+        return self.detector.detect_for_video(mp_image, timestamp_ms)
 
-        # 4) Try OpenPose (OpenCV DNN)
+    def _init_openpose(self):
         try:
-            try:
-                from .op_pose import OpenPoseDetector
-            except ImportError:
-                from op_pose import OpenPoseDetector
-
-            detector = OpenPoseDetector()
-            if detector and getattr(detector, "net", None) is not None:
-                self.detector = detector
-                self.backend = "openpose"
-                print("PoseDetector: using OpenPose (OpenCV DNN)")
-                return
-        except Exception:
-            pass
-
-        # 5) Fallback
-        self.backend = "fallback"
-        print("Warning: PoseDetector using fallback estimator")
-
-    @classmethod
-    def _ensure_pose_task_model(cls):
-        os.makedirs(TASK_MODEL_DIR, exist_ok=True)
-        if os.path.exists(TASK_MODEL_PATH):
-            return TASK_MODEL_PATH
-
-        if cls._task_model_error:
-            raise RuntimeError(cls._task_model_error)
-
-        last_error = None
-        for model_url in TASK_MODEL_URLS:
-            try:
-                print(f"Downloading MediaPipe pose model from: {model_url}")
-                urllib.request.urlretrieve(model_url, TASK_MODEL_PATH)
-                print("Pose task model downloaded")
-                return TASK_MODEL_PATH
-            except Exception as err:
-                last_error = err
+            from .op_pose import OpenPoseDetector
+        except ImportError:
+            from op_pose import OpenPoseDetector
+
+        detector = OpenPoseDetector()
+        if not detector or getattr(detector, "net", None) is None:
+            return False
+        self.detector = detector
+        self.backend = "openpose"
+        print("PoseDetector: using OpenPose (OpenCV DNN)")
+        return True
+
+    def reset(self):
+        """Forget per-stream state before the detector serves a new stream."""
+        if self._crop is not None:
+            self._crop.reset()
+        if self._gate is not None:
+            self._gate.reset()
+        if self._face is not None:
+            self._face.reset()
+        if self._tasks_video and self._tasks_timestamp >= 0:
+            self.detector.close()
+            self.detector = None
+            self._tasks_timestamp = -1
+        self._last_landmarks = None
+        self.last_skipped = False
+
+    def gate_stats(self):
+        """Frames answered from the previous result vs inferred, or ``None``."""
+        return self._gate.stats() if self._gate is not None else None
+
+    def crop_stats(self):
+        """Frames inferred on a tracked crop vs the full frame, or ``None``."""
+        if self._crop is None:
+            return None
+        return {"cropped": self._crop.cropped, "full": self._crop.full}
 
-        cls._task_model_error = f"Could not download pose task model: {last_error}"
-        raise RuntimeError(cls._task_model_error)
+    @property
+    def input_size(self):
+        """Model input side in pixels; larger client frames are wasted bandwidth."""
+        size = getattr(self.detector, "input_size", None)
+        if size:
+            return int(size)
+        return BACKEND_INPUT_SIZES.get(self.backend, 320)
 
     @staticmethod
     def _load_movenet_class():
-        if not os.path.exists(MOVENET_MODULE_PATH):
-            return None
-        spec = importlib.util.spec_from_file_location(
-            "gymbuddy_movenet_local", MOVENET_MODULE_PATH
-        )
-        if not spec or not spec.loader:
-            return None
-        module = importlib.util.module_from_spec(spec)
-        spec.loader.exec_module(module)
+        module = load_local_module("gymbuddy_movenet_local", MOVENET_MODULE_PATH)
         return getattr(module, "MoveNetLocal", None)
 
     @staticmethod
-    def _avg_xy(point_a, point_b):
-        if point_a and point_b:
-            return ((point_a[0] + point_b[0]) / 2.0, (point_a[1] + point_b[1]) / 2.0)
-        if point_a:
-            return point_a
-        if point_b:
-            return point_b
-        return None
-
-    @staticmethod
-    def _avg_scored_point(point_a, point_b):
-        valid_points = []
-        for point in (point_a, point_b):
-            if not point or len(point) < 2:
-                continue
-            score = float(point[2]) if len(point) > 2 else 1.0
-            if score >= MIN_KEYPOINT_SCORE:
-                valid_points.append((float(point[0]), float(point[1])))
-        if len(valid_points) == 2:
-            return (
-                (valid_points[0][0] + valid_points[1][0]) / 2.0,
-                (valid_points[0][1] + valid_points[1][1]) / 2.0,
-            )
-        if len(valid_points) == 1:
-            return valid_points[0]
-        return None
+    def _complete(pose):
+        return pose if pose is not None and pose.complete else None
 
-    def _from_movenet(self, keypoints):
+    @classmethod
+    def from_keypoints(cls, keypoints):
+        """Standard-contract keypoints as a `Pose`, or ``None`` unless all four
+        averaged landmarks are confidently visible."""
         if not keypoints:
             return None
+        return cls._complete(Pose.from_keypoints(keypoints, MIN_KEYPOINT_SCORE))
 
-        shoulder = self._avg_scored_point(
-            keypoints.get("left_shoulder"), keypoints.get("right_shoulder")
-        )
-        hip = self._avg_scored_point(keypoints.get("left_hip"), keypoints.get("right_hip"))
-        knee = self._avg_scored_point(
-            keypoints.get("left_knee"), keypoints.get("right_knee")
-        )
-        ankle = self._avg_scored_point(
-            keypoints.get("left_ankle"), keypoints.get("right_ankle")
-        )
-
-        if shoulder and hip and knee and ankle:
-            return {
-                "shoulder": shoulder,
-                "hip": hip,
-                "knee": knee,
-                "ankle": ankle,
-            }
-        return None
-
-    @staticmethod
-    def _landmark_xy(landmark):
-        if landmark is None:
-            return None
-        return float(landmark.x), float(landmark.y)
+    @classmethod
+    def _from_mediapipe(cls, landmarks):
+        # MediaPipe's landmarks were averaged regardless of visibility before
+        # Pose existed; keep that by giving every joint full score.
+        data = [(landmarks[i].x, landmarks[i].y, 1.0) for i in MEDIAPIPE_TO_COCO]
+        return cls._complete(Pose(data, MIN_KEYPOINT_SCORE))
 
     def process(self, frame):
+        """Return the `Pose` for ``frame``, or ``None``.
+
+        Frames the motion gate considers unchanged reuse the previous
+        landmarks; `last_skipped` tells the caller which case happened.
+        """
+        if self._gate is not None and self._gate.should_skip(frame):
+            self.last_skipped = True
+            return self._last_landmarks
+        self.last_skipped = False
+        self._last_landmarks = self._infer(frame)
+        return self._last_landmarks
+
+    def _infer(self, frame):
         if self.backend == "movenet_local":
             try:
-                return self._from_movenet(self.detector.detect(frame))
+                return self._complete(self._detect_movenet(frame))
             except Exception as err:
                 print(f"PoseDetector (movenet_local) error: {err}")
                 return None
@@ -210,74 +432,28 @@ class PoseDetector:
                 rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
                 result = self.pose.process(rgb)
                 if result.pose_landmarks:
-                    landmarks = result.pose_landmarks.landmark
-                    shoulder = self._avg_xy(
-                        self._landmark_xy(landmarks[11]),
-                        self._landmark_xy(landmarks[12]),
-                    )
-                    hip = self._avg_xy(
-                        self._landmark_xy(landmarks[23]),
-                        self._landmark_xy(landmarks[24]),
-                    )
-                    knee = self._avg_xy(
-                        self._landmark_xy(landmarks[25]),
-                        self._landmark_xy(landmarks[26]),
-                    )
-                    ankle = self._avg_xy(
-                        self._landmark_xy(landmarks[27]),
-                        self._landmark_xy(landmarks[28]),
-                    )
-                    if shoulder and hip and knee and ankle:
-                        return {
-                            "shoulder": shoulder,
-                            "hip": hip,
-                            "knee": knee,
-                            "ankle": ankle,
-                        }
+                    return self._from_mediapipe(result.pose_landmarks.landmark)
             except Exception as err:
                 print(f"PoseDetector (solutions) error: {err}")
                 return None
 
         if self.backend == "tasks":
             try:
-                rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                mp_image = self.mp.Image(image_format=self.mp.ImageFormat.SRGB, data=rgb)
-                result = self.detector.detect(mp_image)
+                result = self._detect_tasks(frame)
                 pose_landmarks = getattr(result, "pose_landmarks", None)
                 if pose_landmarks:
                     first_pose = pose_landmarks[0]
                     if hasattr(first_pose, "landmark"):
                         first_pose = first_pose.landmark
-                    shoulder = self._avg_xy(
-                        self._landmark_xy(first_pose[11]),
-                        self._landmark_xy(first_pose[12]),
-                    )
-                    hip = self._avg_xy(
-                        self._landmark_xy(first_pose[23]),
-                        self._landmark_xy(first_pose[24]),
-                    )
-                    knee = self._avg_xy(
-                        self._landmark_xy(first_pose[25]),
-                        self._landmark_xy(first_pose[26]),
-                    )
-                    ankle = self._avg_xy(
-                        self._landmark_xy(first_pose[27]),
-                        self._landmark_xy(first_pose[28]),
-                    )
-                    if shoulder and hip and knee and ankle:
-                        return {
-                            "shoulder": shoulder,
-                            "hip": hip,
-                            "knee": knee,
-                            "ankle": ankle,
-                        }
+                    return self._from_mediapipe(first_pose)
             except Exception as err:
                 print(f"PoseDetector (tasks) error: {err}")
                 return None
 
         if self.backend == "openpose":
             try:
-                return self.detector.detect(frame)
+                landmarks = self.detector.detect(frame)
+                return Pose.from_landmarks(landmarks) if landmarks else None
             except Exception as err:
                 print(f"PoseDetector (openpose) error: {err}")
                 return None
@@ -291,33 +467,26 @@ class PoseDetector:
         """Fallback using face detection + simple body heuristics."""
         h, w = frame.shape[:2]
         try:
-            face_cascade = cv2.CascadeClassifier(
-                cv2.data.haarcascades + "haarcascade_frontalface_default.xml"
-            )
-            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-            faces = face_cascade.detectMultiScale(gray, 1.1, 4)
-            if len(faces) > 0:
-                x, y, face_w, face_h = faces[0]
+            if self._face is None:
+                self._face = FaceTracker(tracking=self.streaming)
+            face = self._face.update(frame)
+            if face is not None:
+                x, y, face_w, face_h = face
                 shoulder_y = y + face_h + face_h // 3
                 hip_y = shoulder_y + face_h * 1.5
                 knee_y = hip_y + face_h * 1.5
                 ankle_y = knee_y + face_h
                 center_x = x + face_w // 2
-                return {
+                return Pose.from_landmarks({
                     "shoulder": (center_x / w, min(shoulder_y / h, 1.0)),
                     "hip": (center_x / w, min(hip_y / h, 1.0)),
                     "knee": (center_x / w, min(knee_y / h, 1.0)),
                     "ankle": (center_x / w, min(ankle_y / h, 1.0)),
-                }
+                })
         except Exception:
             pass
 
-        return {
-            "shoulder": (0.5, 0.25),
-            "hip": (0.5, 0.5),
-            "knee": (0.5, 0.75),
-            "ankle": (0.5, 0.95),
-        }
+        return STATIC_POSE
 
     def draw_on(self, frame, landmarks):
         """Draw landmarks and basic connections on a frame."""
@@ -325,6 +494,10 @@ class PoseDetector:
             return frame
 
         h, w = frame.shape[:2]
+        if isinstance(landmarks, Pose):
+            for x, y, score in landmarks.data:
+                if score >= landmarks.min_score:
+                    cv2.circle(frame, (int(x * w), int(y * h)), 3, (255, 200, 0), -1)
         points = {}
         for key, (x, y) in landmarks.items():
             if 0.0 <= x <= 1.0 and 0.0 <= y <= 1.0:
@@ -0,0 +1,165 @@
+"""Wire protocol helpers for the `/ws` frame stream.
+
+Two client framings are supported:
+
+* ``text`` (legacy): every message is a base64 JPEG string, optionally wrapped
+  in a ``data:image/jpeg;base64,`` URL.
+* ``binary.v1``: every message is a binary WebSocket frame carrying the raw
+  JPEG/WebP bytes. The frame may start with a small fixed header::
+
+      version:u8 (=1) | flags:u8 | frame_id:u32 | client_ts_ms:u64   (big endian)
+
+  Encoded images never start with ``0x01`` (JPEG ``0xFF``, WebP ``R``,
+  PNG ``0x89``), so the header is detected from the first byte and can be
+  omitted by simple clients.
+
+Clients that run pose estimation themselves can instead send JSON text
+messages of the form::
+
+    {"type": "keypoints", "keypoints": {"left_shoulder": [x, y, score], ...},
+     "frame_id": 12, "client_ts": 1700000000000}
+
+using the standard contract from `pose/core/keypoints.py`. Connecting with
+``?input=keypoints`` marks the session as keypoints-only so no pose detector
+is leased for it.
+
+The binary framing is negotiated at connect time either with the
+``?protocol=binary.v1`` query parameter or the ``gymbuddy.binary.v1``
+WebSocket subprotocol. Text messages keep working on a binary session.
+"""
+import base64
+import json
+import struct
+from dataclasses import dataclass
+
+import numpy as np
+
+
+PROTOCOL_TEXT = "text"
+PROTOCOL_BINARY_V1 = "binary.v1"
+SUPPORTED_PROTOCOLS = (PROTOCOL_TEXT, PROTOCOL_BINARY_V1)
+SUBPROTOCOL_PREFIX = "gymbuddy."
+INPUT_FRAMES = "frames"
+INPUT_KEYPOINTS = "keypoints"
+
+FRAME_HEADER_VERSION = 1
+FRAME_HEADER = struct.Struct("!BBIQ")
+
+
+class ProtocolError(ValueError):
+    """Raised when a client message cannot be parsed."""
+
+
+@dataclass
+class FrameMessage:
+    """Encoded image buffer plus the optional client frame metadata."""
+
+    buffer: np.ndarray
+    frame_id: int = None
+    client_ts: int = None
+
+    def ack_fields(self):
+        if self.frame_id is None:
+            return {}
+        return {"frame_id": self.frame_id, "client_ts": self.client_ts}
+
+
+@dataclass
+class KeypointsMessage:
+    """Client-side pose estimate in the standard keypoints contract."""
+
+    keypoints: dict
+    frame_id: int = None
+    client_ts: int = None
+
+    ack_fields = FrameMessage.ack_fields
+
+
+def negotiate(ws):
+    """Pick the session protocol from the handshake.
+
+    Returns ``(protocol, subprotocol)`` where ``subprotocol`` must be passed to
+    ``ws.accept`` (it is ``None`` when the client did not offer one).
+    """
+    for offered in ws.scope.get("subprotocols") or []:
+        if not offered.startswith(SUBPROTOCOL_PREFIX):
+            continue
+        name = offered[len(SUBPROTOCOL_PREFIX):]
+        if name in SUPPORTED_PROTOCOLS:
+            return name, offered
+
+    requested = ws.query_params.get("protocol", PROTOCOL_TEXT)
+    if requested not in SUPPORTED_PROTOCOLS:
+        requested = PROTOCOL_TEXT
+    return requested, None
+
+
+def negotiate_input(ws):
+    """Return ``keypoints`` when the client only sends its own pose estimates."""
+    if ws.query_params.get("input") == INPUT_KEYPOINTS:
+        return INPUT_KEYPOINTS
+    return INPUT_FRAMES
+
+
+def parse_json_message(data):
+    """Parse a JSON text message (currently only ``type: keypoints``)."""
+    try:
+        payload = json.loads(data)
+    except ValueError as err:
+        raise ProtocolError(f"Invalid JSON message: {err}") from err
+    if not isinstance(payload, dict) or payload.get("type") != "keypoints":
+        raise ProtocolError("Unsupported message type")
+
+    keypoints = payload.get("keypoints")
+    if not isinstance(keypoints, dict):
+        raise ProtocolError("keypoints message requires a 'keypoints' object")
+    frame_id = payload.get("frame_id")
+    if frame_id is not None and not isinstance(frame_id, int):
+        raise ProtocolError("frame_id must be an integer")
+    return KeypointsMessage(
+        keypoints=keypoints,
+        frame_id=frame_id,
+        client_ts=payload.get("client_ts"),
+    )
+
+
+def parse_text_frame(data):
+    """Decode a legacy base64 (or data URL) frame."""
+    if data.startswith("data:") and "," in data:
+        data = data.split(",", 1)[1]
+    try:
+        img_bytes = base64.b64decode(data, validate=True)
+    except Exception as err:
+        raise ProtocolError(f"Failed to decode image: {err}") from err
+    return FrameMessage(buffer=np.frombuffer(img_bytes, np.uint8))
+
+
+def parse_binary_frame(data):
+    """Parse a ``binary.v1`` frame without copying the image payload."""
+    if not data:
+        raise ProtocolError("Empty frame")
+
+    if data[0] != FRAME_HEADER_VERSION:
+        return FrameMessage(buffer=np.frombuffer(data, np.uint8))
+
+    if len(data) <= FRAME_HEADER.size:
+        raise ProtocolError("Truncated frame header")
+    _, _, frame_id, client_ts = FRAME_HEADER.unpack_from(data)
+    return FrameMessage(
+        buffer=np.frombuffer(data, np.uint8, offset=FRAME_HEADER.size),
+        frame_id=frame_id,
+        client_ts=client_ts,
+    )
+
+
+def parse_message(message):
+    """Turn a raw ASGI ``websocket.receive`` message into a parsed message."""
+    data = message.get("bytes")
+    if data is not None:
+        return parse_binary_frame(data)
+    text = message.get("text")
+    if text is not None:
+        if text.startswith("{"):
+            return parse_json_message(text)
+        return parse_text_frame(text)
+    raise ProtocolError("Empty message")
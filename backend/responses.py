@@ -0,0 +1,222 @@
+"""Response encodings and event-driven emission for `/ws` results.
+
+By default every analysed frame is answered with a JSON dict. Clients can opt
+into cheaper responses at connect time:
+
+* ``?response=msgpack``: msgpack map with short field ids (see `FIELD_IDS`).
+  Requires the optional ``msgpack`` package; falls back to JSON otherwise.
+* ``?response=struct``: fixed binary layout, big endian::
+
+      type:u8 | flags:u8 | reps:u16 | frame_id:u32 | dropped:u32 | confidence:f32
+      | exercise | feedback | error          (each u8 length + UTF-8 bytes)
+
+  ``type`` is 1 for results and 2 for heartbeats. ``flags`` bit 0 is
+  ``detected``, bit 1 marks a model classifier, bit 2 a valid ``frame_id``
+  and bit 3 the ``down`` stage. Heartbeats reuse the header with
+  ``frame_id`` = last acknowledged frame, ``dropped`` and ``reps``.
+* ``?events=1``: only emit a result when reps, stage, exercise, feedback,
+  error or detection change, plus a heartbeat whenever nothing was sent for
+  ``GYMBUDDY_HEARTBEAT_SECONDS``, carrying the last acknowledged frame id.
+  Heartbeats come from a timer (`ResponseWriter.run_heartbeats`), so idle
+  and stalled sessions get them too.
+"""
+import asyncio
+import json
+import struct
+import time
+
+try:
+    from .config import env_float
+except ImportError:
+    from config import env_float
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+ENCODING_JSON = "json"
+ENCODING_MSGPACK = "msgpack"
+ENCODING_STRUCT = "struct"
+
+HEARTBEAT_SECONDS = env_float("GYMBUDDY_HEARTBEAT_SECONDS", 2.0)
+
+FIELD_IDS = {
+    "type": "y",
+    "detected": "d",
+    "reps": "r",
+    "stage": "g",
+    "feedback": "f",
+    "exercise": "e",
+    "confidence": "c",
+    "classifier": "s",
+    "frame_id": "i",
+    "client_ts": "t",
+    "dropped": "x",
+    "processed": "p",
+    "error": "err",
+}
+
+MSG_RESULT = 1
+MSG_HEARTBEAT = 2
+FLAG_DETECTED = 0x01
+FLAG_MODEL = 0x02
+FLAG_FRAME_ID = 0x04
+FLAG_STAGE_DOWN = 0x08
+STRUCT_HEADER = struct.Struct("!BBHIIf")
+
+EVENT_FIELDS = ("detected", "reps", "stage", "exercise", "feedback", "error")
+
+
+def _pack_str(value):
+    # Trim to 255 bytes without splitting a multi-byte character.
+    data = (value or "").encode("utf-8")[:255].decode("utf-8", "ignore").encode("utf-8")
+    return bytes((len(data),)) + data
+
+
+def encode_struct(message):
+    flags = 0
+    if message.get("detected"):
+        flags |= FLAG_DETECTED
+    if message.get("classifier") == "model":
+        flags |= FLAG_MODEL
+    if message.get("stage") == "down":
+        flags |= FLAG_STAGE_DOWN
+    frame_id = message.get("frame_id")
+    if frame_id is not None:
+        flags |= FLAG_FRAME_ID
+    kind = MSG_HEARTBEAT if message.get("type") == "heartbeat" else MSG_RESULT
+    header = STRUCT_HEADER.pack(
+        kind,
+        flags,
+        min(int(message.get("reps", 0)), 0xFFFF),
+        (frame_id or 0) & 0xFFFFFFFF,
+        min(int(message.get("dropped", 0)), 0xFFFFFFFF),
+        float(message.get("confidence", 0.0)),
+    )
+    return b"".join((
+        header,
+        _pack_str(message.get("exercise")),
+        _pack_str(message.get("feedback")),
+        _pack_str(message.get("error")),
+    ))
+
+
+def compact(message):
+    return {FIELD_IDS.get(key, key): value for key, value in message.items()}
+
+
+class ResponseWriter:
+    """Encodes results for one session and decides which ones to send."""
+
+    def __init__(self, encoding=ENCODING_JSON, events=False,
+                 heartbeat_seconds=HEARTBEAT_SECONDS):
+        self.requested = encoding
+        if encoding == ENCODING_MSGPACK and msgpack is None:
+            print("ResponseWriter: msgpack not installed, using json")
+            encoding = ENCODING_JSON
+        if encoding not in (ENCODING_JSON, ENCODING_MSGPACK, ENCODING_STRUCT):
+            encoding = ENCODING_JSON
+        self.encoding = encoding
+        self.events = events
+        self.heartbeat_seconds = heartbeat_seconds
+        self.processed = 0
+        self._last_key = None
+        self._last_ack = None
+        self._last_sent = time.monotonic()
+        self._reps = 0
+        self._dropped = 0
+        # Results and timer heartbeats share the socket.
+        self._send_lock = asyncio.Lock()
+
+    @classmethod
+    def from_query(cls, query_params):
+        events = query_params.get("events", "0").lower() in ("1", "true", "yes")
+        return cls(encoding=query_params.get("response", ENCODING_JSON), events=events)
+
+    def restore(self, state):
+        """Seed heartbeat reps from a resumed `session_store` snapshot."""
+        if state:
+            self._reps = int(state.get("reps", 0))
+
+    @property
+    def negotiated(self):
+        return self.requested != ENCODING_JSON or self.events
+
+    def hello_fields(self):
+        fields = {"response": self.encoding, "events": self.events}
+        if self.encoding == ENCODING_MSGPACK:
+            fields["field_ids"] = FIELD_IDS
+        if self.events:
+            fields["heartbeat_seconds"] = self.heartbeat_seconds
+        return fields
+
+    def _encode(self, message):
+        if self.encoding == ENCODING_STRUCT:
+            return encode_struct(message)
+        if self.encoding == ENCODING_MSGPACK:
+            return msgpack.packb(compact(message), use_bin_type=True)
+        return json.dumps(message, separators=(",", ":"))
+
+    def next_payloads(self, result):
+        """Return the encoded payloads (possibly none) to send for ``result``."""
+        self.processed += 1
+        if result.get("frame_id") is not None:
+            self._last_ack = result["frame_id"]
+        self._reps = result.get("reps", self._reps)
+        self._dropped = result.get("dropped", self._dropped)
+        if not self.events:
+            return [self._encode(result)]
+
+        key = tuple(result.get(field) for field in EVENT_FIELDS)
+        if key != self._last_key:
+            self._last_key = key
+            return [self._encode(result)]
+        return []
+
+    def heartbeat_payload(self):
+        return self._encode({
+            "type": "heartbeat",
+            "frame_id": self._last_ack,
+            "processed": self.processed,
+            "dropped": self._dropped,
+            "reps": self._reps,
+        })
+
+    async def _send(self, ws, payloads, heartbeat_due=True):
+        async with self._send_lock:
+            for payload in payloads:
+                if isinstance(payload, bytes):
+                    await ws.send_bytes(payload)
+                else:
+                    await ws.send_text(payload)
+            if payloads and heartbeat_due:
+                self._last_sent = time.monotonic()
+
+    async def send_control(self, ws, message):
+        """Send a JSON control message (e.g. capture updates) on the shared
+        socket; it does not postpone the next heartbeat."""
+        await self._send(ws, [json.dumps(message, separators=(",", ":"))], heartbeat_due=False)
+
+    async def send(self, ws, result):
+        """Send whatever ``result`` warrants; returns the number of messages."""
+        payloads = self.next_payloads(result)
+        await self._send(ws, payloads)
+        return len(payloads)
+
+    async def run_heartbeats(self, ws):
+        """Send a heartbeat whenever nothing went out for `heartbeat_seconds`.
+
+        Runs until cancelled or the socket fails; start it as a task next to
+        the frame loop of ``events`` sessions.
+        """
+        interval = max(0.05, float(self.heartbeat_seconds))
+        while True:
+            await asyncio.sleep(max(0.0, self._last_sent + interval - time.monotonic()))
+            if time.monotonic() - self._last_sent < interval:
+                continue
+            try:
+                await self._send(ws, [self.heartbeat_payload()])
+            except Exception:
+                return
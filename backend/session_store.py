@@ -0,0 +1,212 @@
+"""Resumable `/ws` session state.
+
+Each connection gets a session id (sent in the ``hello`` message). Clients
+that reconnect with ``?session=<id>`` resume their rep count and stage, even
+on a different uvicorn worker when the SQLite store is shared.
+
+Snapshots are tiny dicts derived from the per-frame result (reps, stage,
+exercise). Confidence is left out on purpose: it changes on nearly every frame
+and would mark every session dirty. `SessionManager.update` only records the
+latest snapshot in memory when it differs from the previous one; a
+background thread writes dirty snapshots to the store every
+``GYMBUDDY_SESSION_FLUSH_SECONDS`` in one batch, so storage never sits in the
+per-frame hot path.
+
+Stores are selected with ``GYMBUDDY_SESSION_STORE``:
+
+* ``memory`` (default): process-local dict, survives reconnects only.
+* ``sqlite``: file at ``GYMBUDDY_SESSION_DB``, shared by local workers.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+try:
+    from .config import env_float, env_str
+except ImportError:
+    from config import env_float, env_str
+
+
+SNAPSHOT_VERSION = 1
+SESSION_STORE = env_str("GYMBUDDY_SESSION_STORE", "memory").lower()
+SESSION_DB_PATH = env_str(
+    "GYMBUDDY_SESSION_DB", os.path.join(os.path.dirname(__file__), "sessions.sqlite3")
+)
+SESSION_TTL_SECONDS = env_float("GYMBUDDY_SESSION_TTL_SECONDS", 6 * 60 * 60)
+SESSION_FLUSH_SECONDS = env_float("GYMBUDDY_SESSION_FLUSH_SECONDS", 1.0)
+SNAPSHOT_FIELDS = ("reps", "stage", "exercise")
+
+
+def snapshot_from_result(result):
+    snapshot = {"v": SNAPSHOT_VERSION}
+    for field in SNAPSHOT_FIELDS:
+        if field in result:
+            snapshot[field] = result[field]
+    return snapshot
+
+
+class InMemorySessionStore:
+    def __init__(self, ttl_seconds=SESSION_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._items = {}
+        self._lock = threading.Lock()
+
+    def load(self, session_id):
+        with self._lock:
+            item = self._items.get(session_id)
+        if item is None:
+            return None
+        snapshot, updated_at = item
+        if time.time() - updated_at > self.ttl_seconds:
+            return None
+        return dict(snapshot)
+
+    def save_many(self, snapshots):
+        now = time.time()
+        with self._lock:
+            for session_id, snapshot in snapshots.items():
+                self._items[session_id] = (dict(snapshot), now)
+            expired = [
+                key for key, (_, updated_at) in self._items.items()
+                if now - updated_at > self.ttl_seconds
+            ]
+            for key in expired:
+                del self._items[key]
+
+    def close(self):
+        pass
+
+
+class SQLiteSessionStore:
+    """SQLite-backed store; safe to share between workers on one host."""
+
+    def __init__(self, path=SESSION_DB_PATH, ttl_seconds=SESSION_TTL_SECONDS):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=5.0, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "id TEXT PRIMARY KEY, state TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def load(self, session_id):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT state, updated_at FROM sessions WHERE id = ?", (session_id,)
+            ).fetchone()
+        if row is None or time.time() - row[1] > self.ttl_seconds:
+            return None
+        try:
+            return json.loads(row[0])
+        except ValueError:
+            return None
+
+    def save_many(self, snapshots):
+        now = time.time()
+        rows = [
+            (session_id, json.dumps(snapshot, separators=(",", ":")), now)
+            for session_id, snapshot in snapshots.items()
+        ]
+        with self._lock:
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO sessions (id, state, updated_at) VALUES (?, ?, ?)",
+                    rows,
+                )
+                self._conn.execute(
+                    "DELETE FROM sessions WHERE updated_at < ?", (now - self.ttl_seconds,)
+                )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def create_store(kind=SESSION_STORE):
+    if kind == "sqlite":
+        try:
+            return SQLiteSessionStore()
+        except Exception as err:
+            print(f"SessionStore: SQLite unavailable ({err}), using memory")
+    elif kind != "memory":
+        print(f"SessionStore: unknown store '{kind}', using memory")
+    return InMemorySessionStore()
+
+
+class SessionManager:
+    """Issues session ids and writes snapshots behind the frame loop."""
+
+    def __init__(self, store=None, flush_seconds=SESSION_FLUSH_SECONDS):
+        self.store = store if store is not None else create_store()
+        self.flush_seconds = max(0.05, float(flush_seconds))
+        self._pending = {}
+        self._last = {}
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="gymbuddy-session-writer", daemon=True
+        )
+        self._thread.start()
+
+    def resume(self, session_id):
+        """Return ``(session_id, snapshot)``; a new id is issued when unknown.
+
+        Blocking (may hit the store), so call it off the event loop.
+        """
+        if session_id:
+            with self._lock:
+                snapshot = self._pending.get(session_id) or self._last.get(session_id)
+            if snapshot is None:
+                try:
+                    snapshot = self.store.load(session_id)
+                except Exception as err:
+                    print(f"SessionStore: failed to load {session_id}: {err}")
+            if snapshot is not None:
+                return session_id, snapshot
+        return uuid.uuid4().hex, None
+
+    def update(self, session_id, result):
+        """Remember the newest snapshot; cheap enough for every frame."""
+        snapshot = snapshot_from_result(result)
+        if self._last.get(session_id) == snapshot:
+            return
+        with self._lock:
+            self._last[session_id] = snapshot
+            self._pending[session_id] = snapshot
+
+    def release(self, session_id):
+        """Forget the in-memory copy once the connection closes."""
+        with self._lock:
+            self._last.pop(session_id, None)
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return
+        try:
+            self.store.save_many(pending)
+        except Exception as err:
+            print(f"SessionStore: flush failed: {err}")
+            with self._lock:
+                for session_id, snapshot in pending.items():
+                    self._pending.setdefault(session_id, snapshot)
+
+    def _run(self):
+        while not self._stopped.wait(self.flush_seconds):
+            self.flush()
+
+    def close(self):
+        self._stopped.set()
+        self._thread.join(timeout=self.flush_seconds + 1.0)
+        self.flush()
+        self.store.close()
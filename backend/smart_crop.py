@@ -0,0 +1,91 @@
+"""Temporal ROI cropping for single-pose MoveNet ("smart crop").
+
+MoveNet squashes whatever it is given into a small square input, so a person
+filling a fifth of a 1280x720 frame ends up a few dozen pixels tall. Once a
+pose has been found, `SmartCrop` derives a padded square region around it and
+the next frame is inferred on that region only; keypoints are mapped back to
+full-frame coordinates by the detector. When the torso is no longer found
+with enough confidence, tracking drops and the next frame runs on the full
+frame again.
+
+Regions are ``(x0, y0, side)`` in frame pixels and may extend past the frame
+edges; the detector pads the outside with black, like the reference
+implementation.
+"""
+import numpy as np
+
+try:
+    from .config import env_bool, env_float
+except ImportError:
+    from config import env_bool, env_float
+
+
+SMART_CROP = env_bool("GYMBUDDY_SMART_CROP", True)
+SMART_CROP_MIN_SCORE = env_float("GYMBUDDY_SMART_CROP_MIN_SCORE", 0.3)
+
+# MoveNet keypoint indices (see pose/local/movenet_local.py KEYPOINT_NAMES).
+TORSO = (5, 6, 11, 12)
+HIPS = (11, 12)
+# Padding around the torso and whole-body extents, as in the MoveNet
+# reference cropping algorithm.
+TORSO_EXPANSION = 1.9
+BODY_EXPANSION = 1.2
+
+
+def crop_region(keypoints, width, height, min_score=SMART_CROP_MIN_SCORE):
+    """Square crop for the next frame from ``(17, 3)`` ``[y, x, score]`` keypoints.
+
+    ``keypoints`` are normalised to the full frame. Returns ``None`` when the
+    torso is not confidently visible or the crop would cover the whole frame
+    anyway.
+    """
+    scores = keypoints[:, 2]
+    if not (scores[list(TORSO)] >= min_score).all():
+        return None
+    ys = keypoints[:, 0] * height
+    xs = keypoints[:, 1] * width
+    center_x = float(xs[list(HIPS)].mean())
+    center_y = float(ys[list(HIPS)].mean())
+
+    torso = list(TORSO)
+    body = scores >= min_score
+    half = float(max(
+        np.abs(xs[torso] - center_x).max() * TORSO_EXPANSION,
+        np.abs(ys[torso] - center_y).max() * TORSO_EXPANSION,
+        np.abs(xs[body] - center_x).max() * BODY_EXPANSION,
+        np.abs(ys[body] - center_y).max() * BODY_EXPANSION,
+    ))
+    # Never reach further past the frame than the farthest edge.
+    half = min(half, max(center_x, width - center_x, center_y, height - center_y))
+    if half * 2.0 >= max(width, height):
+        return None
+    return (center_x - half, center_y - half, half * 2.0)
+
+
+class SmartCrop:
+    """Per-detector crop state carried from one frame to the next."""
+
+    def __init__(self, min_score=SMART_CROP_MIN_SCORE):
+        self.min_score = min_score
+        self.region = None
+        self.cropped = 0
+        self.full = 0
+
+    def reset(self):
+        self.region = None
+
+    def next_region(self):
+        """Region to infer the next frame on, or ``None`` for the full frame."""
+        if self.region is None:
+            self.full += 1
+        else:
+            self.cropped += 1
+        return self.region
+
+    def update(self, keypoints, frame_shape):
+        """Derive the next region from this frame's full-frame keypoints."""
+        if keypoints is None:
+            self.region = None
+            return
+        height, width = frame_shape[:2]
+        self.region = crop_region(keypoints, width, height, self.min_score)
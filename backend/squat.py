@@ -2,30 +2,31 @@ import os
 import sys
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from geometry import calculate_angle
+from geometry import landmark_angles, landmark_array
 
 class SquatCounter:
     def __init__(self):
         self.stage = "up"
         self.reps = 0
 
+    def snapshot(self):
+        return {"stage": self.stage, "reps": self.reps}
+
+    def restore(self, state):
+        if not state:
+            return
+        if state.get("stage") in ("up", "down"):
+            self.stage = state["stage"]
+        self.reps = max(0, int(state.get("reps", self.reps)))
+
     def analyze(self, landmarks):
         # Validate that all required landmarks are present
-        required_keys = ["hip", "knee", "ankle", "shoulder"]
-        if not landmarks or not all(k in landmarks for k in required_keys):
+        points = landmark_array(landmarks)
+        if points is None:
             return self.reps, "Incomplete pose detection"
-        
-        hip = landmarks["hip"]
-        knee = landmarks["knee"]
-        ankle = landmarks["ankle"]
-        shoulder = landmarks["shoulder"]
-
-        try:
-            knee_angle = calculate_angle(hip, knee, ankle)
-            hip_angle = calculate_angle(shoulder, hip, knee)
-        except Exception as e:
-            print(f"Error calculating angles: {e}")
-            return self.reps, f"Error calculating angles"
+
+        # Degenerate limbs give NaN angles, which match no threshold below.
+        knee_angle, hip_angle = landmark_angles(points)
 
         feedback = None
 
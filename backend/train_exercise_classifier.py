@@ -8,8 +8,9 @@ import numpy as np
 from exercise_classifier import (
     DEFAULT_MODEL_PATH,
     build_centroid_model,
-    extract_features,
+    extract_features_batch,
 )
+from geometry import landmark_array
 from pose import PoseDetector
 
 
@@ -36,18 +37,23 @@ def collect_features(split_dir, detector):
             continue
 
         total = 0
-        usable = 0
+        poses = []
         for image_path in iter_image_paths(class_dir):
             total += 1
             frame = cv2.imread(image_path)
             if frame is None:
                 continue
-            landmarks = detector.process(frame)
-            features = extract_features(landmarks)
-            if features is None:
-                continue
-            usable += 1
-            features_by_class[class_name].append(features.astype(np.float32))
+            points = landmark_array(detector.process(frame))
+            if points is not None:
+                poses.append(points)
+
+        usable = 0
+        if poses:
+            # Features for the whole class in one vectorised pass.
+            features = extract_features_batch(np.stack(poses))
+            features = features[~np.isnan(features).any(axis=1)]
+            usable = len(features)
+            features_by_class[class_name].extend(features)
 
         stats[class_name] = {"images": total, "usable": usable}
 
@@ -119,7 +125,7 @@ def main():
     if not os.path.isdir(train_dir):
         raise SystemExit(f"Train directory not found: {train_dir}")
 
-    detector = PoseDetector()
+    detector = PoseDetector(streaming=False)
     print(f"Pose backend: {detector.backend}")
 
     train_features, train_stats = collect_features(train_dir, detector)
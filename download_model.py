@@ -1,41 +1,95 @@
+#!/usr/bin/env python
+"""Provision pose models into the local model directory.
+
+The backend never downloads models at runtime; run this once per machine (or
+in the image build) instead:
+
+    python download_model.py                     # every model
+    python download_model.py movenet_lightning   # selected models
+    python download_model.py --backend openpose  # models for one backend
+    python download_model.py --list              # status only
+    python download_model.py --verify            # re-hash against manifest
+    python download_model.py --record movenet_lightning   # adopt a hand-placed file
+
+Files land in ``GYMBUDDY_MODEL_DIR`` (default `backend/models`) through a
+temp-file-then-rename write, and ``manifest.json`` records their size and
+SHA-256.
+"""
+import argparse
 import os
-import urllib.request
-import urllib.error
-import ssl
-
-# Disable SSL verification
-ssl._create_default_https_context = ssl._create_unverified_context
-
-model_path = "pose_landmarker_lite.task"
-model_urls = [
-    "https://storage.googleapis.com/mediapipe-tasks/python/pose_landmarker/lite/pose_landmarker_lite.task",
-    "https://storage.googleapis.com/mediapipe-tasks/video_landmarker/pose_landmarker_lite.task",
-    "https://storage.googleapis.com/mediapipe-assets/pose_landmarker_lite.task",
-]
-
-print("Attempting to download MediaPipe pose model...")
-for url in model_urls:
-    try:
-        print(f"\nTrying: {url}")
-        response = urllib.request.urlopen(url, timeout=10)
-        size = int(response.headers.get('Content-Length', 0))
-        print(f"  Content-Length: {size}")
-        
-        with open(model_path, 'wb') as f:
-            chunk_size = 8192
-            downloaded = 0
-            while True:
-                chunk = response.read(chunk_size)
-                if not chunk:
-                    break
-                f.write(chunk)
-                downloaded += len(chunk)
-                print(f"  Downloaded: {downloaded}/{size} bytes", end='\r')
-        
-        final_size = os.path.getsize(model_path)
-        print(f"\n✓ Model saved! Size: {final_size} bytes")
-        break
-    except Exception as e:
-        print(f"  ✗ Failed: {e}")
-else:
-    print("\n✗ Could not download model")
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+import model_store  # noqa: E402
+
+
+def print_status(report):
+    width = max(len(name) for name in report)
+    for name, status in report.items():
+        mark = "OK  " if status["ok"] else "MISS"
+        print(f"  [{mark}] {name.ljust(width)}  {status['backend']:<14} {status['status']}")
+
+
+def show_progress(name, done, total):
+    if total:
+        print(f"  {name}: {done}/{total} bytes ({done * 100 // total}%)", end="\r")
+    else:
+        print(f"  {name}: {done} bytes", end="\r")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Download and verify GymBuddy pose models.")
+    parser.add_argument("models", nargs="*", help=f"Models to fetch ({', '.join(model_store.MODELS)}).")
+    parser.add_argument("--backend", help="Fetch every model used by this pose backend.")
+    parser.add_argument("--model-dir", default=model_store.MODEL_DIR, help="Target directory.")
+    parser.add_argument("--force", action="store_true", help="Download even if a valid file exists.")
+    parser.add_argument("--list", action="store_true", help="Show model status and exit.")
+    parser.add_argument("--verify", action="store_true", help="Check files against manifest SHA-256.")
+    parser.add_argument("--record", action="store_true", help="Record existing files in the manifest instead of downloading.")
+    parser.add_argument("--url", help="Override the download URL (single model only).")
+    args = parser.parse_args()
+
+    if args.list or args.verify:
+        report = model_store.model_report(
+            args.model_dir, verify="sha256" if args.verify else None
+        )
+        print(f"Model directory: {args.model_dir}")
+        print_status(report)
+        return 0 if all(status["ok"] for status in report.values()) or args.list else 1
+
+    names = list(args.models)
+    if args.backend:
+        names.extend(model_store.models_for_backend(args.backend))
+    if not names:
+        names = list(model_store.MODELS)
+    unknown = [name for name in names if name not in model_store.MODELS]
+    if unknown:
+        parser.error(f"unknown model(s): {', '.join(unknown)}")
+    if args.url and len(names) != 1:
+        parser.error("--url needs exactly one model")
+
+    failures = 0
+    for name in dict.fromkeys(names):
+        try:
+            if args.record:
+                entry = model_store.record_existing(name, args.model_dir)
+            else:
+                print(f"Provisioning {name}...")
+                entry = model_store.provision(
+                    name,
+                    force=args.force,
+                    model_dir=args.model_dir,
+                    urls=[args.url] if args.url else None,
+                    progress=show_progress,
+                )
+            print(f"\n  ✓ {name}: {entry['size']} bytes, sha256 {entry['sha256'][:16]}...")
+        except Exception as err:
+            failures += 1
+            print(f"\n  ✗ {name}: {err}")
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
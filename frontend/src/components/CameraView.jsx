@@ -2,6 +2,39 @@ import React, { useEffect, useRef, useState } from "react";
 
 const FLIP_CAMERA_HORIZONTAL =
   (import.meta.env.VITE_CAMERA_FLIP_HORIZONTAL ?? "true").toLowerCase() === "true";
+const WS_PROTOCOL = import.meta.env.VITE_WS_PROTOCOL || "binary.v1";
+const SESSION_STORAGE_KEY = "gymbuddy.sessionId";
+const DEFAULT_CAPTURE = { fps: 1000 / 150, maxWidth: 0, maxHeight: 0, jpegQuality: 0.92 };
+
+const loadSessionId = () => {
+  try {
+    return window.sessionStorage.getItem(SESSION_STORAGE_KEY) || "";
+  } catch {
+    return "";
+  }
+};
+
+const saveSessionId = (sessionId) => {
+  try {
+    window.sessionStorage.setItem(SESSION_STORAGE_KEY, sessionId);
+  } catch {
+    // Storage may be unavailable (private mode); resume is best effort.
+  }
+};
+
+// binary.v1 frame header: version u8 | flags u8 | frame_id u32 | client_ts_ms u64
+const FRAME_HEADER_VERSION = 1;
+const FRAME_HEADER_SIZE = 14;
+
+const buildFrameHeader = (frameId) => {
+  const header = new ArrayBuffer(FRAME_HEADER_SIZE);
+  const view = new DataView(header);
+  view.setUint8(0, FRAME_HEADER_VERSION);
+  view.setUint8(1, 0);
+  view.setUint32(2, frameId >>> 0);
+  view.setBigUint64(6, BigInt(Date.now()));
+  return header;
+};
 
 export default function CameraView({ onUpdate, onStatus }) {
   const videoRef = useRef(null);
@@ -12,12 +45,12 @@ export default function CameraView({ onUpdate, onStatus }) {
   );
 
   useEffect(() => {
-    let interval = null;
+    let timer = null;
     let mounted = true;
     const videoElement = videoRef.current;
 
     const stopResources = () => {
-      if (interval) clearInterval(interval);
+      if (timer) clearTimeout(timer);
       setCameraActive(false);
       const ws = wsRef.current;
       if (ws) {
@@ -42,12 +75,21 @@ export default function CameraView({ onUpdate, onStatus }) {
     const backendHost =
       import.meta.env.VITE_BACKEND_HOST || window.location.hostname || "127.0.0.1";
     const backendPort = import.meta.env.VITE_BACKEND_PORT || "8010";
-    const wsUrl = `${wsProtocol}://${backendHost}:${backendPort}/ws`;
+    const useBinary = WS_PROTOCOL === "binary.v1";
+    const params = new URLSearchParams();
+    if (useBinary) params.set("protocol", "binary.v1");
+    params.set("session", loadSessionId());
+    params.set("control", "1");
+    const wsUrl = `${wsProtocol}://${backendHost}:${backendPort}/ws?${params}`;
+    let frameId = 0;
+    // Capture settings follow the backend's control messages.
+    const capture = { ...DEFAULT_CAPTURE };
     onStatus?.("Connecting to backend...");
 
     // open websocket
     try {
       wsRef.current = new WebSocket(wsUrl);
+      wsRef.current.binaryType = "arraybuffer";
       wsRef.current.onopen = () => {
         console.log("WebSocket connected");
         onStatus?.("Backend connected. Requesting camera...");
@@ -63,6 +105,21 @@ export default function CameraView({ onUpdate, onStatus }) {
       wsRef.current.onmessage = (msg) => {
         try {
           const data = JSON.parse(msg.data);
+          if (data.type === "hello") {
+            if (data.session_id) saveSessionId(data.session_id);
+            return;
+          }
+          if (data.type === "busy") {
+            onStatus?.(`Server busy. Retry in ${Math.ceil(data.retry_after || 5)} s.`);
+            return;
+          }
+          if (data.type === "control") {
+            if (data.fps > 0) capture.fps = data.fps;
+            capture.maxWidth = data.max_width || 0;
+            capture.maxHeight = data.max_height || 0;
+            if (data.jpeg_quality) capture.jpegQuality = data.jpeg_quality;
+            return;
+          }
           onUpdate?.(data);
         } catch (err) {
           console.warn("Invalid WS message", err);
@@ -119,25 +176,47 @@ export default function CameraView({ onUpdate, onStatus }) {
           if (!vw || !vh) return;
           if (!ws || ws.readyState !== WebSocket.OPEN) return;
 
-          canvas.width = vw;
-          canvas.height = vh;
+          const scale = Math.min(
+            1,
+            capture.maxWidth ? capture.maxWidth / vw : 1,
+            capture.maxHeight ? capture.maxHeight / vh : 1,
+          );
+          const cw = Math.max(1, Math.round(vw * scale));
+          const ch = Math.max(1, Math.round(vh * scale));
+          canvas.width = cw;
+          canvas.height = ch;
           try {
             if (!ctx) return;
             ctx.save();
             if (FLIP_CAMERA_HORIZONTAL) {
-              ctx.translate(vw, 0);
+              ctx.translate(cw, 0);
               ctx.scale(-1, 1);
             }
-            ctx.drawImage(videoElement, 0, 0, vw, vh);
+            ctx.drawImage(videoElement, 0, 0, cw, ch);
             ctx.restore();
-            const base64 = canvas.toDataURL("image/jpeg").split(",")[1];
-            ws.send(base64);
+            if (useBinary) {
+              const header = buildFrameHeader(frameId++);
+              canvas.toBlob((blob) => {
+                if (!blob || ws.readyState !== WebSocket.OPEN) return;
+                ws.send(new Blob([header, blob]));
+              }, "image/jpeg", capture.jpegQuality);
+            } else {
+              const base64 = canvas
+                .toDataURL("image/jpeg", capture.jpegQuality)
+                .split(",")[1];
+              ws.send(base64);
+            }
           } catch (err) {
             console.warn("Failed to send frame", err);
           }
         };
 
-        interval = setInterval(sendFrame, 150);
+        const scheduleFrame = () => {
+          if (!mounted) return;
+          sendFrame();
+          timer = setTimeout(scheduleFrame, 1000 / capture.fps);
+        };
+        scheduleFrame();
       })
       .catch((err) => {
         console.warn("getUserMedia failed:", err);
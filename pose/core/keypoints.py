@@ -9,9 +9,54 @@ Standard keypoint format:
 }
 
 Coordinates: normalized 0..1 when possible; score in 0..1.
+
+Inside the backend a detected pose travels as a `Pose`: one ``(17, 3)``
+float32 ``[x, y, score]`` array in `KEYPOINT_NAMES` order. It also reads
+like the older four-point landmarks dict (``pose["hip"] -> (x, y)``), each
+point the average of the confident left/right joints.
 """
+import math
+from collections.abc import Mapping
 from typing import Dict, Tuple
 
+import numpy as np
+
+# MoveNet / COCO-17 keypoint order.
+KEYPOINT_NAMES = [
+    "nose",
+    "left_eye",
+    "right_eye",
+    "left_ear",
+    "right_ear",
+    "left_shoulder",
+    "right_shoulder",
+    "left_elbow",
+    "right_elbow",
+    "left_wrist",
+    "right_wrist",
+    "left_hip",
+    "right_hip",
+    "left_knee",
+    "right_knee",
+    "left_ankle",
+    "right_ankle",
+]
+
+KEYPOINT_INDEX = {name: index for index, name in enumerate(KEYPOINT_NAMES)}
+
+# Averaged landmarks and the (left, right) joints behind each.
+LANDMARK_NAMES = ("shoulder", "hip", "knee", "ankle")
+LANDMARK_INDEX = {name: index for index, name in enumerate(LANDMARK_NAMES)}
+LANDMARK_JOINTS = np.array(
+    [[KEYPOINT_INDEX[f"{side}_{name}"] for side in ("left", "right")] for name in LANDMARK_NAMES],
+    dtype=np.intp,
+)
+# Joints below this score are ignored when averaging landmarks.
+MIN_SCORE = 0.2
+
+# Normalized coordinates may stray slightly outside the frame.
+COORD_RANGE = (-0.5, 1.5)
+
 JOINTS_OF_INTEREST = [
     "nose",
     "left_shoulder",
@@ -57,3 +102,118 @@ def standardize_from_simple(landmarks: Dict[str, Tuple[float, float]], score: fl
         out["right_ankle"] = [ax, ay, score]
 
     return out
+
+
+def validate_keypoints(payload) -> Dict[str, Tuple[float, float, float]]:
+    """Validate a client-supplied keypoints dict against the standard contract.
+
+    Unknown joint names are ignored, a missing score defaults to 1.0. Raises
+    ValueError when the payload is malformed or has no usable joints.
+    """
+    if not isinstance(payload, dict):
+        raise ValueError("keypoints must be an object of joint -> [x, y, score]")
+
+    out = {}
+    for name in KEYPOINT_NAMES:
+        value = payload.get(name)
+        if value is None:
+            continue
+        if not isinstance(value, (list, tuple)) or len(value) not in (2, 3):
+            raise ValueError(f"{name} must be [x, y] or [x, y, score]")
+        try:
+            x, y = float(value[0]), float(value[1])
+            score = float(value[2]) if len(value) == 3 else 1.0
+        except (TypeError, ValueError):
+            raise ValueError(f"{name} must contain numbers")
+        if not all(math.isfinite(v) for v in (x, y, score)):
+            raise ValueError(f"{name} must contain finite numbers")
+        if not (COORD_RANGE[0] <= x <= COORD_RANGE[1] and COORD_RANGE[0] <= y <= COORD_RANGE[1]):
+            raise ValueError(f"{name} coordinates must be normalized to 0..1")
+        if not 0.0 <= score <= 1.0:
+            raise ValueError(f"{name} score must be within 0..1")
+        out[name] = (x, y, score)
+
+    if not out:
+        raise ValueError("keypoints payload has no known joints")
+    return out
+
+
+class Pose(Mapping):
+    """Full skeleton backed by a ``(17, 3)`` float32 ``[x, y, score]`` array.
+
+    As a mapping it holds the averaged landmarks that are present, so code
+    written for the four-point dict keeps working. `landmarks()` returns all
+    four as one ``(4, 2)`` array (NaN rows when missing) without building
+    tuples. Treat `data` as read-only: the averaged view is computed once.
+    """
+
+    __slots__ = ("data", "min_score", "_landmarks")
+
+    def __init__(self, data, min_score=MIN_SCORE):
+        self.data = np.asarray(data, dtype=np.float32)
+        self.min_score = min_score
+        self._landmarks = None
+
+    @classmethod
+    def from_keypoints(cls, keypoints, min_score=MIN_SCORE):
+        """Build from a standard-contract dict; absent joints get score 0."""
+        data = np.zeros((len(KEYPOINT_NAMES), 3), dtype=np.float32)
+        for name, value in keypoints.items():
+            index = KEYPOINT_INDEX.get(name)
+            if index is None or value is None:
+                continue
+            data[index, :len(value)] = value[:3]
+            if len(value) < 3:
+                data[index, 2] = 1.0
+        return cls(data, min_score)
+
+    @classmethod
+    def from_yxs(cls, array, min_score=MIN_SCORE):
+        """Build from MoveNet's ``(17, 3)`` ``[y, x, score]`` output."""
+        return cls(np.asarray(array, dtype=np.float32)[:, (1, 0, 2)], min_score)
+
+    @classmethod
+    def from_landmarks(cls, landmarks, score=1.0):
+        """Build from a four-point dict; both sides get the averaged point."""
+        data = np.zeros((len(KEYPOINT_NAMES), 3), dtype=np.float32)
+        for name, joints in zip(LANDMARK_NAMES, LANDMARK_JOINTS):
+            point = landmarks.get(name)
+            if point is not None:
+                data[joints, 0] = point[0]
+                data[joints, 1] = point[1]
+                data[joints, 2] = score
+        return cls(data, 0.0)
+
+    def joint(self, name):
+        """``[x, y, score]`` row of ``name`` (a view, not a copy)."""
+        return self.data[KEYPOINT_INDEX[name]]
+
+    def landmarks(self):
+        """``(4, 2)`` averaged shoulder/hip/knee/ankle; NaN rows when missing."""
+        if self._landmarks is None:
+            pairs = self.data[LANDMARK_JOINTS]
+            weights = (pairs[..., 2] >= self.min_score).astype(np.float32)
+            totals = np.einsum("lj,ljc->lc", weights, pairs[..., :2])
+            with np.errstate(divide="ignore", invalid="ignore"):
+                self._landmarks = totals / weights.sum(axis=1, keepdims=True)
+        return self._landmarks
+
+    @property
+    def complete(self):
+        return not np.isnan(self.landmarks()).any()
+
+    def __getitem__(self, name):
+        point = self.landmarks()[LANDMARK_INDEX[name]]
+        if np.isnan(point[0]):
+            raise KeyError(name)
+        return float(point[0]), float(point[1])
+
+    def __iter__(self):
+        present = ~np.isnan(self.landmarks()[:, 0])
+        return (name for name, ok in zip(LANDMARK_NAMES, present) if ok)
+
+    def __len__(self):
+        return int((~np.isnan(self.landmarks()[:, 0])).sum())
+
+    def __repr__(self):
+        return f"Pose({dict(self)})"
@@ -1,9 +1,36 @@
-"""MoveNet Lightning local TFLite detector wrapper.
+"""MoveNet single-pose local TFLite detector wrapper.
 
-This module tries to use tflite-runtime or TensorFlow's Interpreter. It expects
-model file at `backend/models/movenet_lightning.tflite` (relative path from repo root).
+This module tries to use tflite-runtime or TensorFlow's Interpreter. It defaults
+to `backend/models/movenet_lightning.tflite` (relative path from repo root);
+the backend passes the path of the variant it selected (Lightning or Thunder,
+float or int8, see `backend/movenet_variants.py`). The input size is read
+from the model.
 
 If model missing, it will print instructions and return None from `detect()`.
+
+The per-frame path is allocation-free apart from the result: tensor indices,
+dtypes and quantization are read once at load, frames are resized and
+colour-converted into reusable buffers and written straight into the
+interpreter's input tensor. `detect_array()` returns the raw ``(17, 3)``
+``[y, x, score]`` array; `detect()` wraps it in the standard keypoints dict.
+
+Both accept an optional square ``region`` ``(x0, y0, side)`` in frame pixels
+(see `backend/smart_crop.py`): only that region is resampled into the model
+input (padding outside the frame with black) and keypoints are mapped back
+to full-frame coordinates.
+
+`detect_batch()` pads each batch to the next power of two and keeps one
+interpreter per padded size, so a changing batch size never resizes or
+reallocates tensors on the inference path. `prepare_batches()` builds them up
+front.
+
+`MoveNetMultiPose` runs the MultiPose Lightning model through the same
+loader and returns up to six people per inference.
+
+Runtime knobs (environment):
+
+* ``GYMBUDDY_MOVENET_THREADS``: interpreter threads (default: 1).
+* ``GYMBUDDY_MOVENET_XNNPACK``: ``0`` disables the default XNNPACK delegate.
 """
 import os
 import numpy as np
@@ -11,12 +38,58 @@ import cv2
 
 MODEL_PATH = os.path.join(os.path.dirname(__file__), "..", "..", "backend", "models", "movenet_lightning.tflite")
 MODEL_PATH = os.path.normpath(MODEL_PATH)
+MULTIPOSE_MODEL_PATH = os.path.normpath(os.path.join(
+    os.path.dirname(__file__), "..", "..", "backend", "models", "movenet_multipose_lightning.tflite"
+))
+
+try:
+    from pose.core.keypoints import KEYPOINT_NAMES
+except ImportError:
+    # Loaded by file path from the backend, where `backend/pose.py` shadows
+    # the `pose` package: load the sibling module the same way (and under the
+    # same name) as `backend/pose.py` does.
+    import importlib.util
+    import sys
+
+    _keypoints = sys.modules.get("gymbuddy_keypoints")
+    if _keypoints is None:
+        _spec = importlib.util.spec_from_file_location(
+            "gymbuddy_keypoints",
+            os.path.join(os.path.dirname(__file__), "..", "core", "keypoints.py"),
+        )
+        _keypoints = importlib.util.module_from_spec(_spec)
+        _spec.loader.exec_module(_keypoints)
+    KEYPOINT_NAMES = _keypoints.KEYPOINT_NAMES
+
+
+# `pose/` is used outside the backend too, so it cannot import
+# `backend/config.py`; this mirrors `config.env_int`.
+def _env_int(name, default):
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+NUM_THREADS = _env_int("GYMBUDDY_MOVENET_THREADS", 1)
+USE_XNNPACK = os.environ.get("GYMBUDDY_MOVENET_XNNPACK", "1").lower() not in ("0", "false", "no", "off")
+
+
+def padded_batch_size(count):
+    """Smallest power of two that holds ``count`` frames."""
+    return 1 << max(0, int(count) - 1).bit_length()
 
 
 class MoveNetLocal:
-    def __init__(self):
+    def __init__(self, model_path=MODEL_PATH, num_threads=NUM_THREADS, use_xnnpack=USE_XNNPACK):
         self.interpreter = None
-        self.input_size = 192  # MoveNet Lightning
+        self.input_size = 192  # Lightning; replaced by the model's input shape
+        self.supports_batching = True
+        self.num_threads = max(1, int(num_threads))
+        self.model_path = model_path
+        self.use_xnnpack = use_xnnpack
+        # Padded batch size -> interpreter with that input shape.
+        self._batch_interpreters = {}
         # Try tflite-runtime first
         try:
             from tflite_runtime.interpreter import Interpreter
@@ -30,52 +103,262 @@ class MoveNetLocal:
             except Exception:
                 self.Interpreter = None
 
-        if self.Interpreter and os.path.exists(MODEL_PATH):
+        if self.Interpreter and os.path.exists(model_path):
             try:
-                self.interpreter = self.Interpreter(model_path=MODEL_PATH)
+                self.interpreter = self._create_interpreter(model_path, use_xnnpack)
                 self.interpreter.allocate_tensors()
-                print(f"✓ MoveNetLocal: loaded model {MODEL_PATH}")
+                self._cache_tensor_details()
+                print(f"✓ MoveNetLocal: loaded model {model_path}")
             except Exception as e:
                 print(f"Failed to load MoveNet TFLite model: {e}")
                 self.interpreter = None
         else:
-            if not os.path.exists(MODEL_PATH):
+            if not os.path.exists(model_path):
                 print("MoveNet model not found.")
-                print("Download the model and place it at:")
-                print(MODEL_PATH)
-                print("Download URL (manual): https://tfhub.dev/google/lite-model/movenet/singlepose/lightning/4?lite-format=tflite")
-
-    def _preprocess(self, frame):
-        img = np.copy(frame)
-        img = cv2.resize(img, (self.input_size, self.input_size))
-        img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-        img = img.astype(np.float32)
-        img = img / 255.0
-        img = img[np.newaxis, ...]
-        return img
-
-    def detect(self, frame):
+                print("Provision it with: python download_model.py --list  (then the model name)")
+                print(model_path)
+
+        # Reusable preprocessing buffers: resize and colour conversion write
+        # into these instead of allocating per frame.
+        self._resized = np.empty((self.input_size, self.input_size, 3), dtype=np.uint8)
+        self._rgb = np.empty_like(self._resized)
+        self._scaled = np.empty(self._resized.shape, dtype=np.float32)
+
+    def _create_interpreter(self, model_path, use_xnnpack):
+        kwargs = {"model_path": model_path, "num_threads": self.num_threads}
+        if not use_xnnpack:
+            # XNNPACK is applied by default; this resolver type skips it.
+            try:
+                from tflite_runtime.interpreter import OpResolverType
+            except Exception:
+                try:
+                    from tensorflow.lite.experimental import OpResolverType
+                except Exception:
+                    OpResolverType = None
+            if OpResolverType is not None:
+                kwargs["experimental_op_resolver_type"] = (
+                    OpResolverType.BUILTIN_WITHOUT_DEFAULT_DELEGATES
+                )
+        try:
+            return self.Interpreter(**kwargs)
+        except TypeError:
+            # Older runtimes without num_threads / resolver arguments.
+            return self.Interpreter(model_path=model_path)
+
+    def _cache_tensor_details(self):
+        input_details = self.interpreter.get_input_details()[0]
+        output_details = self.interpreter.get_output_details()[0]
+        self._input_index = input_details['index']
+        self._output_index = output_details['index']
+        self.input_dtype = np.dtype(input_details['dtype'])
+        self.input_size = int(input_details['shape'][1])
+        # (scale, zero_point); scale 0 means the tensor is not quantized.
+        self._input_quant = input_details.get('quantization', (0.0, 0))
+        self._output_quant = output_details.get('quantization', (0.0, 0))
+        self._output_dtype = np.dtype(output_details['dtype'])
+
+    def _preprocess(self, frame, out, region=None):
+        """Resize + BGR->RGB ``frame`` and store it in ``out`` in the model's dtype.
+
+        With a ``region`` only that square is resampled, straight from the
+        full-resolution frame.
+
+        ``uint8`` models take raw RGB, float models take RGB / 255 and other
+        quantized inputs are quantized from the [0, 1] range.
+        """
+        size = (self.input_size, self.input_size)
+        if region is not None:
+            x0, y0, side = region
+            scale = self.input_size / side
+            matrix = np.array([[scale, 0.0, -x0 * scale], [0.0, scale, -y0 * scale]])
+            resized = cv2.warpAffine(
+                frame, matrix, size, dst=self._resized,
+                flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_CONSTANT,
+            )
+        elif frame.shape[:2] == size:
+            resized = frame
+        else:
+            resized = cv2.resize(frame, size, dst=self._resized)
+        if out.dtype == np.uint8:
+            cv2.cvtColor(resized, cv2.COLOR_BGR2RGB, dst=out)
+            return out
+        cv2.cvtColor(resized, cv2.COLOR_BGR2RGB, dst=self._rgb)
+        if out.dtype.kind == 'f':
+            np.multiply(self._rgb, 1.0 / 255.0, out=out, casting="unsafe")
+            return out
+        scale, zero_point = self._input_quant
+        if not scale:
+            out[...] = self._rgb
+            return out
+        scaled = self._scaled
+        np.multiply(self._rgb, 1.0 / (255.0 * scale), out=scaled)
+        np.add(scaled, zero_point, out=scaled)
+        info = np.iinfo(out.dtype)
+        np.clip(scaled, info.min, info.max, out=scaled)
+        np.rint(scaled, out=scaled)
+        out[...] = scaled
+        return out
+
+    def _fill_input(self, frames, region=None, interpreter=None):
+        """Preprocess ``frames`` straight into the interpreter's input tensor.
+
+        The tensor view only lives inside this call: the interpreter refuses
+        to invoke while numpy views of its buffers are still referenced.
+        Padding rows of a batch are left as they are.
+        """
+        batch = (interpreter or self.interpreter).tensor(self._input_index)()
+        for row, frame in zip(batch, frames):
+            self._preprocess(frame, row, region)
+
+    def _read_output(self, interpreter=None):
+        output = (interpreter or self.interpreter).get_tensor(self._output_index)
+        scale, zero_point = self._output_quant
+        if self._output_dtype.kind != 'f' and scale:
+            output = (output.astype(np.float32) - zero_point) * scale
+        return output
+
+    def detect_array(self, frame, region=None):
+        """Return the ``(17, 3)`` ``[y, x, score]`` array, or ``None``.
+
+        Coordinates are normalised to the full frame, also for a ``region``.
+        """
         if self.interpreter is None:
             return None
-        input_data = self._preprocess(frame)
-        input_details = self.interpreter.get_input_details()
-        output_details = self.interpreter.get_output_details()
-        self.interpreter.set_tensor(input_details[0]['index'], input_data)
+        self._fill_input((frame,), region)
         self.interpreter.invoke()
-        output_data = self.interpreter.get_tensor(output_details[0]['index'])
         # output_data shape: (1,1,17,3) or (1,17,3)
-        arr = output_data.squeeze()
-        if arr.ndim == 3:
-            arr = arr[0]
+        arr = self._read_output().reshape(-1, 3)[:len(KEYPOINT_NAMES)]
+        if region is not None:
+            x0, y0, side = region
+            height, width = frame.shape[:2]
+            arr = arr.astype(np.float32)
+            arr[:, 0] = np.clip((y0 + arr[:, 0] * side) / height, 0.0, 1.0)
+            arr[:, 1] = np.clip((x0 + arr[:, 1] * side) / width, 0.0, 1.0)
+        return arr
+
+    def detect(self, frame, region=None):
+        arr = self.detect_array(frame, region)
+        if arr is None:
+            return None
+        return self.to_keypoints(arr)
+
+    def close(self):
+        """Drop the interpreter and frame buffers; `detect()` returns ``None``
+        afterwards."""
+        self.interpreter = None
+        self._batch_interpreters = {}
+        self._resized = self._rgb = self._scaled = None
+
+    def detect_batch(self, frames):
+        """Run several frames through one batched `invoke()`.
+
+        The batch is padded to the next power of two and runs on the
+        interpreter kept for that size. If the model refuses a dynamic batch
+        dimension, frames are run one by one instead so callers always get
+        one result per frame.
+        """
+        if self.interpreter is None:
+            return [None] * len(frames)
+        if len(frames) == 1 or not self.supports_batching:
+            return [self.detect(frame) for frame in frames]
+
+        padded = padded_batch_size(len(frames))
+        try:
+            interpreter = self._batch_interpreter(padded)
+            self._fill_input(frames, interpreter=interpreter)
+            interpreter.invoke()
+        except Exception as e:
+            print(f"MoveNetLocal: batched inference unsupported ({e}), using per-frame invoke")
+            self.supports_batching = False
+            self._batch_interpreters = {}
+            return [self.detect(frame) for frame in frames]
+
+        # output_data shape: (N,1,17,3) or (N,17,3)
+        arr = self._read_output(interpreter).reshape(padded, -1, 3)
+        return [self.to_keypoints(arr[i]) for i in range(len(frames))]
+
+    def prepare_batches(self, max_batch):
+        """Build the interpreters for every padded size up to ``max_batch``."""
+        size = 2
+        while self.supports_batching and size <= padded_batch_size(max_batch):
+            try:
+                self._batch_interpreter(size)
+            except Exception as e:
+                print(f"MoveNetLocal: batched inference unsupported ({e}), using per-frame invoke")
+                self.supports_batching = False
+                self._batch_interpreters = {}
+            size *= 2
+
+    def _batch_interpreter(self, batch_size):
+        interpreter = self._batch_interpreters.get(batch_size)
+        if interpreter is None:
+            interpreter = self._create_interpreter(self.model_path, self.use_xnnpack)
+            interpreter.resize_tensor_input(
+                self._input_index, [batch_size, self.input_size, self.input_size, 3]
+            )
+            interpreter.allocate_tensors()
+            self._batch_interpreters[batch_size] = interpreter
+        return interpreter
+
+    @staticmethod
+    def to_keypoints(arr):
         # Map MoveNet keypoint indices to standard names
-        keypoint_names = [
-            'nose','left_eye','right_eye','left_ear','right_ear',
-            'left_shoulder','right_shoulder','left_elbow','right_elbow',
-            'left_wrist','right_wrist','left_hip','right_hip',
-            'left_knee','right_knee','left_ankle','right_ankle'
+        return {
+            name: [float(x), float(y), float(score)]
+            for name, (y, x, score) in zip(KEYPOINT_NAMES, arr.tolist())
+        }
+
+
+class MoveNetMultiPose(MoveNetLocal):
+    """MoveNet MultiPose Lightning: up to six people from one inference.
+
+    The model takes a uint8 RGB image of any size whose sides are multiples
+    of 32; frames are scaled so the longer side is ``input_size`` and the
+    shorter side keeps the aspect ratio. Each output row holds 17
+    ``[y, x, score]`` keypoints, a ``[ymin, xmin, ymax, xmax]`` box and the
+    person score, all normalised to the frame.
+    """
+
+    MAX_PEOPLE = 6
+
+    def __init__(self, model_path=MULTIPOSE_MODEL_PATH, input_size=256, **kwargs):
+        super().__init__(model_path=model_path, **kwargs)
+        self.input_size = max(32, int(input_size) // 32 * 32)
+        self.supports_batching = False
+        self._input_shape = None
+
+    def _input_dims(self, height, width):
+        scale = self.input_size / float(max(height, width))
+        in_h = max(32, int(round(height * scale / 32.0)) * 32)
+        in_w = max(32, int(round(width * scale / 32.0)) * 32)
+        return in_h, in_w
+
+    def _fill_frame(self, frame, in_h, in_w):
+        # Same rule as _fill_input: the tensor view must not outlive this call.
+        tensor = self.interpreter.tensor(self._input_index)()[0]
+        resized = cv2.resize(frame, (in_w, in_h), interpolation=cv2.INTER_LINEAR)
+        if tensor.dtype == np.uint8:
+            cv2.cvtColor(resized, cv2.COLOR_BGR2RGB, dst=tensor)
+        else:
+            tensor[...] = cv2.cvtColor(resized, cv2.COLOR_BGR2RGB)
+
+    def detect_people(self, frame, min_score=0.2):
+        """Return ``[(keypoints (17, 3), box (4,), score), ...]`` best first."""
+        if self.interpreter is None:
+            return []
+        shape = self._input_dims(*frame.shape[:2])
+        if shape != self._input_shape:
+            self._input_shape = None
+            self.interpreter.resize_tensor_input(self._input_index, [1, shape[0], shape[1], 3])
+            self.interpreter.allocate_tensors()
+            self._input_shape = shape
+        self._fill_frame(frame, *shape)
+        self.interpreter.invoke()
+        rows = self._read_output().reshape(-1, 56)
+        people = [
+            (row[:51].reshape(17, 3), row[51:55], float(row[55]))
+            for row in rows
+            if row[55] >= min_score
         ]
-        out = {}
-        for i, name in enumerate(keypoint_names):
-            y, x, score = arr[i]
-            out[name] = [float(x), float(y), float(score)]
-        return out
+        people.sort(key=lambda person: person[2], reverse=True)
+        return people
@@ -23,7 +23,7 @@ print("=" * 60)
 failures = 0
 
 # Test 1: Geometry Module
-print("\n[1/6] Testing Geometry Module...")
+print("\n[1/21] Testing Geometry Module...")
 try:
     from backend.geometry import calculate_angle
     import numpy as np
@@ -39,7 +39,7 @@ except Exception as e:
     log_fail(f"Error: {e}")
 
 # Test 2: Squat Counter
-print("\n[2/6] Testing Squat Counter...")
+print("\n[2/21] Testing Squat Counter...")
 try:
     sys.path.insert(0, "backend")
     from squat import SquatCounter
@@ -53,7 +53,7 @@ except Exception as e:
     log_fail(f"Error: {e}")
 
 # Test 3: Models Check
-print("\n[3/6] Checking Models...")
+print("\n[3/21] Checking Models...")
 try:
     model_path = "backend/models/movenet_lightning.tflite"
     if os.path.exists(model_path):
@@ -66,7 +66,7 @@ except Exception as e:
     log_fail(f"Error: {e}")
 
 # Test 4: Pose Detector with Sample Frame
-print("\n[4/6] Testing Pose Detection...")
+print("\n[4/21] Testing Pose Detection...")
 try:
     import numpy as np
     from pose import PoseDetector
@@ -91,7 +91,7 @@ except Exception as e:
     log_fail(f"Error: {e}")
 
 # Test 5: Complete Pipeline
-print("\n[5/6] Testing Complete Pipeline...")
+print("\n[5/21] Testing Complete Pipeline...")
 try:
     import numpy as np
     from squat import SquatCounter
@@ -115,7 +115,7 @@ except Exception as e:
     log_fail(f"Error: {e}")
 
 # Test 6: Exercise Classifier
-print("\n[6/6] Testing Exercise Classifier...")
+print("\n[6/21] Testing Exercise Classifier...")
 try:
     from backend.exercise_classifier import ExerciseClassifier, extract_features
 
@@ -141,6 +141,647 @@ except Exception as e:
     failures += 1
     log_fail(f"Error: {e}")
 
+# Test 7: Multi-person Tracking
+print("\n[7/21] Testing Multi-person Tracking...")
+try:
+    import numpy as np
+    from multi_person import PersonTracker, box_iou, keypoint_similarity
+
+    def stick_figure(cx, cy, height):
+        """(17, 3) [y, x, score] keypoints on a vertical line, plus its box."""
+        keypoints = np.zeros((17, 3), dtype=np.float32)
+        keypoints[:, 0] = np.linspace(cy - height / 2, cy + height / 2, 17)
+        keypoints[:, 1] = cx
+        keypoints[:, 2] = 0.9
+        box = np.array(
+            [cy - height / 2, cx - height / 4, cy + height / 2, cx + height / 4], dtype=np.float32
+        )
+        return keypoints, box, 0.9
+
+    boxes = np.array([[0, 0, 1, 1], [0, 0, 0.5, 1], [2, 2, 3, 3]], dtype=np.float32)
+    iou = box_iou(boxes, boxes)
+    assert np.allclose(np.diag(iou), 1.0)
+    assert abs(iou[0, 1] - 0.5) < 1e-6 and iou[0, 2] == 0.0
+    keypoints, box, _ = stick_figure(0.5, 0.5, 0.6)
+    assert abs(keypoint_similarity(keypoints, box, keypoints) - 1.0) < 1e-6
+    hidden = keypoints.copy()
+    hidden[:, 2] = 0.0
+    assert keypoint_similarity(keypoints, box, hidden) == 0.0
+
+    # Two athletes at different depths walk past each other.
+    tracker = PersonTracker(max_misses=3)
+    for step in range(21):
+        x = step / 20.0
+        tracks = tracker.update([
+            stick_figure(0.1 + 0.8 * x, 0.5, 0.7),
+            stick_figure(0.9 - 0.8 * x, 0.45, 0.4),
+        ])
+        by_id = {track.id: float(track.box[1] + track.box[3]) / 2 for track in tracks}
+        assert set(by_id) == {1, 2}, f"identities changed at step {step}: {by_id}"
+        assert abs(by_id[1] - (0.1 + 0.8 * x)) < 1e-4, f"tracks swapped at step {step}"
+
+    # The second athlete leaves: kept for max_misses frames, then expired.
+    for _ in range(3):
+        tracker.update([stick_figure(0.9, 0.5, 0.7)])
+    assert [track.id for track in tracker.tracks] == [1, 2]
+    tracker.update([stick_figure(0.9, 0.5, 0.7)])
+    assert [track.id for track in tracker.tracks] == [1]
+    tracks = tracker.update([stick_figure(0.9, 0.5, 0.7), stick_figure(0.1, 0.45, 0.4)])
+    assert sorted(track.id for track in tracks) == [1, 3]
+    log_ok("PersonTracker keeps identities across a crossing and expires lost tracks")
+
+    # The primary athlete stays primary while someone larger walks in front.
+    from multi_person import MultiPersonPipeline
+    from pose import Pose
+
+    class FakeMultiPose:
+        input_size = 256
+        people = []
+
+        def detect_people(self, frame):
+            return [
+                (keypoints, box, score, Pose.from_yxs(keypoints))
+                for keypoints, box, score in self.people
+            ]
+
+    fake = FakeMultiPose()
+    pipeline = MultiPersonPipeline(fake)
+    pipeline.tracker = PersonTracker(max_misses=2)
+    frame = np.zeros((8, 8, 3), dtype=np.uint8)
+    fake.people = [stick_figure(0.3, 0.5, 0.6), stick_figure(0.7, 0.5, 0.3)]
+    pipeline.process_frame(frame)
+    assert pipeline.primary_id == 1
+    fake.people = [stick_figure(0.3, 0.5, 0.6), stick_figure(0.7, 0.5, 0.9)]
+    result = pipeline.process_frame(frame)
+    assert pipeline.primary_id == 1 and len(result["people"]) == 2
+    newcomer = max(track.id for track in pipeline.tracker.tracks)
+    fake.people = [stick_figure(0.7, 0.5, 0.9)]
+    for _ in range(2):
+        pipeline.process_frame(frame)
+        assert pipeline.primary_id == 1
+    pipeline.process_frame(frame)
+    assert pipeline.primary_id == newcomer, pipeline.primary_id
+    log_ok("MultiPersonPipeline keeps the primary person until their track expires")
+except Exception as e:
+    failures += 1
+    log_fail(f"Error: {e}")
+
+# Test 8: Binary Frame Protocol
+print("\n[8/21] Testing Binary Frame Protocol...")
+try:
+    from protocol import FRAME_HEADER, ProtocolError, parse_binary_frame
+
+    jpeg = bytes([0xFF, 0xD8, 0xFF, 0xD9])
+    message = parse_binary_frame(jpeg)
+    assert message.frame_id is None and message.buffer.tobytes() == jpeg
+
+    message = parse_binary_frame(FRAME_HEADER.pack(1, 0, 42, 1700000000000) + jpeg)
+    assert message.frame_id == 42 and message.client_ts == 1700000000000
+    assert message.buffer.tobytes() == jpeg
+    assert message.ack_fields() == {"frame_id": 42, "client_ts": 1700000000000}
+
+    for bad in (b"", FRAME_HEADER.pack(1, 0, 1, 0)):
+        try:
+            parse_binary_frame(bad)
+        except ProtocolError:
+            pass
+        else:
+            raise AssertionError(f"accepted malformed frame {bad!r}")
+    log_ok("binary.v1 frames parse with and without the header")
+except Exception as e:
+    failures += 1
+    log_fail(f"Error: {e}")
+
+# Test 9: Session Token Bucket
+print("\n[9/21] Testing Session Token Bucket...")
+try:
+    from admission import TokenBucket
+
+    clock = [100.0]
+    bucket = TokenBucket(rate=2.0, burst=2, clock=lambda: clock[0])
+    # The burst is available at once, then tokens arrive every 0.5 s.
+    for _ in range(2):
+        assert bucket.delay() == 0.0
+        bucket.take()
+    assert abs(bucket.delay() - 0.5) < 1e-9
+    clock[0] += 0.25
+    assert abs(bucket.delay() - 0.25) < 1e-9
+    clock[0] += 0.25
+    assert bucket.delay() == 0.0
+    # Idle time never banks more than the burst.
+    clock[0] += 60.0
+    assert bucket.delay() == 0.0 and bucket.tokens == 2.0
+    assert TokenBucket(rate=0).delay() == 0.0
+    log_ok("TokenBucket enforces rate and burst")
+except Exception as e:
+    failures += 1
+    log_fail(f"Error: {e}")
+
+# Test 10: Reduced JPEG Decoding
+print("\n[10/21] Testing Reduced JPEG Decoding...")
+try:
+    import cv2
+    import numpy as np
+    from decode import FrameDecoder, jpeg_size, reduction_for
+
+    ok, encoded = cv2.imencode(".jpg", np.zeros((480, 640, 3), dtype=np.uint8))
+    assert ok
+    assert jpeg_size(encoded.ravel()) == (640, 480)
+    ok, png = cv2.imencode(".png", np.zeros((8, 8, 3), dtype=np.uint8))
+    assert jpeg_size(png.ravel()) is None
+    assert jpeg_size(encoded.ravel()[:20]) is None
+
+    assert reduction_for(640, 480, 192) == 2
+    assert reduction_for(1920, 1080, 256) == 4
+    assert reduction_for(3840, 2160, 256) == 8
+    assert reduction_for(320, 240, 256) == 1
+    assert reduction_for(640, 480, None) == 1
+
+    decoder = FrameDecoder(target_size=192)
+    frame = decoder.decode(encoded.ravel())
+    assert frame.shape[:2] == (240, 320) and decoder.last_factor == 2
+    log_ok("JPEG header parsing and reduced decoding work")
+except Exception as e:
+    failures += 1
+    log_fail(f"Error: {e}")
+
+# Test 11: Batched Joint Angles and Features
+print("\n[11/21] Testing Batched Joint Angles and Features...")
+try:
+    import math
+
+    import numpy as np
+    from exercise_classifier import extract_features, extract_features_batch
+    from geometry import LANDMARK_ANGLES, LANDMARK_NAMES, calculate_angle, joint_angles
+
+    rng = np.random.default_rng(7)
+    points = rng.uniform(0.0, 1.0, size=(64, 4, 2))
+    # Zero-length limbs: knee on the hip, then ankle on the knee.
+    points[1, 2] = points[1, 1]
+    points[2, 3] = points[2, 2]
+
+    batched = joint_angles(points, LANDMARK_ANGLES)
+    triples = joint_angles(points[:, [1, 2, 3]])
+    assert batched.shape == (64, 2)
+    assert np.allclose(batched[:, 0], triples, equal_nan=True)
+    for row, sample in enumerate(points):
+        for column, (i, j, k) in enumerate(LANDMARK_ANGLES):
+            expected = calculate_angle(sample[i], sample[j], sample[k])
+            got = batched[row, column]
+            assert (math.isnan(expected) and math.isnan(got)) or abs(expected - got) < 1e-9
+    assert np.isnan(batched[1]).all() and np.isnan(batched[2, 0]) and not np.isnan(batched[2, 1])
+    log_ok("joint_angles matches calculate_angle, NaN for zero-length limbs")
+
+    features = extract_features_batch(points)
+    assert features.shape[0] == 64 and features.dtype == np.float32
+    for row, sample in enumerate(points):
+        single = extract_features(dict(zip(LANDMARK_NAMES, sample)))
+        if row in (1, 2):
+            assert single is None and np.isnan(features[row]).all()
+        else:
+            assert np.allclose(features[row], single, rtol=1e-5, atol=1e-6), row
+    log_ok("extract_features_batch matches extract_features row by row")
+except Exception as e:
+    failures += 1
+    log_fail(f"Error: {e}")
+
+# Test 12: Pose Keypoint Container
+print("\n[12/21] Testing Pose Keypoint Container...")
+try:
+    import numpy as np
+    from pose import Pose
+
+    keypoints = {
+        "left_shoulder": [0.40, 0.30, 0.9], "right_shoulder": [0.60, 0.30, 0.9],
+        "left_hip": [0.42, 0.55, 0.9], "right_hip": [0.58, 0.55, 0.1],
+        "left_knee": [0.44, 0.75, 0.8], "right_knee": [0.56, 0.75, 0.8],
+    }
+    pose = Pose.from_keypoints(keypoints, min_score=0.2)
+    assert pose.data.shape == (17, 3) and pose.data.dtype == np.float32
+    # Dict compatibility: averaged present landmarks, low-score joints ignored.
+    assert set(pose) == {"shoulder", "hip", "knee"} and len(pose) == 3
+    assert np.allclose(pose["shoulder"], (0.5, 0.3)) and np.allclose(pose["hip"], (0.42, 0.55))
+    assert "ankle" not in pose and pose.get("ankle") is None and not pose.complete
+    assert isinstance(pose["knee"], tuple) and np.allclose(dict(pose)["knee"], (0.5, 0.75))
+
+    view = pose.landmarks()
+    assert view.shape == (4, 2) and np.isnan(view[3]).all()
+    assert pose.landmarks() is view, "landmarks() should be cached"
+    assert np.shares_memory(pose.joint("left_hip"), pose.data)
+
+    flat = Pose.from_landmarks(
+        {"shoulder": (0.5, 0.2), "hip": (0.5, 0.5), "knee": (0.5, 0.7), "ankle": (0.5, 0.9)}
+    )
+    assert flat.complete and np.allclose(flat["ankle"], (0.5, 0.9))
+    yxs = Pose.from_yxs(flat.data[:, (1, 0, 2)])
+    assert np.array_equal(yxs.landmarks(), flat.landmarks())
+    log_ok("Pose reads like the landmark dict and caches its (4, 2) view")
+except Exception as e:
+    failures += 1
+    log_fail(f"Error: {e}")
+
+# Test 13: Compact Responses and Events
+print("\n[13/21] Testing Compact Responses and Events...")
+try:
+    import json
+    import struct
+
+    from responses import (
+        FLAG_DETECTED, FLAG_FRAME_ID, FLAG_MODEL, FLAG_STAGE_DOWN, MSG_HEARTBEAT, MSG_RESULT,
+        STRUCT_HEADER, ResponseWriter, encode_struct,
+    )
+
+    payload = encode_struct({
+        "detected": True, "reps": 70000, "stage": "down", "classifier": "model",
+        "frame_id": 42, "dropped": 3, "confidence": 0.5,
+        "exercise": "squat", "feedback": "é" * 200,
+    })
+    kind, flags, reps, frame_id, dropped, confidence = STRUCT_HEADER.unpack_from(payload)
+    assert STRUCT_HEADER.size == 16 and kind == MSG_RESULT
+    assert flags == FLAG_DETECTED | FLAG_MODEL | FLAG_FRAME_ID | FLAG_STAGE_DOWN
+    assert (reps, frame_id, dropped, confidence) == (0xFFFF, 42, 3, 0.5)
+    offset = STRUCT_HEADER.size
+    strings = []
+    for _ in range(3):
+        length = payload[offset]
+        strings.append(payload[offset + 1:offset + 1 + length].decode("utf-8"))
+        offset += 1 + length
+    assert offset == len(payload)
+    # 200 two-byte characters are trimmed to 127 whole ones (254 bytes).
+    assert strings[0] == "squat" and strings[1] == "é" * 127 and strings[2] == ""
+    heartbeat = encode_struct({"type": "heartbeat", "frame_id": None, "reps": 2})
+    assert struct.unpack_from("!BB", heartbeat) == (MSG_HEARTBEAT, 0)
+    log_ok("encode_struct packs the documented header and trims strings safely")
+
+    writer = ResponseWriter(events=True)
+    base = {"detected": True, "reps": 0, "stage": "up", "exercise": "squat",
+            "feedback": "", "confidence": 0.8}
+    sent = [writer.next_payloads({**base, "frame_id": 1})]
+    sent.append(writer.next_payloads({**base, "frame_id": 2, "confidence": 0.6}))
+    sent.append(writer.next_payloads({**base, "frame_id": 3, "stage": "down"}))
+    sent.append(writer.next_payloads({**base, "frame_id": 4, "stage": "down"}))
+    assert [len(payloads) for payloads in sent] == [1, 0, 1, 0]
+    assert json.loads(sent[2][0])["frame_id"] == 3
+    beat = json.loads(writer.heartbeat_payload())
+    assert beat["type"] == "heartbeat" and beat["frame_id"] == 4 and beat["processed"] == 4
+    assert len(ResponseWriter().next_payloads({**base, "frame_id": 5})) == 1
+    log_ok("events mode only emits on changes and heartbeats carry the last ack")
+except Exception as e:
+    failures += 1
+    log_fail(f"Error: {e}")
+
+# Test 14: Resumable Session Store
+print("\n[14/21] Testing Resumable Session Store...")
+try:
+    import tempfile
+    import time
+
+    from session_store import InMemorySessionStore, SessionManager, SQLiteSessionStore
+
+    class CountingStore:
+        def __init__(self, store):
+            self.store = store
+            self.batches = []
+
+        def load(self, session_id):
+            return self.store.load(session_id)
+
+        def save_many(self, snapshots):
+            self.batches.append(dict(snapshots))
+            self.store.save_many(snapshots)
+
+        def close(self):
+            self.store.close()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for store in (InMemorySessionStore(), SQLiteSessionStore(os.path.join(tmp, "s.db"))):
+            name = type(store).__name__
+            counting = CountingStore(store)
+            manager = SessionManager(counting, flush_seconds=60.0)
+            session_id, snapshot = manager.resume(None)
+            assert snapshot is None and session_id
+            frame = {"reps": 0, "stage": "up", "exercise": "squat", "confidence": 0.9}
+            manager.update(session_id, frame)
+            # Confidence jitter alone is not a change worth writing.
+            manager.update(session_id, {**frame, "confidence": 0.4})
+            manager.update(session_id, {**frame, "reps": 1, "stage": "down"})
+            assert counting.batches == [] and store.load(session_id) is None, name
+            manager.flush()
+            manager.flush()
+            assert len(counting.batches) == 1, name
+            saved = store.load(session_id)
+            assert saved["reps"] == 1 and saved["stage"] == "down" and "confidence" not in saved
+            # A reconnect on another manager (e.g. another worker) resumes.
+            manager.release(session_id)
+            other = SessionManager(store, flush_seconds=60.0)
+            assert other.resume(session_id) == (session_id, saved), name
+            assert other.resume("unknown")[0] != "unknown"
+            manager.close()
+            other.close()
+
+        for store in (InMemorySessionStore(ttl_seconds=0.05),
+                      SQLiteSessionStore(os.path.join(tmp, "ttl.db"), ttl_seconds=0.05)):
+            store.save_many({"old": {"reps": 3}})
+            assert store.load("old") == {"reps": 3}
+            time.sleep(0.1)
+            assert store.load("old") is None, type(store).__name__
+            store.close()
+    log_ok("SessionManager writes behind, resumes and expires on both stores")
+except Exception as e:
+    failures += 1
+    log_fail(f"Error: {e}")
+
+# Test 15: Capture Controller
+print("\n[15/21] Testing Capture Controller...")
+try:
+    from control import CaptureController
+
+    controller = CaptureController(input_size=192, min_fps=1.0, max_fps=15.0,
+                                   res_factor=2.0, interval=0.0)
+    idle = controller.targets()
+    assert idle == {"type": "control", "fps": 15.0, "max_width": 384, "max_height": 384,
+                    "jpeg_quality": 0.8}
+    controller.observe(0.1)
+    assert controller.targets()["fps"] == 10.0
+    # An oversubscribed executor shares the frame rate and shrinks frames.
+    loaded = controller.targets(load=2.0)
+    assert loaded["fps"] == 5.0 and loaded["max_width"] == 192 and loaded["jpeg_quality"] == 0.6
+    controller.observe(10.0)
+    assert controller.targets()["fps"] == 1.0
+
+    controller = CaptureController(input_size=192, interval=0.0)
+    controller.observe(0.1)
+    assert controller.maybe_update(force=True)["fps"] == 10.0
+    controller.observe(0.105)
+    assert controller.maybe_update() is None, "small latency drift must not resend"
+    assert controller.maybe_update(load=2.0)["max_width"] == 192
+    assert CaptureController(interval=60.0).maybe_update() is not None
+    log_ok("CaptureController follows latency and load, resending only on change")
+except Exception as e:
+    failures += 1
+    log_fail(f"Error: {e}")
+
+# Test 16: Motion Gate
+print("\n[16/21] Testing Motion Gate...")
+try:
+    import numpy as np
+    from motion_gate import MotionGate
+
+    gate = MotionGate(threshold=0.01, pixel_delta=12, max_skip=3)
+    still = np.full((480, 640, 3), 100, dtype=np.uint8)
+    # The first frame always runs; then at most max_skip identical frames are skipped.
+    decisions = [gate.should_skip(still) for _ in range(9)]
+    assert decisions == [False, True, True, True, False, True, True, True, False], decisions
+    moved = still.copy()
+    moved[100:300, 200:400] = 200
+    assert gate.should_skip(moved) is False
+    assert gate.should_skip(moved) is True
+    # Noise below pixel_delta is not motion.
+    assert gate.should_skip(moved + 5) is True
+    gate.reset()
+    assert gate.should_skip(moved) is False
+    stats = gate.stats()
+    assert stats["skipped"] == 8 and stats["inferred"] == 5 and stats["skip_rate"] == round(8 / 13, 3)
+    never = MotionGate(max_skip=0)
+    assert [never.should_skip(still) for _ in range(2)] == [False, False]
+    log_ok("MotionGate skips unchanged frames up to max_skip and refreshes on motion")
+except Exception as e:
+    failures += 1
+    log_fail(f"Error: {e}")
+
+# Test 17: Smart Crop
+print("\n[17/21] Testing Smart Crop...")
+try:
+    import numpy as np
+    from smart_crop import SmartCrop, crop_region
+
+    keypoints = np.zeros((17, 3), dtype=np.float32)
+    for index, (y, x) in {5: (0.4, 0.48), 6: (0.4, 0.52), 11: (0.5, 0.48), 12: (0.5, 0.52)}.items():
+        keypoints[index] = (y, x, 0.9)
+    # Centred on the hips; half side is the torso height padded by 1.9.
+    region = crop_region(keypoints, 1280, 720)
+    assert np.allclose(region, (640 - 136.8, 360 - 136.8, 273.6), atol=1e-3), region
+    hidden = keypoints.copy()
+    hidden[11, 2] = 0.1
+    assert crop_region(hidden, 1280, 720) is None
+    # A person filling the frame gains nothing from cropping.
+    tall = keypoints.copy()
+    tall[5:7, 0] = 0.0
+    tall[11:13, 0] = 1.0
+    assert crop_region(tall, 640, 480) is None
+
+    crop = SmartCrop()
+    assert crop.next_region() is None
+    crop.update(keypoints, (720, 1280, 3))
+    assert np.allclose(crop.next_region(), region)
+    crop.update(hidden, (720, 1280, 3))
+    assert crop.next_region() is None
+    crop.update(keypoints, (720, 1280, 3))
+    crop.reset()
+    assert crop.next_region() is None
+    assert (crop.cropped, crop.full) == (1, 3)
+    log_ok("SmartCrop tracks a padded torso region and falls back to full frames")
+except Exception as e:
+    failures += 1
+    log_fail(f"Error: {e}")
+
+# Test 18: Heatmap Decoding
+print("\n[18/21] Testing Heatmap Decoding...")
+try:
+    import numpy as np
+    from op_pose import decode_heatmaps
+
+    rng = np.random.default_rng(3)
+    heatmaps = rng.random((8, 46, 62)).astype(np.float32)
+    decoded = decode_heatmaps(heatmaps)
+    assert decoded.shape == (8, 3)
+    for index, heatmap in enumerate(heatmaps):
+        y, x = np.unravel_index(np.argmax(heatmap), heatmap.shape)
+        assert decoded[index, 2] == heatmap[y, x]
+        # Refinement moves a peak by at most half a cell.
+        assert abs(decoded[index, 0] * 62 - 0.5 - x) <= 0.5 + 1e-6
+        assert abs(decoded[index, 1] * 46 - 0.5 - y) <= 0.5 + 1e-6
+
+    # A smooth blob between cells is located to sub-pixel precision.
+    ys, xs = np.mgrid[0:46, 0:62]
+    blob = np.exp(-((xs - 20.3) ** 2 + (ys - 11.7) ** 2) / 8.0).astype(np.float32)
+    corner = np.zeros_like(blob)
+    corner[0, 61] = 1.0
+    (bx, by, _), (cx, cy, cp) = decode_heatmaps(np.stack([blob, corner]))
+    assert abs(bx * 62 - 0.5 - 20.3) < 0.1 and abs(by * 46 - 0.5 - 11.7) < 0.1
+    # Border peaks have one neighbour and stay on the cell centre.
+    assert (cx, cy, cp) == (61.5 / 62, 0.5 / 46, 1.0)
+    log_ok("decode_heatmaps matches a naive argmax and refines peaks sub-pixel")
+except Exception as e:
+    failures += 1
+    log_fail(f"Error: {e}")
+
+# Test 19: MoveNet Variant Governor
+print("\n[19/21] Testing MoveNet Variant Governor...")
+try:
+    import time
+
+    import movenet_variants
+
+    class FakeMoveNet:
+        def __init__(self, model_path):
+            self.interpreter = object()
+            self.input_size = 256 if "thunder" in model_path else 192
+
+        def detect_array(self, frame, region=None):
+            return None
+
+        def close(self):
+            self.interpreter = None
+
+    provisioned = movenet_variants.available_variants
+    movenet_variants.available_variants = lambda: ["movenet_thunder", "movenet_lightning"]
+    try:
+        governor = movenet_variants.VariantGovernor(
+            FakeMoveNet, budget_ms=10.0, pinned="auto", runs=1,
+            step_down_frames=3, step_up_frames=4,
+        )
+        assert governor.select() == "movenet_thunder" == governor.selected
+        detector = governor.create()
+        for _ in range(2):
+            governor.observe("movenet_thunder", 0.05)
+        assert governor.current == "movenet_thunder"
+        governor.observe("movenet_thunder", 0.05)
+        assert governor.current == "movenet_lightning" and governor.step_downs == 1
+        assert governor.generation == 1
+
+        # The replacement is built off the frame path and handed over later.
+        governor.request()
+        deadline = time.monotonic() + 5.0
+        replacement = None
+        while replacement is None and time.monotonic() < deadline:
+            replacement = governor.take("movenet_lightning")
+            time.sleep(0.01)
+        assert replacement is not None and replacement.variant == "movenet_lightning"
+        governor.release(detector)
+        assert detector.interpreter is None
+
+        # Latency well under half the budget steps back up, never past the start.
+        for _ in range(3):
+            governor.observe("movenet_lightning", 0.001)
+        assert governor.current == "movenet_lightning"
+        governor.observe("movenet_lightning", 0.001)
+        assert governor.current == "movenet_thunder" and governor.step_ups == 1
+        for _ in range(10):
+            governor.observe("movenet_thunder", 0.001)
+        assert governor.current == "movenet_thunder"
+        # A step-down after a step-up doubles the frames needed to go back up.
+        for _ in range(3):
+            governor.observe("movenet_thunder", 0.5)
+        assert governor.current == "movenet_lightning"
+        for _ in range(7):
+            governor.observe("movenet_lightning", 0.001)
+        assert governor.current == "movenet_lightning"
+        governor.observe("movenet_lightning", 0.001)
+        assert governor.current == "movenet_thunder"
+        stats = governor.stats()
+        assert (stats["step_downs"], stats["step_ups"]) == (2, 2)
+    finally:
+        movenet_variants.available_variants = provisioned
+    log_ok("VariantGovernor steps down under load and back up when it eases")
+except Exception as e:
+    failures += 1
+    log_fail(f"Error: {e}")
+
+# Test 20: Metrics Exposition
+print("\n[20/21] Testing Metrics Exposition...")
+try:
+    from metrics import Counter, Gauge, Histogram, Registry
+
+    registry = Registry()
+    latency = registry.register(Histogram(
+        "test_stage_seconds", "Stage latency.", ("stage",), buckets=(0.01, 0.1)
+    ))
+    frames = registry.register(Counter("test_frames_total", "Frames."))
+    pool = registry.register(Gauge("test_pool", "Pool occupancy.", ("state",)))
+    registry.add_collector(lambda: pool.set(3, "size"))
+    registry.add_collector(lambda: 1 / 0)
+    for seconds in (0.005, 0.05, 0.5):
+        latency.observe(seconds, "pose")
+    latency.labels("parse").observe(0.01)
+
+    text = registry.render()
+    assert text.endswith("\n")
+    lines = text.splitlines()
+    assert lines[:2] == ["# HELP test_stage_seconds Stage latency.",
+                         "# TYPE test_stage_seconds histogram"]
+    for line in (
+        'test_stage_seconds_bucket{stage="parse",le="0.01"} 1',
+        'test_stage_seconds_bucket{stage="pose",le="0.01"} 1',
+        'test_stage_seconds_bucket{stage="pose",le="0.1"} 2',
+        'test_stage_seconds_bucket{stage="pose",le="+Inf"} 3',
+        'test_stage_seconds_count{stage="pose"} 3',
+        "# TYPE test_frames_total counter",
+        "test_frames_total 0",
+        "# TYPE test_pool gauge",
+        'test_pool{state="size"} 3',
+    ):
+        assert line in lines, line
+    sums = [line for line in lines if line.startswith('test_stage_seconds_sum{stage="pose"}')]
+    assert abs(float(sums[0].split()[-1]) - 0.555) < 1e-9
+    frames.inc()
+    frames.inc(2)
+    assert "test_frames_total 3" in registry.render().splitlines()
+    log_ok("Metrics render Prometheus text and survive a failing collector")
+except Exception as e:
+    failures += 1
+    log_fail(f"Error: {e}")
+
+# Test 21: Latest Frame Slot
+print("\n[21/21] Testing Latest Frame Slot...")
+try:
+    import asyncio
+
+    from ingest import LatestFrameSlot, pump_messages
+    from metrics import REGISTRY
+
+    class FakeSocket:
+        def __init__(self, messages):
+            self.messages = list(messages)
+
+        async def receive(self):
+            await asyncio.sleep(0)
+            return self.messages.pop(0)
+
+    def dropped_total():
+        for line in REGISTRY.render().splitlines():
+            if line.startswith("gymbuddy_frames_dropped_total "):
+                return float(line.split()[1])
+
+    async def exercise_slot():
+        slot = LatestFrameSlot()
+        dropped_before = dropped_total()
+        for index in range(3):
+            slot.put({"index": index})
+        # Only the newest frame survives; the two it replaced count as drops.
+        assert (await slot.get())["index"] == 2
+        assert (slot.received, slot.dropped) == (3, 2)
+        assert dropped_total() - dropped_before == 2
+        waiter = asyncio.ensure_future(slot.get())
+        await asyncio.sleep(0)
+        assert not waiter.done()
+        slot.put({"index": 3})
+        assert (await waiter)["index"] == 3 and slot.dropped == 2
+
+        slot = LatestFrameSlot()
+        socket = FakeSocket([{"type": "websocket.receive", "text": "a"},
+                             {"type": "websocket.receive", "text": "b"},
+                             {"type": "websocket.disconnect"}])
+        await pump_messages(socket, slot)
+        assert slot.closed and (await slot.get())["text"] == "b"
+        assert await slot.get() is None
+
+    asyncio.run(exercise_slot())
+    log_ok("LatestFrameSlot keeps the newest frame and counts drops")
+except Exception as e:
+    failures += 1
+    log_fail(f"Error: {e}")
+
 print("\n" + "=" * 60)
 if failures == 0:
     print("[OK] SYSTEM CHECKS PASSED")